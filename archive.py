@@ -0,0 +1,187 @@
+"""
+温度矩阵归档
+
+解码得到的温度矩阵逐帧追加到一个数据文件中，每帧独立压缩，另有 JSON Lines 索引:
+
+    <name>.tarc         文件头 MAGIC，之后是逐帧的数据块
+    <name>.tarc.jsonl   每帧一行: 数据块位置 / 形状 / 存储类型 / 量化参数 / 元数据 (时间、GPS、序列号、测温参数)
+
+读取时对数据文件做内存映射，只解压所需的一帧; 不压缩 (level=0) 时直接返回映射上的只读视图。
+温度 = 存储值 * scale + offset (float32 / float16 存储时 scale = 1, offset = 0)。
+"""
+import os, json, mmap, zlib, pathlib
+from typing import Literal, Optional, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b'DJITARC1'
+SUFFIX = '.tarc'
+INDEX_SUFFIX = '.tarc.jsonl'
+
+# int16 量化的最小步长 (°C)，温度范围过大时按范围放大
+INT16_MIN_SCALE = 0.01
+
+ArchiveDtype = Literal['float32', 'float16', 'int16']
+
+def archive_paths(path: str | pathlib.Path) -> tuple[pathlib.Path, pathlib.Path]:
+    """(数据文件, 索引文件)，path 可以带或不带 .tarc 后缀"""
+    path = pathlib.Path(path)
+    if not path.name.endswith(SUFFIX):
+        path = path.with_name(path.name + SUFFIX)
+    return path, path.with_name(path.name[:-len(SUFFIX)] + INDEX_SUFFIX)
+
+def encode_frame(temps: 'np.ndarray', dtype: ArchiveDtype = 'float32', level: int = 6) -> tuple[bytes, dict]:
+    """
+    在工作进程中执行: 量化并压缩一帧，返回 (数据块, 帧信息)
+    """
+    import numpy as np
+
+    temps = np.asarray(temps, dtype=np.float32)
+    scale, offset = 1.0, 0.0
+    if dtype == 'int16':
+        low, high = float(temps.min()), float(temps.max())
+        # 以范围中点为零点，保证 [low, high] 落在 int16 内
+        offset = round((low + high) / 2, 2)
+        scale = max(INT16_MIN_SCALE, (high - low) / 65000)
+        stored = np.clip(np.rint((temps - offset) / scale), -32767, 32767).astype('<i2')
+    elif dtype == 'float16':
+        stored = temps.astype('<f2')
+    else:
+        stored = temps.astype('<f4', copy=False)
+    raw = stored.tobytes()
+    return (zlib.compress(raw, level) if level > 0 else raw), {
+        'shape': list(temps.shape),
+        'dtype': dtype,
+        'scale': scale,
+        'offset': offset,
+        'codec': 'zlib' if level > 0 else 'none',
+        'size': len(raw),
+    }
+
+class ArchiveWriter:
+    """
+    追加写入归档
+
+    先写数据块再写索引行，写入中途崩溃只会在数据文件末尾留下没有索引的数据，不影响已有的帧。
+    """
+    def __init__(self, path: str | pathlib.Path):
+        self.path, self.index_path = archive_paths(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self._data = open(self.path, mode='ab')
+        if new:
+            self._data.write(MAGIC)
+            self._data.flush()
+            self.index_path.unlink(missing_ok=True)
+        self.count = 0
+        # 已归档的输入文件，重复运行时跳过
+        self.inputs: set[str] = set()
+        if not new and self.index_path.exists():
+            with open(self.index_path, mode='rb+') as f:
+                content = f.read()
+                # 去掉崩溃时写了一半的最后一行
+                content = content[:content.rfind(b'\n') + 1]
+                f.truncate(len(content))
+            for line in content.splitlines():
+                self.inputs.add(json.loads(line)['meta'].get('input'))
+                self.count += 1
+        self._index = open(self.index_path, mode='a', encoding='utf-8')
+
+    def append(self, block: bytes, frame: dict, meta: Optional[dict] = None) -> int:
+        """追加一帧，返回帧序号"""
+        offset = self._data.seek(0, os.SEEK_END)
+        self._data.write(block)
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        record = {'frame': self.count, 'pos': offset, 'length': len(block), **frame, 'meta': meta or dict()}
+        self._index.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._index.flush()
+        self.count += 1
+        self.inputs.add(record['meta'].get('input'))
+        return record['frame']
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ArchiveReader:
+    """
+    随机读取归档中的帧
+
+        with ArchiveReader('flight.tarc') as archive:
+            temps = archive[42]                          # (高, 宽) float32
+            frames = archive.find(sn='XXXXXXXX')         # 按元数据筛选索引
+    """
+    def __init__(self, path: str | pathlib.Path):
+        self.path, index_path = archive_paths(path)
+        self.index: list[dict] = []
+        with open(index_path, mode='r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self.index.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的行
+                    continue
+        self._file = open(self.path, mode='rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a thermal archive")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> 'np.ndarray':
+        return self.read(i)
+
+    def __iter__(self) -> Iterator['np.ndarray']:
+        for i in range(len(self)):
+            yield self.read(i)
+
+    def raw(self, i: int) -> 'np.ndarray':
+        """不换算的存储值 (float32 / float16 / int16)"""
+        import numpy as np
+
+        record = self.index[i]
+        block = memoryview(self._map)[record['pos']:record['pos'] + record['length']]
+        if record['codec'] == 'zlib':
+            block = zlib.decompress(block)
+        dtype = {'float32': '<f4', 'float16': '<f2', 'int16': '<i2'}[record['dtype']]
+        return np.frombuffer(block, dtype=dtype).reshape(record['shape'])
+
+    def read(self, i: int) -> 'np.ndarray':
+        """第 i 帧的温度矩阵 (°C)"""
+        import numpy as np
+
+        record = self.index[i]
+        stored = self.raw(i)
+        if record['dtype'] == 'float32':
+            return stored
+        if record['dtype'] == 'float16':
+            return stored.astype(np.float32)
+        return stored.astype(np.float32) * np.float32(record['scale']) + np.float32(record['offset'])
+
+    def find(self, **meta) -> list[int]:
+        """返回元数据与给定值全部相同的帧序号"""
+        return [i for i, record in enumerate(self.index) if all(record['meta'].get(k) == v for k, v in meta.items())]
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            # 不压缩的帧直接引用映射，仍被使用时由垃圾回收释放
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,510 @@
+import os, re, ctypes, ctypes.util, asyncio, pathlib, subprocess, locale, zlib
+from concurrent.futures import Executor
+from typing import Optional, Literal, TYPE_CHECKING
+from shm_pool import BufferRef, attach
+
+if TYPE_CHECKING:
+    import numpy as np
+    from shm_pool import BufferPool, Lease
+
+# 与 generator.ThermalPalette / SDK 中 dirp_pseudo_color_e 的顺序一致
+PALETTE_NAMES = (
+    'white_hot', 'fulgurite', 'iron_red', 'hot_iron', 'medical',
+    'arctic', 'rainbow1', 'rainbow2', 'tint', 'black_hot'
+)
+MEASURE_PARAMS = ('distance', 'humidity', 'emissivity', 'ambient', 'reflection')
+
+class DecodeBackend:
+    """
+    R-JPEG 解码后端
+
+    params 中包含 distance / humidity / emissivity / ambient / reflection (None 表示使用图像内的值)，
+    brightness，以及 palette (调色盘名称，None 表示保持原调色盘)。
+    """
+    name = 'base'
+    buffers: Optional['BufferPool'] = None
+
+    def attach(self, executor: Executor, temp_dir: Optional[str | pathlib.Path] = None, buffers: Optional['BufferPool'] = None):
+        """
+        绑定会话的进程池，需要在工作进程中解码的后端使用
+
+        temp_dir 为任务的临时文件目录，需要中间文件的后端应写入其中；
+        buffers 为会话的共享内存缓冲池，*_shared 方法的结果放在其中
+        """
+        self.buffers = buffers
+
+    async def process(self, img_path: str | pathlib.Path, task_id: str, params: dict
+        ) -> tuple[bytes, int, int, Optional[float], Optional[float]]:
+        """生成伪彩色图像，返回 (RGB 数据, 宽, 高, 自适应最低温, 自适应最高温)"""
+        raise NotImplementedError
+
+    async def measure(self, img_path: str | pathlib.Path, task_id: str, params: dict) -> Optional['np.ndarray']:
+        """测温，返回形状为 (高, 宽) 的 float32 温度矩阵"""
+        raise NotImplementedError
+
+    async def default_settings(self, img_path: str | pathlib.Path, missing: list[str]) -> Optional[dict[str, float]]:
+        """读取图像内保存的测温参数，只需返回 missing 中的项"""
+        raise NotImplementedError
+
+    async def process_shared(self, img_path: str | pathlib.Path, task_id: str, params: dict
+        ) -> tuple['Lease', int, int, Optional[float], Optional[float]]:
+        """同 process，RGB 数据放在共享块中 (形状为 (高, 宽, 3))，调用方用完后 release"""
+        import numpy as np
+        rgb, w, h, low, high = await self.process(img_path, task_id, params)
+        return self.buffers.share(np.frombuffer(rgb, dtype=np.uint8).reshape((h, w, 3))), w, h, low, high
+
+    async def measure_shared(self, img_path: str | pathlib.Path, task_id: str, params: dict) -> Optional['Lease']:
+        """同 measure，温度矩阵放在共享块中，调用方用完后 release"""
+        temp_data = await self.measure(img_path, task_id, params)
+        return self.buffers.share(temp_data) if temp_data is not None else None
+
+def read_into(path: str | pathlib.Path, lease: 'Lease'):
+    """把文件内容直接读入共享块，不经过中间的 bytes"""
+    with open(path, mode='rb') as f:
+        f.readinto(lease.shm.buf[:lease.ref.nbytes])
+
+class CliBackend(DecodeBackend):
+    """调用 dji_irp 可执行文件，通过临时文件与标准输出交换数据"""
+    name = 'cli'
+
+    def __init__(self, cli_path: str | pathlib.Path, temp_dir: str | pathlib.Path):
+        self.cli_path = cli_path
+        self.temp_dir = temp_dir
+
+    def attach(self, executor, temp_dir=None, buffers=None):
+        super().attach(executor, temp_dir, buffers)
+        if temp_dir is not None:
+            self.temp_dir = temp_dir
+
+    @staticmethod
+    def param_args(params: dict) -> list[str]:
+        args = []
+        for key in MEASURE_PARAMS:
+            if params.get(key):
+                args += [f"--{key}", str(params[key])]
+        return args
+
+    async def _exec(self, *cmd: str | pathlib.Path, stderr: bool = True) -> tuple[int, str]:
+        proc = await asyncio.create_subprocess_exec(
+            self.cli_path, *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE if stderr else None,
+            creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        try:
+            stdout, _ = await proc.communicate()
+        finally:
+            # 任务被取消时结束 dji_irp，避免子进程继续占用 CPU 并写入临时文件
+            if proc.returncode is None:
+                proc.kill()
+        return proc.returncode, stdout.decode(locale.getencoding())
+
+    @staticmethod
+    def parse_size(result: str) -> tuple[int, int]:
+        w, h = 0, 0
+        for line in result.split('\n'):
+            if "image  width" in line:
+                w = int(line.split(':')[-1].strip())
+            if "image height" in line:
+                h = int(line.split(':')[-1].strip())
+        return w, h
+
+    async def _process(self, img_path, task_id, params) -> tuple[pathlib.Path, int, int, Optional[float], Optional[float]]:
+        raw_out = pathlib.Path(self.temp_dir) / f"{task_id}.raw"
+
+        # 生成伪彩色图像数据 (RGB 格式)
+        cmd = [
+            "-a", "process", "-s", str(img_path), "-o", raw_out,
+            "--brightness", str(params.get('brightness', 50)),
+        ] + self.param_args(params) + \
+        (["-p", params['palette'],] if params.get('palette') else [])
+
+        _, result = await self._exec(*cmd)
+
+        # 解析 CLI 输出获取自适应温度范围
+        # 示例输出: Color bar adaptive range is [25.5, 36.8]
+        min_temp, max_temp = None, None
+        for line in result.split('\n'):
+            if "adaptive range" in line:
+                temps = line.split('[')[1].split(']')[0].split(',')
+                min_temp, max_temp = float(temps[0].strip()), float(temps[1].strip())
+        w, h = self.parse_size(result)
+        return raw_out, w, h, min_temp, max_temp
+
+    async def process(self, img_path, task_id, params):
+        raw_out, w, h, min_temp, max_temp = await self._process(img_path, task_id, params)
+
+        import aiofiles
+        try:
+            async with aiofiles.open(raw_out, "rb") as f:
+                data = await f.read()
+        finally:
+            raw_out.unlink(missing_ok=True)
+        return data, w, h, min_temp, max_temp
+
+    async def process_shared(self, img_path, task_id, params):
+        raw_out, w, h, min_temp, max_temp = await self._process(img_path, task_id, params)
+        lease = self.buffers.acquire((h, w, 3), 'uint8')
+        try:
+            await asyncio.to_thread(read_into, raw_out, lease)
+        except BaseException:
+            lease.release()
+            raise
+        finally:
+            raw_out.unlink(missing_ok=True)
+        return lease, w, h, min_temp, max_temp
+
+    async def _measure(self, img_path, task_id, params) -> tuple[pathlib.Path, Optional[tuple[int, int]]]:
+        """测温到临时文件，返回 (文件, (宽, 高))，失败时尺寸为 None"""
+        raw_out = pathlib.Path(self.temp_dir) / f"{task_id}.raw"
+
+        cmd = [
+            "-a", "measure", "--measurefmt", "float32", "-s", str(img_path), "-o", raw_out,
+        ] + self.param_args(params)
+
+        returncode, result = await self._exec(*cmd, stderr=False)
+        if not returncode == 0 or not raw_out.exists():
+            raw_out.unlink(missing_ok=True)
+            return raw_out, None
+        return raw_out, self.parse_size(result)
+
+    async def measure(self, img_path, task_id, params):
+        raw_out, size = await self._measure(img_path, task_id, params)
+        if size is None:
+            return None
+        try:
+            w, h = size
+
+            import numpy as np
+            import aiofiles
+            async with aiofiles.open(raw_out, mode='rb') as f:
+                return np.frombuffer(await f.read(), dtype=np.float32).reshape((h, w))
+        finally:
+            raw_out.unlink(missing_ok=True)
+
+    async def measure_shared(self, img_path, task_id, params):
+        raw_out, size = await self._measure(img_path, task_id, params)
+        if size is None:
+            return None
+        w, h = size
+        lease = self.buffers.acquire((h, w), 'float32')
+        try:
+            await asyncio.to_thread(read_into, raw_out, lease)
+        except BaseException:
+            lease.release()
+            raise
+        finally:
+            raw_out.unlink(missing_ok=True)
+        return lease
+
+    async def default_settings(self, img_path, missing):
+        # 对缺省的项设置一个非默认值，从 "Change xxx from A to B" 的输出中得到默认值 A
+        probe = {'distance': "1.0", 'humidity': "20.0", 'emissivity': "0.10", 'ambient': "0.0", 'reflection': "0.0"}
+        cmd = [
+            "-a", "measure", "-s", str(img_path), "-o", "NUL" if os.name == 'nt' else "/dev/null",
+        ]
+        for key in missing:
+            cmd += [f"--{key}", probe[key]]
+        returncode, result = await self._exec(*cmd)
+        default_vals = dict()
+        for line in result.split('\n'):
+            if (matched := re.match(r'Change (\w+) from ([+-]?(?:\d+\.?\d*|\.\d+)) to [+-]?(?:\d+\.?\d*|\.\d+)', line)):
+                param, default_val = matched.groups()
+                default_vals[param.split('_')[0]] = float(default_val)
+        return default_vals if returncode == 0 else None
+
+# ---- DJI Thermal SDK (libdirp) ----
+
+class _DirpResolution(ctypes.Structure):
+    _fields_ = [('width', ctypes.c_int32), ('height', ctypes.c_int32)]
+
+class _DirpMeasurementParams(ctypes.Structure):
+    _fields_ = [
+        ('distance', ctypes.c_float),
+        ('humidity', ctypes.c_float),
+        ('emissivity', ctypes.c_float),
+        ('reflection', ctypes.c_float),
+        ('ambient_temp', ctypes.c_float),
+    ]
+
+class _DirpColorBar(ctypes.Structure):
+    _fields_ = [('manual_enable', ctypes.c_bool), ('high', ctypes.c_float), ('low', ctypes.c_float)]
+
+class _DirpEnhancementParams(ctypes.Structure):
+    _fields_ = [('brightness', ctypes.c_int32)]
+
+# 每个工作进程只加载一次 SDK
+_dirp_lib: Optional[ctypes.CDLL] = None
+
+def find_sdk_library(cli_path: Optional[str | pathlib.Path] = None) -> Optional[str]:
+    """SDK 的动态库与 dji_irp 位于同一目录，找不到时再在系统路径中搜索"""
+    lib_name = 'libdirp.dll' if os.name == 'nt' else 'libdirp.so'
+    if cli_path and (candidate := pathlib.Path(cli_path).parent / lib_name).exists():
+        return str(candidate)
+    return ctypes.util.find_library('dirp')
+
+class SdkLoadError(RuntimeError):
+    """工作进程中无法加载 SDK 动态库 (文件缺失、架构不符或缺少导出函数)"""
+
+def _load_dirp(lib_path: str) -> ctypes.CDLL:
+    global _dirp_lib
+    if _dirp_lib is None:
+        try:
+            if os.name == 'nt':
+                os.add_dll_directory(str(pathlib.Path(lib_path).parent))
+            lib = ctypes.CDLL(lib_path)
+            lib.dirp_create_from_rjpeg
+        except (OSError, AttributeError) as e:
+            raise SdkLoadError(f"Cannot load DJI Thermal SDK library {lib_path}: {e}") from None
+        handle_p = ctypes.POINTER(ctypes.c_void_p)
+        lib.dirp_create_from_rjpeg.argtypes = [ctypes.c_char_p, ctypes.c_int32, handle_p]
+        lib.dirp_destroy.argtypes = [ctypes.c_void_p]
+        lib.dirp_get_rjpeg_resolution.argtypes = [ctypes.c_void_p, ctypes.POINTER(_DirpResolution)]
+        lib.dirp_get_measurement_params.argtypes = [ctypes.c_void_p, ctypes.POINTER(_DirpMeasurementParams)]
+        lib.dirp_set_measurement_params.argtypes = [ctypes.c_void_p, ctypes.POINTER(_DirpMeasurementParams)]
+        lib.dirp_set_pseudo_color.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.dirp_set_enhancement_params.argtypes = [ctypes.c_void_p, ctypes.POINTER(_DirpEnhancementParams)]
+        lib.dirp_get_color_bar_adaptive_params.argtypes = [ctypes.c_void_p, ctypes.POINTER(_DirpColorBar)]
+        lib.dirp_process.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int32]
+        lib.dirp_measure_ex.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int32]
+        lib.dirp_set_verbose_level.argtypes = [ctypes.c_int]
+        lib.dirp_set_verbose_level(0)
+        _dirp_lib = lib
+    return _dirp_lib
+
+def _dirp_check(code: int, func: str):
+    if code != 0:
+        raise RuntimeError(f"{func} failed with DIRP error {code}")
+
+class _DirpImage:
+    """持有一个 DIRP 句柄，离开作用域时释放"""
+    def __init__(self, lib_path: str, img_path: str | pathlib.Path):
+        self.lib = _load_dirp(lib_path)
+        with open(img_path, mode='rb') as f:
+            self.data = f.read()
+        self.handle = ctypes.c_void_p()
+        _dirp_check(self.lib.dirp_create_from_rjpeg(self.data, len(self.data), ctypes.byref(self.handle)), 'dirp_create_from_rjpeg')
+        resolution = _DirpResolution()
+        _dirp_check(self.lib.dirp_get_rjpeg_resolution(self.handle, ctypes.byref(resolution)), 'dirp_get_rjpeg_resolution')
+        self.width, self.height = resolution.width, resolution.height
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.lib.dirp_destroy(self.handle)
+
+    def get_params(self) -> _DirpMeasurementParams:
+        measurement = _DirpMeasurementParams()
+        _dirp_check(self.lib.dirp_get_measurement_params(self.handle, ctypes.byref(measurement)), 'dirp_get_measurement_params')
+        return measurement
+
+    def apply_params(self, params: dict):
+        measurement = self.get_params()
+        for key in MEASURE_PARAMS:
+            if params.get(key):
+                setattr(measurement, 'ambient_temp' if key == 'ambient' else key, float(params[key]))
+        _dirp_check(self.lib.dirp_set_measurement_params(self.handle, ctypes.byref(measurement)), 'dirp_set_measurement_params')
+
+def sdk_process(lib_path: str, img_path: str | pathlib.Path, params: dict, out: Optional[BufferRef] = None):
+    """
+    在工作进程中执行: 伪彩色处理
+
+    out 为足够大的共享块时直接写入其中，返回的数据为 None
+    """
+    with _DirpImage(lib_path, img_path) as image:
+        image.apply_params(params)
+        if params.get('palette'):
+            _dirp_check(image.lib.dirp_set_pseudo_color(image.handle, PALETTE_NAMES.index(params['palette'])), 'dirp_set_pseudo_color')
+        enhancement = _DirpEnhancementParams(int(params.get('brightness', 50)))
+        _dirp_check(image.lib.dirp_set_enhancement_params(image.handle, ctypes.byref(enhancement)), 'dirp_set_enhancement_params')
+        shape = (image.height, image.width, 3)
+        shared = out is not None and out._replace(shape=shape).nbytes <= out.nbytes
+        if shared:
+            rgb = attach(out, shape)
+            _dirp_check(image.lib.dirp_process(image.handle, rgb.ctypes.data, rgb.nbytes), 'dirp_process')
+        else:
+            rgb = ctypes.create_string_buffer(image.width * image.height * 3)
+            _dirp_check(image.lib.dirp_process(image.handle, rgb, len(rgb)), 'dirp_process')
+        color_bar = _DirpColorBar()
+        _dirp_check(image.lib.dirp_get_color_bar_adaptive_params(image.handle, ctypes.byref(color_bar)), 'dirp_get_color_bar_adaptive_params')
+        return None if shared else rgb.raw, image.width, image.height, float(color_bar.low), float(color_bar.high)
+
+def sdk_measure(lib_path: str, img_path: str | pathlib.Path, params: dict, out: Optional[BufferRef] = None):
+    """
+    在工作进程中执行: 测温，返回 (温度矩阵, 宽, 高)
+
+    out 为足够大的共享块时直接写入其中，返回的矩阵为 None
+    """
+    import numpy as np
+    with _DirpImage(lib_path, img_path) as image:
+        image.apply_params(params)
+        shape = (image.height, image.width)
+        shared = out is not None and out._replace(shape=shape).nbytes <= out.nbytes
+        temp_data = attach(out, shape) if shared else np.empty(shape, dtype=np.float32)
+        _dirp_check(image.lib.dirp_measure_ex(image.handle, temp_data.ctypes.data, temp_data.nbytes), 'dirp_measure_ex')
+        return None if shared else temp_data, image.width, image.height
+
+def sdk_default_settings(lib_path: str, img_path: str | pathlib.Path):
+    """在工作进程中执行: 读取图像内的测温参数"""
+    with _DirpImage(lib_path, img_path) as image:
+        measurement = image.get_params()
+        return {key: round(float(getattr(measurement, 'ambient_temp' if key == 'ambient' else key)), 2) for key in MEASURE_PARAMS}
+
+class SdkBackend(DecodeBackend):
+    """
+    直接加载 SDK 动态库 (libdirp)，在会话的工作进程中解码
+
+    省去每次调用 dji_irp 的进程创建、SDK 初始化与文本解析，结果直接在内存中返回
+    """
+    name = 'sdk'
+
+    def __init__(self, lib_path: str | pathlib.Path):
+        self.lib_path = str(lib_path)
+        self.executor: Optional[Executor] = None
+        # 最近一帧的 (高, 宽)，工作进程据此预先得到共享块，直接写入解码结果
+        self.frame_size: Optional[tuple[int, int]] = None
+
+    def attach(self, executor, temp_dir=None, buffers=None):
+        super().attach(executor, temp_dir, buffers)
+        self.executor = executor
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, self.lib_path, *args)
+
+    async def _call_shared(self, func, img_path, params, channels: tuple[int, ...], dtype: str):
+        """
+        在工作进程中解码到共享块，返回 (租约, 宽, 高, 其余结果...)
+
+        第一帧或分辨率变化时尺寸未知，工作进程照常返回数据，再复制进共享块
+        """
+        lease = self.buffers.acquire(self.frame_size + channels, dtype) if self.frame_size else None
+        try:
+            data, w, h, *rest = await self._call(func, str(img_path), params, lease.ref if lease else None)
+        except BaseException:
+            if lease is not None:
+                lease.release()
+            raise
+        self.frame_size = (h, w)
+        if data is None:
+            lease.resize((h, w) + channels)
+            return lease, w, h, *rest
+        if lease is not None:
+            lease.release()
+        import numpy as np
+        return self.buffers.share(np.frombuffer(data, dtype=dtype).reshape((h, w) + channels)), w, h, *rest
+
+    async def process(self, img_path, task_id, params):
+        return await self._call(sdk_process, str(img_path), params)
+
+    async def measure(self, img_path, task_id, params):
+        temp_data, _, _ = await self._call(sdk_measure, str(img_path), params)
+        return temp_data
+
+    async def process_shared(self, img_path, task_id, params):
+        return await self._call_shared(sdk_process, img_path, params, (3,), 'uint8')
+
+    async def measure_shared(self, img_path, task_id, params):
+        lease, _, _ = await self._call_shared(sdk_measure, img_path, params, (), 'float32')
+        return lease
+
+    async def default_settings(self, img_path, missing):
+        defaults = await self._call(sdk_default_settings, str(img_path))
+        return {key: defaults[key] for key in missing}
+
+class FallbackBackend(DecodeBackend):
+    """
+    优先使用 SdkBackend，工作进程中加载 SDK 失败时改用 CliBackend
+
+    切换只发生一次，失败的那次调用由 CliBackend 重新执行
+    """
+    name = 'auto'
+
+    def __init__(self, sdk: SdkBackend, cli: CliBackend):
+        self.sdk = sdk
+        self.cli = cli
+        self.active: DecodeBackend = sdk
+
+    def attach(self, executor, temp_dir=None, buffers=None):
+        super().attach(executor, temp_dir, buffers)
+        self.sdk.attach(executor, temp_dir, buffers)
+        self.cli.attach(executor, temp_dir, buffers)
+
+    async def _call(self, method: str, *args):
+        if self.active is self.sdk:
+            try:
+                return await getattr(self.sdk, method)(*args)
+            except SdkLoadError as e:
+                # 并发的调用可能同时失败，只提示一次
+                if self.active is self.sdk:
+                    print(f"{e}，改用 dji_irp 解码")
+                    self.active = self.cli
+        return await getattr(self.cli, method)(*args)
+
+    async def process(self, img_path, task_id, params):
+        return await self._call('process', img_path, task_id, params)
+
+    async def measure(self, img_path, task_id, params):
+        return await self._call('measure', img_path, task_id, params)
+
+    async def process_shared(self, img_path, task_id, params):
+        return await self._call('process_shared', img_path, task_id, params)
+
+    async def measure_shared(self, img_path, task_id, params):
+        return await self._call('measure_shared', img_path, task_id, params)
+
+    async def default_settings(self, img_path, missing):
+        return await self._call('default_settings', img_path, missing)
+
+class MockBackend(DecodeBackend):
+    """不依赖 SDK 的模拟后端，用于测试；温度场由文件路径确定，结果可重复"""
+    name = 'mock'
+
+    def __init__(self, width: int = 640, height: int = 512, defaults: Optional[dict[str, float]] = None):
+        self.width = width
+        self.height = height
+        self.defaults = defaults or {'distance': 5.0, 'humidity': 70.0, 'emissivity': 1.0, 'ambient': 25.0, 'reflection': 23.0}
+
+    def temperature(self, img_path: str | pathlib.Path) -> 'np.ndarray':
+        import numpy as np
+        seed = zlib.crc32(str(img_path).encode('utf-8'))
+        y, x = np.mgrid[0:self.height, 0:self.width].astype(np.float32)
+        cx, cy = seed % self.width, (seed >> 16) % self.height
+        hotspot = 30.0 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * (self.width / 20) ** 2))
+        return (20.0 + (seed % 100) / 10 + 5.0 * y / self.height + hotspot).astype(np.float32)
+
+    async def process(self, img_path, task_id, params):
+        from lut_registry import apply_lut, get_lut
+        temp_data = self.temperature(img_path)
+        low, high = float(temp_data.min()), float(temp_data.max())
+        rgb = apply_lut(temp_data, get_lut(params.get('palette') or 'iron_red'), low, high, brightness=params.get('brightness', 50))
+        return rgb.tobytes(), self.width, self.height, low, high
+
+    async def measure(self, img_path, task_id, params):
+        return self.temperature(img_path)
+
+    async def default_settings(self, img_path, missing):
+        return {key: self.defaults[key] for key in missing}
+
+def create_backend(
+        kind: Literal['cli', 'sdk', 'auto', 'mock'],
+        cli_path: Optional[str | pathlib.Path],
+        temp_dir: str | pathlib.Path,
+        sdk_lib: Optional[str | pathlib.Path] = None
+    ) -> DecodeBackend:
+    """auto 优先使用 SDK，找不到或无法加载动态库时改用 dji_irp"""
+    if kind in ('sdk', 'auto'):
+        lib_path = sdk_lib or find_sdk_library(cli_path)
+        if not lib_path or (sdk_lib and not pathlib.Path(sdk_lib).exists()):
+            if kind == 'sdk' or not cli_path:
+                raise FileNotFoundError("Cannot find DJI Thermal SDK library (libdirp)")
+            print(f"未找到 SDK 动态库 (libdirp)，使用 dji_irp 解码: {cli_path}")
+            return CliBackend(cli_path, temp_dir)
+        if kind == 'auto':
+            print(f"使用 SDK 解码: {lib_path}")
+            if cli_path:
+                return FallbackBackend(SdkBackend(lib_path), CliBackend(cli_path, temp_dir))
+        return SdkBackend(lib_path)
+    if kind == 'mock':
+        return MockBackend()
+    return CliBackend(cli_path, temp_dir)
@@ -0,0 +1,81 @@
+"""
+CLI 启动耗时基准
+
+在独立的子进程中多次测量 模块导入 与 典型的轻量命令 的耗时，
+并检查这些路径上是否加载了 PDF / 图像相关的重型依赖。
+
+    python benchmarks/import_time.py [-n 10] [--check] [--importtime]
+"""
+import argparse, statistics, subprocess, sys, time, os, pathlib
+
+ROOT = pathlib.Path(__file__).absolute().parent.parent
+
+# 这些依赖只应在真正生成报告 / 处理图像时加载
+HEAVY_MODULES = ('fitz', 'pymupdf', 'jinja2', 'PIL.Image', 'exifread', 'xmltodict', 'aiofiles', 'weasyprint', 'numpy', 'tifffile')
+
+CASES: dict[str, list[str]] = {
+    'import generator': ['-c', 'import generator'],
+    'import cli': ['-c', 'import cli'],
+    'cli.py --help': ['cli.py', '--help'],
+    'cli.py report --help': ['cli.py', 'report', '--help'],
+    'cli.py palette --help': ['cli.py', 'palette', '--help'],
+    'cli.py report (bad option)': ['cli.py', 'report', '--brightness', '101'],
+}
+
+# 导入后仍不应出现重型依赖的模块
+LIGHT_IMPORTS = ('generator', 'cli', 'backends', 'shard', 'journal', 'analysis', 'summary', 'archive', 'catalog', 'spatial', 'report_index', 'fitz_render', 'shm_pool', 'lut_registry')
+
+def run_once(args: list[str]) -> float:
+    begin = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=dict(os.environ, COLUMNS='120'))
+    return (time.perf_counter() - begin) * 1000
+
+def loaded_heavy_modules(module: str) -> list[str]:
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return result.stdout.split()
+
+def importtime_top(module: str, top: int = 15) -> list[tuple[int, str]]:
+    """解析 -X importtime 的输出，返回累计耗时最大的模块 (微秒, 模块名)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='runs per case')
+    parser.add_argument('--check', action='store_true', help='exit 1 if a light import path loads heavy modules')
+    parser.add_argument('--importtime', action='store_true', help='show the slowest imports of cli')
+    args = parser.parse_args()
+
+    print(f"{'case':<32}{'min(ms)':>10}{'median(ms)':>12}")
+    for name, case_args in CASES.items():
+        run_once(case_args) # 预热文件系统缓存
+        samples = [run_once(case_args) for _ in range(args.repeat)]
+        print(f"{name:<32}{min(samples):>10.1f}{statistics.median(samples):>12.1f}")
+
+    print()
+    failed = False
+    for module in LIGHT_IMPORTS:
+        heavy = loaded_heavy_modules(module)
+        failed |= bool(heavy)
+        print(f"import {module:<12} heavy modules: {', '.join(heavy) if heavy else '-'}")
+
+    if args.importtime:
+        print()
+        for cumulative, name in importtime_top('cli'):
+            print(f"{cumulative / 1000:>8.1f} ms  {name}")
+
+    if args.check and failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+R-JPEG 元数据目录
+
+把解析过的 EXIF / XMP 字段保存在 SQLite 数据库中，以 路径 + 文件大小 + 修改时间 判断是否需要重新解析，
+并在 拍摄时间、序列号、经纬度网格 上建立索引，按条件筛选输入文件时无需再读取图像。
+
+    catalog = Catalog(default_catalog_path())
+    catalog.ingest(['/data/flight_0501'])
+    paths = catalog.query(sn='XXXXXXXX', start='2026-05-01 10:00', end='2026-05-01 12:00', bbox=(30.5, 114.3, 30.6, 114.4))
+"""
+import os, json, math, sqlite3, pathlib, datetime
+from typing import Optional, Iterable, Callable
+
+CATALOG_NAME = 'dji_timgrg_catalog.sqlite3'
+# 数据表结构变化时递增，旧数据库会被重建
+SCHEMA_VERSION = 1
+# 经纬度网格大小 (度)，约 1 km
+GRID_SIZE = 0.01
+# 超过该数量的文件需要解析时使用进程池
+PARALLEL_MIN = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    thermal INTEGER NOT NULL,
+    model TEXT,
+    sn TEXT,
+    create_time TEXT,
+    lat REAL,
+    lon REAL,
+    alt REAL,
+    cell_lat INTEGER,
+    cell_lon INTEGER,
+    palette TEXT,
+    focal_length TEXT,
+    aperture TEXT,
+    defaults TEXT
+);
+CREATE INDEX IF NOT EXISTS images_time ON images (create_time);
+CREATE INDEX IF NOT EXISTS images_sn_time ON images (sn, create_time);
+CREATE INDEX IF NOT EXISTS images_cell ON images (cell_lat, cell_lon);
+"""
+
+def default_catalog_path() -> pathlib.Path:
+    """与 dji_timgrg_config.json 放在同一目录"""
+    from utils import get_executable_path
+    return pathlib.Path(get_executable_path()).parent / CATALOG_NAME
+
+def grid_cell(value: float) -> int:
+    return math.floor(value / GRID_SIZE)
+
+def parse_time(value: str | datetime.datetime) -> str:
+    """接受 ISO 格式或 DJI 的 "%Y/%m/%d %H:%M:%S"，返回可按字符串排序的 "%Y-%m-%d %H:%M:%S" """
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.strip().replace('/', '-'))
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_selection(text: str) -> dict:
+    """
+    解析 --select 的筛选条件，多个条件以分号分隔:
+
+        sn=XXXXXXXX;start=2026-05-01 10:00;end=2026-05-01 12:00;bbox=30.5,114.3,30.6,114.4
+    """
+    keys = {'sn', 'model', 'start', 'end', 'bbox'}
+    selection = dict()
+    for part in text.split(';'):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition('=')
+        key = key.strip().lower()
+        if not sep or key not in keys:
+            raise ValueError(f"Invalid selection '{part}', expected one of {', '.join(sorted(keys))} as key=value")
+        if key == 'bbox':
+            bbox = tuple(float(v) for v in value.split(','))
+            if len(bbox) != 4:
+                raise ValueError("bbox must be lat0,lon0,lat1,lon1")
+            selection[key] = bbox
+        else:
+            selection[key] = value.strip()
+    return selection
+
+def read_record(path: str) -> dict:
+    """在工作进程中执行: 解析一张图像，返回要写入目录的字段"""
+    from generator import ThermalReportGenerator
+
+    try:
+        meta = ThermalReportGenerator.get_metadata(path)
+    except Exception:
+        meta = None
+    if meta is None:
+        return {'thermal': 0}
+    lat, lon, alt = meta['raw_gps']
+    # convert_to_decimal 解析失败时为 0.0，视为没有定位
+    has_gps = bool(lat or lon)
+    return {
+        'thermal': 1,
+        'model': meta['model'],
+        'sn': meta['sn'],
+        'create_time': parse_time(meta['create_time']),
+        'lat': lat if has_gps else None,
+        'lon': lon if has_gps else None,
+        'alt': float(alt) if has_gps else None,
+        'cell_lat': grid_cell(lat) if has_gps else None,
+        'cell_lon': grid_cell(lon) if has_gps else None,
+        'palette': meta['palette'],
+        'focal_length': meta['focal_length'],
+        'aperture': meta['aperture'],
+    }
+
+class Catalog:
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS images")
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    @staticmethod
+    def list_images(sources: Iterable[str | pathlib.Path]) -> list[str]:
+        """展开文件夹 (不递归)，只保留 JPEG"""
+        images = []
+        for source in sources:
+            source = pathlib.Path(source).absolute()
+            if source.is_dir():
+                images += [str(source / f) for f in sorted(os.listdir(source)) if f.lower().endswith(('.jpg', '.jpeg'))]
+            elif source.name.lower().endswith(('.jpg', '.jpeg')):
+                images.append(str(source))
+        return images
+
+    def ingest(self,
+            sources: Iterable[str | pathlib.Path],
+            max_workers: Optional[int] = None,
+            on_progress: Optional[Callable[[int, int], None]] = None
+        ) -> tuple[list[str], int]:
+        """
+        登记文件夹 / 文件，只解析新增或修改过的图像
+
+        返回 (全部图像路径, 重新解析的数量)
+        """
+        images = self.list_images(sources)
+        known = dict()
+        for i in range(0, len(images), 500):
+            chunk = images[i:i + 500]
+            known.update(
+                (row['path'], (row['size'], row['mtime_ns']))
+                for row in self.conn.execute(f"SELECT path, size, mtime_ns FROM images WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+            )
+        changed: list[tuple[str, int, int]] = []
+        for img in images:
+            try:
+                stat = os.stat(img)
+            except OSError:
+                continue
+            if known.get(img) != (stat.st_size, stat.st_mtime_ns):
+                changed.append((img, stat.st_size, stat.st_mtime_ns))
+
+        if len(changed) >= PARALLEL_MIN:
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+                records = executor.map(read_record, [img for img, _, _ in changed], chunksize=16)
+                self._store(changed, records, on_progress)
+        else:
+            self._store(changed, map(read_record, [img for img, _, _ in changed]), on_progress)
+        return images, len(changed)
+
+    def _store(self, changed: list[tuple[str, int, int]], records: Iterable[dict], on_progress: Optional[Callable[[int, int], None]]):
+        with self.conn:
+            for i, ((img, size, mtime_ns), record) in enumerate(zip(changed, records)):
+                # 文件变化后旧的 SDK 默认参数失效
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO images (path, size, mtime_ns, thermal, model, sn, create_time, lat, lon, alt, "
+                    "cell_lat, cell_lon, palette, focal_length, aperture, defaults) "
+                    "VALUES (:path, :size, :mtime_ns, :thermal, :model, :sn, :create_time, :lat, :lon, :alt, "
+                    ":cell_lat, :cell_lon, :palette, :focal_length, :aperture, NULL)",
+                    {
+                        'model': None, 'sn': None, 'create_time': None, 'lat': None, 'lon': None, 'alt': None,
+                        'cell_lat': None, 'cell_lon': None, 'palette': None, 'focal_length': None, 'aperture': None,
+                        **record, 'path': img, 'size': size, 'mtime_ns': mtime_ns
+                    }
+                )
+                if on_progress:
+                    on_progress(i + 1, len(changed))
+
+    def query(self,
+            paths: Optional[Iterable[str]] = None,
+            sn: Optional[str] = None,
+            model: Optional[str] = None,
+            start: Optional[str | datetime.datetime] = None,
+            end: Optional[str | datetime.datetime] = None,
+            bbox: Optional[tuple[float, float, float, float]] = None
+        ) -> list[str]:
+        """
+        按条件筛选红外图像，按拍摄时间排序
+
+        paths 不为 None 时只在其中筛选；bbox 为 (lat0, lon0, lat1, lon1)，先按网格索引粗筛再精确比较
+        """
+        where, args = ["thermal = 1"], []
+        if sn is not None:
+            where.append("sn = ?")
+            args.append(sn)
+        if model is not None:
+            where.append("model = ?")
+            args.append(model)
+        if start is not None:
+            where.append("create_time >= ?")
+            args.append(parse_time(start))
+        if end is not None:
+            where.append("create_time <= ?")
+            args.append(parse_time(end))
+        if bbox is not None:
+            lat0, lat1 = sorted(bbox[0::2])
+            lon0, lon1 = sorted(bbox[1::2])
+            where.append("cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ? AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+            args += [grid_cell(lat0), grid_cell(lat1), grid_cell(lon0), grid_cell(lon1), lat0, lat1, lon0, lon1]
+        rows = self.conn.execute(f"SELECT path FROM images WHERE {' AND '.join(where)} ORDER BY create_time, path", args)
+        result = [row['path'] for row in rows]
+        if paths is not None:
+            allowed = set(str(p) for p in paths)
+            result = [p for p in result if p in allowed]
+        return result
+
+    def get(self, path: str | pathlib.Path) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM images WHERE path = ?", (str(pathlib.Path(path).absolute()),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _current_row(self, path: str | pathlib.Path) -> Optional[sqlite3.Row]:
+        """文件未变化时返回其记录"""
+        path = str(pathlib.Path(path).absolute())
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return self.conn.execute(
+            "SELECT * FROM images WHERE path = ? AND size = ? AND mtime_ns = ?", (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+
+    def get_defaults(self, path: str | pathlib.Path) -> dict[str, float]:
+        """已保存的 SDK 默认测温参数"""
+        row = self._current_row(path)
+        return json.loads(row['defaults']) if row is not None and row['defaults'] else dict()
+
+    def set_defaults(self, path: str | pathlib.Path, values: dict[str, float]):
+        """合并保存 SDK 默认测温参数，目录中没有该文件 (或文件已变化) 时忽略"""
+        row = self._current_row(path)
+        if row is None:
+            return
+        merged = {**(json.loads(row['defaults']) if row['defaults'] else dict()), **values}
+        with self.conn:
+            self.conn.execute("UPDATE images SET defaults = ? WHERE path = ?", (json.dumps(merged), row['path']))
+
+    def prune(self) -> int:
+        """删除已不存在的文件的记录，返回删除数"""
+        missing = [row['path'] for row in self.conn.execute("SELECT path FROM images") if not os.path.exists(row['path'])]
+        with self.conn:
+            self.conn.executemany("DELETE FROM images WHERE path = ?", [(p,) for p in missing])
+        return len(missing)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
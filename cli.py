@@ -1,10 +1,60 @@
 import typer, pathlib, asyncio, os, shutil
-from rich.progress import Progress, MofNCompleteColumn, BarColumn, TimeRemainingColumn, TextColumn
-from generator import ThermalReportGenerator
+from shard import parse_shard, load_manifests, ordered_pages
 from typing import Literal, Annotated, Optional
 
+# generator / backends / rich.progress 在命令内导入，--help 与参数错误无需加载 PDF 相关依赖
+
 app = typer.Typer(help="A tool to generate report of DJI R-JPEG (Thermal Image) based on [b i]dji_irp[/b i]")
 
+def install_cancel_handler(gen, finalize: bool = False):
+    """第一次 Ctrl-C 取消任务并清理临时文件，再次按下时直接退出"""
+    import signal
+    loop = asyncio.get_running_loop()
+
+    def on_interrupt():
+        print("\n正在取消，再次按下 Ctrl-C 强制退出...")
+        restore()
+        gen.cancel(finalize=finalize)
+
+    if os.name == 'nt':
+        # Windows 的事件循环不支持 add_signal_handler
+        previous = signal.signal(signal.SIGINT, lambda *_: loop.call_soon_threadsafe(on_interrupt))
+        restore = lambda: signal.signal(signal.SIGINT, previous)
+    else:
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
+        restore = lambda: loop.remove_signal_handler(signal.SIGINT)
+
+def select_inputs(
+        select: Optional[str],
+        catalog_path: Optional[pathlib.Path],
+        input_dir: Optional[pathlib.Path],
+        input_files: list[pathlib.Path],
+        max_workers: Optional[int] = None
+    ):
+    """
+    登记输入文件并按 --select 条件筛选，返回 (目录, 输入文件)
+
+    没有指定 --select / --catalog 时不使用目录，原样返回输入文件
+    """
+    if not select and not catalog_path:
+        return None, input_files
+    from catalog import Catalog, parse_selection, default_catalog_path
+
+    selection = parse_selection(select) if select else dict()
+    catalog = Catalog(catalog_path or default_catalog_path())
+    sources = ([input_dir] if input_dir else []) + list(input_files)
+    paths = None
+    if sources:
+        paths, changed = catalog.ingest(sources, max_workers)
+        print(f"目录已更新: {len(paths)} 张图片, 重新解析 {changed} 张")
+    files = [pathlib.Path(p) for p in catalog.query(paths, **selection)]
+    if not files:
+        print("没有符合条件的图片")
+        catalog.close()
+        raise typer.Exit(1)
+    print(f"符合条件: {len(files)} 张图片")
+    return catalog, files
+
 @app.command(help="Generate thermal image reports. Auto detect [b i]dji_irp[/b i] if it's in [b]$PATH[/b] or working dir.")
 def report(
     input_dir: Annotated[
@@ -16,6 +66,12 @@ def report(
     input_files: Annotated[
         list[pathlib.Path], typer.Option("--input", "-i", help="Your input files (Alternative)")
     ] = [],
+    select: Annotated[
+        Optional[str], typer.Option("--select", help='Only process catalogued images matching e.g. "sn=XXXX;start=2026-05-01 10:00;end=2026-05-01 12:00;bbox=lat0,lon0,lat1,lon1", the inputs (if any) are catalogued first')
+    ] = None,
+    catalog_path: Annotated[
+        Optional[pathlib.Path], typer.Option("--catalog", help='SQLite metadata catalog, defaults to the one next to the GUI config')
+    ] = None,
     output_dir: Annotated[
         pathlib.Path, typer.Option("--output", "-o", help="Directory for saving PDFs")
     ] = pathlib.Path('./reports'),
@@ -46,6 +102,9 @@ def report(
                 'rainbow2', 'tint', 'black_hot', 'keep'], 
         typer.Option("--palette", "-p")
     ] = 'keep',
+    lut: Annotated[
+        Optional[str], typer.Option("--lut", help="Custom palette overriding [b]--palette[/b]: a name from [b]luts/custom[/b], a JSON / CSV / raw LUT file or gradient stops like [b]'0:#000000,0.5:#ff0000,1:#ffffff'[/b]. Colorized locally from the temperatures")
+    ] = None,
     colorbar_width: Annotated[
         int, typer.Option("--cbwidth", "-cbw", min=1, max=100, help='Width of Temperature-Color Bar')
     ] = 10,
@@ -55,6 +114,9 @@ def report(
     weasy_lib: Annotated[
         bool, typer.Option(help='Use WeasyPrint executable instead of Library in Windows')
     ] = False if os.name == 'nt' else True,
+    engine: Annotated[
+        Literal['weasyprint', 'fitz'], typer.Option("--engine", help='Page layout engine: [b]weasyprint[/b] renders template.html, [b]fitz[/b] draws the pages directly into the final PDF with PyMuPDF (much faster, fixed layout)')
+    ] = 'weasyprint',
     img_format: Annotated[
         Literal['png', 'jpeg'], typer.Option('--img-format', '--iformat', help='Choose JPEG may lead to smaller PDF')
     ] = 'png',
@@ -70,16 +132,82 @@ def report(
     ] = '4:4:4',
     max_workers: Annotated[
         int, typer.Option("--workers", "-ws", min=1, help='Max workers of concurrent process')
-    ] = 4
+    ] = 4,
+    backend: Annotated[
+        Literal['cli', 'sdk', 'auto'], typer.Option("--backend", help='Decode through the [b i]dji_irp[/b i] executable, load the SDK library (libdirp) in worker processes, or try the SDK first and fall back to [b i]dji_irp[/b i] (auto)')
+    ] = 'cli',
+    sdk_lib: Annotated[
+        Optional[pathlib.Path], typer.Option("--sdk-lib", help='Path to libdirp.so / libdirp.dll, defaults to the directory of [b i]dji_irp[/b i]')
+    ] = None,
+    resume: Annotated[
+        bool, typer.Option("--resume", help='Skip inputs already finished by an interrupted run and reuse their rendered pages')
+    ] = False,
+    temp_quota: Annotated[
+        Optional[int], typer.Option("--temp-quota", min=1, help='Max size of temporary files in MB, new images wait when exceeded (default: half of the free space)')
+    ] = None,
+    ram_temp: Annotated[
+        bool, typer.Option("--ram-temp/--no-ram-temp", help='Keep temporary files in /dev/shm when it has enough free space')
+    ] = True,
+    shard: Annotated[
+        Optional[str], typer.Option("--shard", help='Only process shard i of N (e.g. 1/4), outputs shard files and a manifest for [b]merge[/b]')
+    ] = None,
+    shard_by: Annotated[
+        Literal['path', 'time'], typer.Option("--shard-by", help='Partition inputs by path hash or by capture time ranges')
+    ] = 'path',
+    triage_max: Annotated[
+        Optional[float], typer.Option("--triage-max", help='Triage: only render full pages for images whose max temperature reaches this value (°C)')
+    ] = None,
+    triage_delta: Annotated[
+        Optional[float], typer.Option("--triage-delta", min=0, help='Triage: only render full pages for images whose temperature range (max - min) reaches this value (°C)')
+    ] = None,
+    analysis: Annotated[
+        bool, typer.Option("--analysis", help='Measure the radiometric data of every image and add temperature statistics and hotspots to the report, with a JSON sidecar')
+    ] = False,
+    roi: Annotated[
+        Optional[pathlib.Path], typer.Option("--roi", exists=True, dir_okay=False, help='JSON file of rectangle / polygon ROIs to evaluate (implies [b]--analysis[/b])')
+    ] = None,
+    hotspot_threshold: Annotated[
+        Optional[float], typer.Option("--hotspot-threshold", help='Temperature (°C) above which connected regions count as hotspots, defaults to the 99th percentile of each image')
+    ] = None,
+    summary: Annotated[
+        bool, typer.Option("--summary", help='Add a batch summary page (hottest images, temperature histograms, per-drone / per-hour aggregates) and a JSON summary')
+    ] = False,
+    summary_top: Annotated[
+        int, typer.Option("--summary-top", min=1, help='Number of hottest images listed in the batch summary')
+    ] = 10,
+    site_radius: Annotated[
+        Optional[float], typer.Option("--site-radius", min=1, help='Group images taken within this distance (m) of each other into sites, pages are ordered by site with one bookmark per site')
+    ] = None,
+    site_split: Annotated[
+        bool, typer.Option("--site-split", help='With [b]--site-radius[/b], write one report per site (merged in parallel) instead of sections')
+    ] = False,
+    volume_pages: Annotated[
+        Optional[int], typer.Option("--volume-pages", min=1, help='Split the report into volumes of at most this many pages, each merged in its own worker process')
+    ] = None,
+    volume_size: Annotated[
+        Optional[int], typer.Option("--volume-size", min=1, help='Split the report into volumes of about this many MB')
+    ] = None,
+    append: Annotated[
+        Optional[pathlib.Path], typer.Option("--append", exists=True, dir_okay=False, help='Only render inputs missing from this existing report and insert their pages by capture time (incremental save, the summary page is not updated)')
+    ] = None,
+    partial_on_cancel: Annotated[
+        bool, typer.Option("--partial-on-cancel", help='When interrupted by Ctrl-C, still merge the pages already rendered into a partial report')
+    ] = False
 ):
+    from rich.progress import Progress, MofNCompleteColumn, BarColumn, TimeRemainingColumn, TextColumn
+    from generator import ThermalReportGenerator
+    from backends import create_backend
+    from analysis import load_rois
+
     if not cli_path:
         cli_path = shutil.which("dji_irp")
     if not cli_path or not pathlib.Path(cli_path).exists():
         raise FileNotFoundError("Cannot find dji_irp executable")
-    if not input_dir and not input_files:
+    if not input_dir and not input_files and not select:
         raise ValueError("No any input")
-    if not weasy_lib and not shutil.which('weasyprint'):
+    if engine == 'weasyprint' and not weasy_lib and not shutil.which('weasyprint'):
         raise FileNotFoundError("Invaild WreayPrint executable path")
+    shard_spec = parse_shard(shard) if shard else None
     
     if ':' not in jpeg_subsampling:
         jpeg_subsampling = {
@@ -91,6 +219,8 @@ def report(
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+    catalog, input_files = select_inputs(select, catalog_path, input_dir, input_files, max_workers)
+
     async def __internal_async():
         gen = ThermalReportGenerator(
             input_dir=input_dir,
@@ -105,21 +235,41 @@ def report(
             reflection=reflection,
             brightness=brightness,
             palette=palette,
+            custom_lut=lut,
             colorbar_width=colorbar_width,
             colorbar_border=cbborder,
             img_format=img_format,
             png_compress=png_compress,
             jpeg_quality=jpeg_quality,
             jpeg_subsampling=jpeg_subsampling,
-            max_workers=max_workers
+            resume=resume,
+            triage_max=triage_max,
+            triage_delta=triage_delta,
+            analysis=analysis,
+            rois=load_rois(roi) if roi else None,
+            hotspot_threshold=hotspot_threshold,
+            summary=summary,
+            summary_top=summary_top,
+            site_radius=site_radius,
+            site_split=site_split,
+            append_to=append,
+            volume_pages=volume_pages,
+            volume_size=volume_size * 1024 * 1024 if volume_size else None,
+            engine=engine,
+            temp_quota=temp_quota * 1024 * 1024 if temp_quota else None,
+            ram_temp=ram_temp,
+            max_workers=max_workers,
+            backend=create_backend(backend, cli_path, temp_dir, sdk_lib),
+            catalog=catalog
         )
+        install_cancel_handler(gen, finalize=partial_on_cancel)
         with Progress(
             TextColumn("[progress.description]{task.description}"), BarColumn(), MofNCompleteColumn(), TimeRemainingColumn(),
             transient=True
         ) as progress:
             dummy_task = progress.add_task('Please wait...', total=None)
             task = None
-            async for i, r in gen.run(input_files if input_files else None):
+            async for i, r in gen.run(input_files if input_files else None, shard=shard_spec, shard_by=shard_by):
                 print(r['message'])
                 if not task:
                     progress.remove_task(dummy_task)
@@ -128,8 +278,15 @@ def report(
                 if progress.finished:
                     progress.remove_task(task)
                     progress.add_task("PDF Merging...", total=None)
+        return gen.cancelled
     
-    asyncio.run(__internal_async())
+    try:
+        cancelled = asyncio.run(__internal_async())
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if cancelled:
+        raise typer.Exit(130)
 
 @app.command(help="Change the palette of thremal images in batch. Auto detect [b i]dji_irp[/b i] if it's in [b]$PATH[/b] or working dir.")
 def palette(
@@ -142,9 +299,18 @@ def palette(
     input_files: Annotated[
         list[pathlib.Path], typer.Option("--input", "-i", help="Your input files (Alternative)")
     ] = [],
+    select: Annotated[
+        Optional[str], typer.Option("--select", help='Only process catalogued images matching e.g. "sn=XXXX;start=2026-05-01 10:00;end=2026-05-01 12:00;bbox=lat0,lon0,lat1,lon1", the inputs (if any) are catalogued first')
+    ] = None,
+    catalog_path: Annotated[
+        Optional[pathlib.Path], typer.Option("--catalog", help='SQLite metadata catalog, defaults to the one next to the GUI config')
+    ] = None,
     output_dir: Annotated[
         pathlib.Path, typer.Option("--output", "-o", help="Directory for saving PDFs")
     ] = pathlib.Path('./palette_changed'),
+    temp_dir: Annotated[
+        pathlib.Path, typer.Option("--temp", "-t", help="Directory for temporary RAW files")
+    ] = pathlib.Path('./temps'),
     brightness: Annotated[
         int, typer.Option("--brightness", "-bri", min=0, max=100)
     ] = 50,
@@ -154,6 +320,9 @@ def palette(
                 'rainbow2', 'tint', 'black_hot'], 
         typer.Option("--palette", "-p")
     ] = 'iron_red',
+    lut: Annotated[
+        Optional[str], typer.Option("--lut", help="Custom palette overriding [b]--palette[/b]: a name from [b]luts/custom[/b], a JSON / CSV / raw LUT file or gradient stops like [b]'0:#000000,0.5:#ff0000,1:#ffffff'[/b]. Colorized locally from the temperatures")
+    ] = None,
     overwrite: Annotated[
         bool, typer.Option("--overwrite", "-ow", help="Overwrite exist output file or rename new file")
     ] = False,
@@ -176,12 +345,38 @@ def palette(
     ] = False,
     max_workers: Annotated[
         int, typer.Option("--workers", "-ws", min=1, max=32, help='Max workers of concurrent process')
-    ] = 4
+    ] = 4,
+    backend: Annotated[
+        Literal['cli', 'sdk', 'auto'], typer.Option("--backend", help='Decode through the [b i]dji_irp[/b i] executable, load the SDK library (libdirp) in worker processes, or try the SDK first and fall back to [b i]dji_irp[/b i] (auto)')
+    ] = 'cli',
+    sdk_lib: Annotated[
+        Optional[pathlib.Path], typer.Option("--sdk-lib", help='Path to libdirp.so / libdirp.dll, defaults to the directory of [b i]dji_irp[/b i]')
+    ] = None,
+    resume: Annotated[
+        bool, typer.Option("--resume", help='Skip inputs already finished by an interrupted run')
+    ] = False,
+    temp_quota: Annotated[
+        Optional[int], typer.Option("--temp-quota", min=1, help='Max size of temporary files in MB, new images wait when exceeded (default: half of the free space)')
+    ] = None,
+    ram_temp: Annotated[
+        bool, typer.Option("--ram-temp/--no-ram-temp", help='Keep temporary files in /dev/shm when it has enough free space')
+    ] = True,
+    shard: Annotated[
+        Optional[str], typer.Option("--shard", help='Only process shard i of N (e.g. 1/4), outputs shard files and a manifest for [b]merge[/b]')
+    ] = None,
+    shard_by: Annotated[
+        Literal['path', 'time'], typer.Option("--shard-by", help='Partition inputs by path hash or by capture time ranges')
+    ] = 'path'
 ):
+    from rich.progress import Progress, MofNCompleteColumn, BarColumn, TimeRemainingColumn, TextColumn
+    from generator import ThermalReportGenerator
+    from backends import create_backend
+
     if not cli_path:
         cli_path = shutil.which('dji_irp')
     if not cli_path or not pathlib.Path(cli_path).exists():
         raise FileNotFoundError("Cannot find dji_irp executable")
+    shard_spec = parse_shard(shard) if shard else None
     
     if ':' not in jpeg_subsampling:
         jpeg_subsampling = {
@@ -193,36 +388,326 @@ def palette(
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
     
+    catalog, input_files = select_inputs(select, catalog_path, input_dir, input_files, max_workers)
+
     async def __internal_async():
         gen = ThermalReportGenerator(
             input_dir=input_dir,
             output_dir=output_dir,
-            temp_dir=pathlib.Path('./temps'),
+            temp_dir=temp_dir,
             cli_path=cli_path,
             brightness=brightness,
             palette=palette,
+            custom_lut=lut,
             max_workers=max_workers,
             overwrite=overwrite,
             img_format=img_format,
             png_compress=png_compress,
             jpeg_quality=jpeg_quality,
             jpeg_subsampling=jpeg_subsampling,
-            jpeg_keepdata=jpeg_keepdata
+            jpeg_keepdata=jpeg_keepdata,
+            resume=resume,
+            temp_quota=temp_quota * 1024 * 1024 if temp_quota else None,
+            ram_temp=ram_temp,
+            backend=create_backend(backend, cli_path, temp_dir, sdk_lib),
+            catalog=catalog
         )
+        install_cancel_handler(gen)
         with Progress(
             TextColumn("[progress.description]{task.description}"), BarColumn(), MofNCompleteColumn(), TimeRemainingColumn(),
             transient=True
         ) as progress:
             dummy_task = progress.add_task('Please wait...', total=None)
             task = None
-            async for i, r in gen.run_palette_change(input_files if input_files else None):
+            async for i, r in gen.run_palette_change(input_files if input_files else None, shard=shard_spec, shard_by=shard_by):
                 print(r['message'])
                 if not task:
                     progress.remove_task(dummy_task)
                     task = progress.add_task('Processing...', total=i)
                 progress.advance(task, 1)
+        return gen.cancelled
+
+    try:
+        cancelled = asyncio.run(__internal_async())
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if cancelled:
+        raise typer.Exit(130)
+
+@app.command(help="Append decoded temperature matrices to a compressed, randomly accessible archive. Auto detect [b i]dji_irp[/b i] if it's in [b]$PATH[/b] or working dir.")
+def archive(
+    input_dir: Annotated[
+        Optional[pathlib.Path], typer.Argument(help="Directory of your input files (You can also pass multiple --input/-i to input files)")
+    ] = None,
+    cli_path: Annotated[
+        pathlib.Path, typer.Option("--dji", "-d", help='Absolute path to your complied [b i]dji_irp[/b i] executable')
+    ] = None,
+    input_files: Annotated[
+        list[pathlib.Path], typer.Option("--input", "-i", help="Your input files (Alternative)")
+    ] = [],
+    select: Annotated[
+        Optional[str], typer.Option("--select", help='Only process catalogued images matching e.g. "sn=XXXX;start=2026-05-01 10:00;end=2026-05-01 12:00;bbox=lat0,lon0,lat1,lon1", the inputs (if any) are catalogued first')
+    ] = None,
+    catalog_path: Annotated[
+        Optional[pathlib.Path], typer.Option("--catalog", help='SQLite metadata catalog, defaults to the one next to the GUI config')
+    ] = None,
+    output_dir: Annotated[
+        pathlib.Path, typer.Option("--output", "-o", help="Directory for saving the archive")
+    ] = pathlib.Path('./archives'),
+    temp_dir: Annotated[
+        pathlib.Path, typer.Option("--temp", "-t", help="Directory for temporary RAW files")
+    ] = pathlib.Path('./temps'),
+    name: Annotated[
+        str, typer.Option("--name", "-n", help="Archive name, writes <name>.tarc and the index <name>.tarc.jsonl")
+    ] = 'thermal_archive',
+    dtype: Annotated[
+        Literal['float32', 'float16', 'int16'], typer.Option("--dtype", help='Storage type, int16 stores scaled values with per-frame scale / offset')
+    ] = 'float32',
+    level: Annotated[
+        int, typer.Option("--level", min=0, max=9, help='zlib level of each frame, 0 = uncompressed (frames are read directly from the memory map)')
+    ] = 6,
+    overwrite: Annotated[
+        bool, typer.Option("--overwrite", "-ow", help="Recreate the archive instead of appending to it (inputs already in the archive are skipped when appending)")
+    ] = False,
+    distance: Annotated[
+        Optional[float], typer.Option("--distance", "-dis", min=1.0, max=25.0)
+    ] = None,
+    humidity: Annotated[
+        Optional[float], typer.Option("--humidity", "-hum", min=20.0, max=100.0)
+    ] = None,
+    emissivity: Annotated[
+        Optional[float], typer.Option("--emissivity", "-emi", min=0.10, max=1.00)
+    ] = None,
+    ambient: Annotated[
+        Optional[float], typer.Option("--ambient", "-amb", min=-40.0, max=80.0)
+    ] = None,
+    reflection: Annotated[
+        Optional[float], typer.Option("--reflection", "-ref", min=-40.0, max=500.0)
+    ] = None,
+    max_workers: Annotated[
+        int, typer.Option("--workers", "-ws", min=1, max=32, help='Max workers of concurrent process')
+    ] = 4,
+    backend: Annotated[
+        Literal['cli', 'sdk', 'auto'], typer.Option("--backend", help='Decode through the [b i]dji_irp[/b i] executable, load the SDK library (libdirp) in worker processes, or try the SDK first and fall back to [b i]dji_irp[/b i] (auto)')
+    ] = 'cli',
+    sdk_lib: Annotated[
+        Optional[pathlib.Path], typer.Option("--sdk-lib", help='Path to libdirp.so / libdirp.dll, defaults to the directory of [b i]dji_irp[/b i]')
+    ] = None,
+    temp_quota: Annotated[
+        Optional[int], typer.Option("--temp-quota", min=1, help='Max size of temporary files in MB, new images wait when exceeded (default: half of the free space)')
+    ] = None,
+    ram_temp: Annotated[
+        bool, typer.Option("--ram-temp/--no-ram-temp", help='Keep temporary files in /dev/shm when it has enough free space')
+    ] = True
+):
+    from rich.progress import Progress, MofNCompleteColumn, BarColumn, TimeRemainingColumn, TextColumn
+    from generator import ThermalReportGenerator
+    from backends import create_backend
 
-    asyncio.run(__internal_async())
+    if not cli_path:
+        cli_path = shutil.which('dji_irp')
+    if not cli_path or not pathlib.Path(cli_path).exists():
+        raise FileNotFoundError("Cannot find dji_irp executable")
+
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    catalog, input_files = select_inputs(select, catalog_path, input_dir, input_files, max_workers)
+
+    async def __internal_async():
+        gen = ThermalReportGenerator(
+            input_dir=input_dir,
+            output_dir=output_dir,
+            temp_dir=temp_dir,
+            cli_path=cli_path,
+            distance=distance,
+            humidity=humidity,
+            emissivity=emissivity,
+            ambient=ambient,
+            reflection=reflection,
+            overwrite=overwrite,
+            archive_dtype=dtype,
+            archive_level=level,
+            temp_quota=temp_quota * 1024 * 1024 if temp_quota else None,
+            ram_temp=ram_temp,
+            max_workers=max_workers,
+            backend=create_backend(backend, cli_path, temp_dir, sdk_lib),
+            catalog=catalog
+        )
+        install_cancel_handler(gen)
+        with Progress(
+            TextColumn("[progress.description]{task.description}"), BarColumn(), MofNCompleteColumn(), TimeRemainingColumn(),
+            transient=True
+        ) as progress:
+            dummy_task = progress.add_task('Please wait...', total=None)
+            task = None
+            async for i, r in gen.run_archive(input_files if input_files else None, name=name):
+                print(r['message'])
+                if not task:
+                    progress.remove_task(dummy_task)
+                    task = progress.add_task('Processing...', total=i)
+                progress.advance(task, 1)
+        return gen.cancelled
+
+    try:
+        cancelled = asyncio.run(__internal_async())
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if cancelled:
+        raise typer.Exit(130)
+
+@app.command(help="Catalog the metadata of R-JPEGs in a SQLite database (only new or modified files are parsed) and list the images matching a query")
+def catalog(
+    sources: Annotated[
+        Optional[list[pathlib.Path]], typer.Argument(help="Directories / files to catalog, omit to only query")
+    ] = None,
+    catalog_path: Annotated[
+        Optional[pathlib.Path], typer.Option("--catalog", help='SQLite metadata catalog, defaults to the one next to the GUI config')
+    ] = None,
+    sn: Annotated[
+        Optional[str], typer.Option("--sn", help='Drone serial number')
+    ] = None,
+    model: Annotated[
+        Optional[str], typer.Option("--model", help='Camera model')
+    ] = None,
+    start: Annotated[
+        Optional[str], typer.Option("--start", help='Earliest capture time, e.g. "2026-05-01 10:00"')
+    ] = None,
+    end: Annotated[
+        Optional[str], typer.Option("--end", help='Latest capture time, e.g. "2026-05-01 12:00"')
+    ] = None,
+    bbox: Annotated[
+        Optional[str], typer.Option("--bbox", help='Bounding box "lat0,lon0,lat1,lon1"')
+    ] = None,
+    only_sources: Annotated[
+        bool, typer.Option("--only-sources/--all", help='Only list images under the given sources, or search the whole catalog')
+    ] = True,
+    prune: Annotated[
+        bool, typer.Option("--prune", help='Remove records of files that no longer exist')
+    ] = False,
+    max_workers: Annotated[
+        Optional[int], typer.Option("--workers", "-ws", min=1, help='Max worker processes for parsing')
+    ] = None
+):
+    import sys
+    from catalog import Catalog, parse_selection, default_catalog_path
+
+    # 路径输出到 stdout 以便管道使用，其余信息输出到 stderr
+    with Catalog(catalog_path or default_catalog_path()) as db:
+        if prune:
+            print(f"已删除 {db.prune()} 条失效记录", file=sys.stderr)
+        paths = None
+        if sources:
+            paths, changed = db.ingest(sources, max_workers)
+            print(f"目录已更新: {len(paths)} 张图片, 重新解析 {changed} 张", file=sys.stderr)
+        for path in db.query(
+            paths if only_sources else None,
+            sn=sn, model=model, start=start, end=end,
+            bbox=parse_selection(f"bbox={bbox}")['bbox'] if bbox else None
+        ):
+            print(path)
+
+@app.command(help="Merge the shard PDFs written by [b]report --shard[/b] into one report in the original order")
+def merge(
+    shard_dir: Annotated[
+        pathlib.Path, typer.Argument(help="Directory containing shard_*_of_*.pdf and their manifests")
+    ],
+    output_dir: Annotated[
+        pathlib.Path, typer.Option("--output", "-o", help="Directory for saving PDFs")
+    ] = pathlib.Path('./reports'),
+    cleanup: Annotated[
+        bool, typer.Option(help='Remove shard files after merging')
+    ] = False
+):
+    import datetime
+    from generator import merge_pdfs
+
+    manifests = load_manifests(shard_dir)
+    pages = ordered_pages(manifests)
+    if not pages:
+        raise ValueError("No page in any shard")
+    failed = [img for m in manifests for img in m['failed']]
+    for img in failed:
+        print(f"失败: {img}")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"DJI_Thermal_Report_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
+    merge_pdfs(pages, output_file)
+    print(f"报告已生成: {output_file} ({len(pages)} 张图片, {len(failed)} 张失败)")
+
+    if cleanup:
+        for m in manifests:
+            if m.get('pdf'):
+                (shard_dir / m['pdf']).unlink(missing_ok=True)
+            (shard_dir / f"shard_{m['index']:04d}_of_{m['count']:04d}.json").unlink(missing_ok=True)
+
+@app.command(help="Serve a localhost HTTP API running report/palette/geotiff jobs on a shared warm backend. Auto detect [b i]dji_irp[/b i] if it's in [b]$PATH[/b] or working dir.")
+def serve(
+    cli_path: Annotated[
+        pathlib.Path, typer.Option("--dji", "-d", help='Absolute path to your complied [b i]dji_irp[/b i] executable')
+    ] = None,
+    host: Annotated[
+        str, typer.Option("--host", help='Address to listen on, keep it local unless you know what you are doing')
+    ] = '127.0.0.1',
+    port: Annotated[
+        int, typer.Option("--port", "-P", min=1, max=65535)
+    ] = 8765,
+    output_dir: Annotated[
+        pathlib.Path, typer.Option("--output", "-o", help="Root directory for job outputs (one sub-directory per job)")
+    ] = pathlib.Path('./jobs'),
+    temp_dir: Annotated[
+        pathlib.Path, typer.Option("--temp", "-t", help="Directory for temporary RAW files")
+    ] = pathlib.Path('./temps'),
+    weasy_lib: Annotated[
+        bool, typer.Option(help='Use WeasyPrint executable instead of Library in Windows')
+    ] = False if os.name == 'nt' else True,
+    backend: Annotated[
+        Literal['cli', 'sdk', 'auto'], typer.Option("--backend", help='Decode through the [b i]dji_irp[/b i] executable, load the SDK library (libdirp) in worker processes, or try the SDK first and fall back to [b i]dji_irp[/b i] (auto)')
+    ] = 'cli',
+    sdk_lib: Annotated[
+        Optional[pathlib.Path], typer.Option("--sdk-lib", help='Path to libdirp.so / libdirp.dll, defaults to the directory of [b i]dji_irp[/b i]')
+    ] = None,
+    max_workers: Annotated[
+        int, typer.Option("--workers", "-ws", min=1, help='Size of the shared process pool')
+    ] = 4,
+    max_jobs: Annotated[
+        int, typer.Option("--max-jobs", min=1, help='Jobs running at the same time, the rest wait in queue')
+    ] = 1,
+    job_workers: Annotated[
+        int, typer.Option("--job-workers", min=1, help='Max concurrent images of a single job')
+    ] = 4
+):
+    from server import serve as serve_async
+
+    if not cli_path:
+        cli_path = shutil.which("dji_irp")
+    if not cli_path or not pathlib.Path(cli_path).exists():
+        raise FileNotFoundError("Cannot find dji_irp executable")
+    if not weasy_lib and not shutil.which('weasyprint'):
+        # 仍可处理 engine 为 fitz 的任务
+        print("警告: 找不到 WeasyPrint，只能处理 engine 为 fitz 的报告任务")
+
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    try:
+        asyncio.run(serve_async(
+            host=host,
+            port=port,
+            cli_path=cli_path,
+            output_dir=output_dir,
+            temp_dir=temp_dir,
+            weasy_path=None if weasy_lib else shutil.which('weasyprint'),
+            max_workers=max_workers,
+            max_jobs=max_jobs,
+            job_workers=job_workers,
+            backend=backend,
+            sdk_lib=sdk_lib
+        ))
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
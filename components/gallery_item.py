@@ -1,5 +1,6 @@
 import flet as ft, pathlib
 from dataclasses import field
+from typing import Callable, Optional
 
 @ft.control(isolated=True)
 class GalleryItem(ft.Container):
@@ -9,6 +10,8 @@ class GalleryItem(ft.Container):
     files_in_grid: dict[str, bool] = field(
         default_factory=dict
     )
+    # 选中时调用，参数为图像路径 (用于预览)
+    on_preview: Optional[Callable[[str], None]] = None
 
     def build(self):
         self.check_mark = ft.Icon(
@@ -48,4 +51,6 @@ class GalleryItem(ft.Container):
         self.check_mark.visible = self.is_selected
         self.border = ft.Border.all(3, ft.Colors.BLUE) if self.is_selected else None
         self.files_in_grid[self.url] = self.is_selected
-        self.update()
\ No newline at end of file
+        self.update()
+        if self.is_selected and self.on_preview:
+            self.on_preview(self.img_url)
\ No newline at end of file
@@ -0,0 +1,137 @@
+import flet as ft, asyncio, io
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from lut_registry import Lut
+
+# 只有测温参数变化需要 SDK 重新测温，调色盘与亮度直接在缓存的温度矩阵上重新着色
+MEASURE_KEYS = ('distance', 'humidity', 'emissivity', 'ambient', 'reflection')
+
+def colorize(temps: 'np.ndarray', low: float, high: float, lut: 'Lut', brightness: int = 50) -> bytes:
+    """按 LUT 着色并编码为 BMP (不压缩，640x512 的图像只需几毫秒)"""
+    from PIL import Image
+    from lut_registry import apply_lut
+
+    stream = io.BytesIO()
+    Image.fromarray(apply_lut(temps, lut, low, high, brightness=brightness), 'RGB').save(stream, 'BMP')
+    return stream.getvalue()
+
+@ft.control
+class PreviewPanel(ft.Container):
+    """
+    选中图像的实时预览
+
+    每张图像 (及每组测温参数) 只测温一次，float32 温度矩阵保存在有界的 LRU 缓存中；
+    调色盘与亮度变化时立即重新着色，测温参数变化或缓存未命中时防抖后再请求测温。
+    """
+    measure: Optional[Callable[[str, dict], Awaitable[Optional['np.ndarray']]]] = None
+    cache_size: int = 8
+    debounce: float = 0.3
+
+    def init(self):
+        self.cache: OrderedDict[tuple, tuple['np.ndarray', float, float]] = OrderedDict()
+        self.img_path: Optional[str] = None
+        self.params: dict[str, Optional[float]] = dict()
+        self.palette = 'iron_red'
+        self.brightness = 50
+        # 等待中的测温 (防抖期间或正在测温)
+        self._pending = None
+        # 正在进行的着色，新的着色开始时取消
+        self._coloring = None
+        self.image: Optional[ft.Image] = None
+        self.info = ft.Text("选择图像后在此预览", size=12, color=ft.Colors.OUTLINE, text_align=ft.TextAlign.CENTER)
+        self.content = ft.Column(
+            [self.info],
+            expand=True,
+            alignment=ft.MainAxisAlignment.CENTER,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+        )
+
+    @property
+    def key(self) -> tuple:
+        return (self.img_path, tuple(self.params.get(k) for k in MEASURE_KEYS))
+
+    def show(self, img_path: str):
+        if img_path != self.img_path:
+            self.img_path = img_path
+            self.refresh()
+
+    def set_options(self, params: dict, palette: str, brightness: int):
+        """设置变化时调用，只有测温参数变化才会重新测温"""
+        remeasure = any(params.get(k) != self.params.get(k) for k in MEASURE_KEYS)
+        self.params = {k: params.get(k) for k in MEASURE_KEYS}
+        self.palette = palette
+        self.brightness = brightness
+        if remeasure:
+            self.refresh()
+        else:
+            self.recolor()
+
+    def refresh(self):
+        """缓存命中时立即着色，否则防抖后请求测温"""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if self.img_path is None:
+            return
+        if self.key in self.cache:
+            self.cache.move_to_end(self.key)
+            self.recolor()
+            return
+        self._show_info("正在测温...")
+        self._pending = self.page.run_task(self._measure, self.key)
+
+    async def _measure(self, key: tuple):
+        await asyncio.sleep(self.debounce)
+        try:
+            temps = await self.measure(key[0], dict(zip(MEASURE_KEYS, key[1])))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 只提示仍在预览的图像，过期的失败不覆盖当前内容
+            if key == self.key:
+                self._show_info(f"无法测温: {e}")
+            return
+        if temps is None:
+            if key == self.key:
+                self._show_info("无法测温")
+            return
+        self.cache[key] = (temps, float(temps.min()), float(temps.max()))
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        if key == self.key:
+            self.recolor()
+
+    def recolor(self):
+        """着色与编码在线程中进行，不阻塞界面的事件循环"""
+        if self.key not in self.cache:
+            return
+        if self._coloring is not None:
+            self._coloring.cancel()
+        self._coloring = self.page.run_task(self._recolor, self.key, self.palette, self.brightness)
+
+    async def _recolor(self, key: tuple, palette: str, brightness: int):
+        from lut_registry import get_lut
+
+        temps, low, high = self.cache[key]
+        try:
+            lut = get_lut(palette)
+        except KeyError:
+            lut = get_lut('iron_red')
+        src = await asyncio.to_thread(colorize, temps, low, high, lut, brightness)
+        # 着色期间选中了其他图像或修改了设置
+        if (key, palette, brightness) != (self.key, self.palette, self.brightness):
+            return
+        if self.image is None:
+            self.image = ft.Image(src=src, fit=ft.BoxFit.CONTAIN, expand=True, gapless_playback=True)
+            self.content.controls.insert(0, self.image)
+        else:
+            self.image.src = src
+        self.info.value = f"{low:.1f} ~ {high:.1f} °C"
+        self.update()
+
+    def _show_info(self, message: str):
+        self.info.value = message
+        self.update()
@@ -0,0 +1,135 @@
+import flet as ft, asyncio, time
+from collections import deque
+from typing import Callable, Optional
+
+@ft.control
+class ProgressLog(ft.Container):
+    """
+    虚拟化的日志视图
+
+    日志保存在定长的环形缓冲区中，界面上只有固定数量的 Text 行，
+    滚动或刷新时只改写这些行的内容，不会随日志增长而增加控件。
+    """
+    capacity: int = 5000
+    rows: int = 40
+
+    def init(self):
+        # 在构造时完成，挂载到页面之前也可以写入日志
+        self.entries: deque[tuple[str, Optional[bool]]] = deque(maxlen=self.capacity)
+        # 窗口起点，None 表示跟随最新日志
+        self.offset: Optional[int] = None
+        self.pool = [
+            ft.Text('', size=13, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS, visible=False)
+            for _ in range(self.rows)
+        ]
+        self.content = ft.GestureDetector(
+            content=ft.Column(self.pool, spacing=4, tight=True),
+            on_scroll=self._on_scroll
+        )
+        self.clip_behavior = ft.ClipBehavior.HARD_EDGE
+        self.dirty = True
+
+    def append(self, message: str, success: Optional[bool] = None):
+        """只写入缓冲区，由 render 统一刷新到界面"""
+        self.entries.append((message, success))
+        if self.offset is not None and len(self.entries) == self.capacity:
+            # 缓冲区已满时旧日志被挤出，固定的窗口随之前移
+            self.offset = max(0, self.offset - 1)
+        self.dirty = True
+
+    def clear(self):
+        self.entries.clear()
+        self.offset = None
+        self.dirty = True
+
+    def render(self):
+        """把当前窗口内的日志写入固定的行"""
+        start = max(0, len(self.entries) - self.rows) if self.offset is None else self.offset
+        for i, row in enumerate(self.pool):
+            if start + i < len(self.entries):
+                message, success = self.entries[start + i]
+                row.value = message
+                row.color = None if success is None else (ft.Colors.GREEN_400 if success else ft.Colors.RED_400)
+                row.visible = True
+            else:
+                row.visible = False
+        self.dirty = False
+
+    def _on_scroll(self, e: ft.ScrollEvent):
+        last = max(0, len(self.entries) - self.rows)
+        current = last if self.offset is None else self.offset
+        offset = min(last, max(0, current + (3 if e.scroll_delta.y > 0 else -3)))
+        # 滚动到底部后恢复跟随
+        self.offset = None if offset >= last else offset
+        self.render()
+        self.update()
+
+class ProgressAggregator:
+    """
+    以固定帧率合并进度刷新
+
+    处理结果先写入日志缓冲区，计数直接读取生成器自身的计数器，
+    后台循环每帧最多刷新一次进度条、状态文本与日志。
+    """
+    def __init__(self,
+            page: ft.Page,
+            bar: ft.ProgressBar,
+            info: ft.Text,
+            log: ProgressLog,
+            fps: float = 10.0
+        ):
+        self.page = page
+        self.bar = bar
+        self.info = info
+        self.log = log
+        self.interval = 1.0 / fps
+        self.counter: Optional[Callable[[], tuple[int, int]]] = None
+        self.label = ''
+        self._running = False
+        self._task = None
+
+    def start(self, counter: Callable[[], tuple[int, int]], label: str):
+        """counter 返回 (已处理数, 总数)"""
+        self.counter = counter
+        self.label = label
+        self.bar.value = 0
+        self.bar.update()
+        if not self._running:
+            self._running = True
+            self._task = self.page.run_task(self._loop)
+
+    def push(self, message: str, success: Optional[bool] = None):
+        self.log.append(message, success)
+
+    async def stop(self, message: Optional[str] = None):
+        """停止刷新循环，并立即刷新最后一帧"""
+        self._running = False
+        if self._task is not None:
+            await asyncio.wrap_future(self._task)
+            self._task = None
+        self.flush()
+        self.counter = None
+        if message is not None:
+            self.info.value = message
+            self.info.update()
+
+    def flush(self):
+        if self.counter is not None:
+            done, total = self.counter()
+            value = done / total if total else None
+            text = f"{self.label} {done}/{total}" if total else self.label
+            if value != self.bar.value:
+                self.bar.value = value
+                self.bar.update()
+            if text != self.info.value:
+                self.info.value = text
+                self.info.update()
+        if self.log.dirty:
+            self.log.render()
+            self.log.update()
+
+    async def _loop(self):
+        while self._running:
+            begin = time.monotonic()
+            self.flush()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - begin)))
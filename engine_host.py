@@ -0,0 +1,292 @@
+"""
+引擎宿主进程
+
+GUI 进程只负责界面，ThermalSession 与全部处理都在独立的引擎进程中进行，
+两者通过 multiprocessing.Pipe 交换消息:
+
+    GUI -> 引擎  {'cmd': 'run', 'job': id, 'work': ..., 'params': {...}, 'images': [...]}
+                 {'cmd': 'measure', 'job': id, 'image': path, 'params': {...}}
+                 {'cmd': 'cancel', 'job': id, 'finalize': bool}
+                 {'cmd': 'shutdown'}
+    引擎 -> GUI  {'job': id, 'event': 'progress', 'total', 'completed', 'failed', 'success', 'message'}
+                 {'job': id, 'event': 'done' | 'cancelled' | 'error', ...}
+
+measure 供界面预览: 立即测温一张图像，温度矩阵随 done 事件的 result 返回。
+run 与 measure 的 params 中 backend ('cli' | 'sdk' | 'auto') / sdk_lib 选择解码后端，与命令行的 --backend / --sdk-lib 相同。
+
+引擎崩溃时 GUI 不受影响，正在进行的任务以 error 结束，下次提交时自动重启引擎。
+"""
+import os, asyncio, threading, itertools, traceback, multiprocessing
+from multiprocessing.connection import Connection
+from typing import AsyncGenerator, Literal, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from generator import ThermalReportGenerator
+    from backends import DecodeBackend
+
+FINAL_EVENTS = ('done', 'cancelled', 'error')
+
+def _create_backend(params: dict) -> 'DecodeBackend':
+    from backends import create_backend
+    return create_backend(params.get('backend') or 'cli', params['cli_path'], params['temp_dir'], params.get('sdk_lib') or None)
+
+def engine_main(conn: Connection, max_workers: int):
+    """引擎进程入口"""
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        asyncio.run(_engine_loop(conn, max_workers))
+    finally:
+        conn.close()
+
+async def _engine_loop(conn: Connection, max_workers: int):
+    from generator import ThermalSession
+
+    loop = asyncio.get_running_loop()
+    commands: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+
+    def receive():
+        # Pipe 的读取是阻塞的，放在线程中进行
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = None
+            loop.call_soon_threadsafe(commands.put_nowait, message)
+            if message is None or message.get('cmd') == 'shutdown':
+                return
+
+    def send(message: dict):
+        try:
+            conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass
+
+    threading.Thread(target=receive, daemon=True).start()
+    jobs: dict[int, tuple[asyncio.Task, 'ThermalReportGenerator']] = dict()
+    # 预览测温，以及按 (后端, dji_irp 路径, SDK 库路径) 复用的解码后端
+    measures: dict[int, asyncio.Task] = dict()
+    backends: dict[tuple, 'DecodeBackend'] = dict()
+
+    async with ThermalSession(max_workers) as session:
+        while (command := await commands.get()) is not None:
+            if command['cmd'] == 'run':
+                job_id = command['job']
+                try:
+                    params = {k: v for k, v in command['params'].items() if k not in ('backend', 'sdk_lib')}
+                    gen = session.job(**params, backend=_create_backend(command['params']))
+                except Exception as e:
+                    send({'job': job_id, 'event': 'error', 'message': f"{type(e).__name__}: {e}"})
+                    continue
+                task = asyncio.create_task(_run_job(gen, send, job_id, command['work'], command['images']))
+                task.add_done_callback(lambda _, job_id=job_id: jobs.pop(job_id, None))
+                jobs[job_id] = (task, gen)
+            elif command['cmd'] == 'measure':
+                # 立即解码，不受批量任务的并发限制
+                job_id = command['job']
+                task = asyncio.create_task(_measure(session, backends, send, job_id, command['image'], command['params']))
+                task.add_done_callback(lambda _, job_id=job_id: measures.pop(job_id, None))
+                measures[job_id] = task
+            elif command['cmd'] == 'cancel':
+                if (job := jobs.get(command['job'])):
+                    job[1].cancel(finalize=command.get('finalize', False))
+                elif (task := measures.get(command['job'])):
+                    task.cancel()
+            elif command['cmd'] == 'shutdown':
+                break
+        for _, gen in jobs.values():
+            gen.cancel()
+        for task in measures.values():
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in jobs.values()), *measures.values(), return_exceptions=True)
+
+async def _measure(session, backends: dict[tuple, 'DecodeBackend'], send, job_id: int, image: str, params: dict):
+    from backends import MEASURE_PARAMS
+
+    try:
+        key = (params.get('backend') or 'cli', params['cli_path'], params.get('sdk_lib') or None)
+        if key not in backends:
+            os.makedirs(params['temp_dir'], exist_ok=True)
+            backend = _create_backend(params)
+            # SDK 后端在会话的进程池中解码
+            backend.attach(session.executor, params['temp_dir'], session.buffers)
+            backends[key] = backend
+        temp_data = await backends[key].measure(
+            image, f"preview_{job_id}", {key: params.get(key) for key in MEASURE_PARAMS}
+        )
+        send({'job': job_id, 'event': 'done', 'result': temp_data})
+    except asyncio.CancelledError:
+        send({'job': job_id, 'event': 'cancelled'})
+    except Exception as e:
+        send({'job': job_id, 'event': 'error', 'message': f"{type(e).__name__}: {e}"})
+
+async def _run_job(gen: 'ThermalReportGenerator', send, job_id: int, work: str, images: list[str]):
+    runner = {
+        'report': gen.run,
+        'palette': gen.run_palette_change,
+        'geotiff': gen.run_geotiff,
+        'archive': gen.run_archive
+    }[work]
+    try:
+        async for _, r in runner(images):
+            send({
+                'job': job_id, 'event': 'progress',
+                'total': gen.total, 'completed': gen.completed, 'failed': gen.failed,
+                'success': r['success'], 'message': r['message']
+            })
+        send({'job': job_id, 'event': 'cancelled' if gen.cancelled else 'done', 'outputs': [str(p) for p in gen.outputs]})
+    except asyncio.CancelledError:
+        send({'job': job_id, 'event': 'cancelled', 'outputs': [str(p) for p in gen.outputs]})
+    except Exception as e:
+        traceback.print_exc()
+        send({'job': job_id, 'event': 'error', 'message': f"{type(e).__name__}: {e}"})
+
+class EngineJob:
+    """GUI 侧的任务句柄，计数由引擎推送的事件更新"""
+    def __init__(self, host: 'EngineHost', job_id: int, engine: multiprocessing.Process):
+        self.host = host
+        self.id = job_id
+        # 执行该任务的引擎进程，引擎退出时据此结束任务
+        self.engine = engine
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.status: Literal['running', 'done', 'cancelled', 'error'] = 'running'
+        self.outputs: list[str] = []
+        self.error: Optional[str] = None
+        self.result = None
+        self.queue: asyncio.Queue[dict] = asyncio.Queue()
+
+    def cancel(self, finalize: bool = False):
+        """finalize 为 True 时用已完成的页面生成部分报告"""
+        if self.status == 'running':
+            self.host.send({'cmd': 'cancel', 'job': self.id, 'finalize': finalize})
+
+    async def events(self) -> AsyncGenerator[dict, None]:
+        """逐条返回进度事件，任务结束后停止"""
+        while self.status == 'running':
+            event = await self.queue.get()
+            if event['event'] == 'progress':
+                self.total, self.completed, self.failed = event['total'], event['completed'], event['failed']
+            elif event['event'] in FINAL_EVENTS:
+                self.status = event['event']
+                self.outputs = event.get('outputs', [])
+                self.error = event.get('message')
+                self.result = event.get('result')
+            yield event
+
+class EngineHost:
+    """
+    GUI 侧的引擎代理
+
+    负责启动 / 重启引擎进程，并把引擎推送的事件分发给对应任务。
+    """
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn: Optional[Connection] = None
+        self.jobs: dict[int, EngineJob] = dict()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """启动引擎进程，已在运行时什么都不做"""
+        if self.alive:
+            return
+        self.loop = asyncio.get_running_loop()
+        # spawn 在各平台行为一致，也避免 fork 复制 GUI 的线程状态
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=engine_main, args=(child_conn, self.max_workers), name='thermal-engine')
+        self.process.start()
+        child_conn.close()
+        threading.Thread(target=self._receive, args=(self.conn, self.process), daemon=True).start()
+
+    def _receive(self, conn: Connection, process: multiprocessing.Process):
+        while True:
+            try:
+                event = conn.recv()
+            except (EOFError, OSError):
+                break
+            self.loop.call_soon_threadsafe(self._dispatch, event)
+        process.join()
+        self.loop.call_soon_threadsafe(self._on_engine_exit, process)
+
+    def _dispatch(self, event: dict):
+        if (job := self.jobs.get(event['job'])):
+            job.queue.put_nowait(event)
+            if event['event'] in FINAL_EVENTS:
+                self.jobs.pop(job.id, None)
+
+    def _on_engine_exit(self, process: multiprocessing.Process):
+        """引擎退出后，以 error 结束该引擎上仍在等待的任务"""
+        for job in [job for job in self.jobs.values() if job.engine is process]:
+            job.queue.put_nowait({
+                'job': job.id, 'event': 'error',
+                'message': f"引擎进程异常退出 (exit code {process.exitcode})"
+            })
+            self.jobs.pop(job.id)
+        if process is self.process:
+            self.process = None
+            self.conn = None
+
+    def send(self, message: dict):
+        if self.conn is None:
+            return
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except (BrokenPipeError, OSError):
+                pass
+
+    def submit(self,
+            work: Literal['report', 'palette', 'geotiff', 'archive'],
+            params: dict,
+            images: list[str]
+        ) -> EngineJob:
+        """提交任务，引擎未运行 (或已崩溃) 时先启动"""
+        self.start()
+        job = EngineJob(self, next(self._ids), self.process)
+        self.jobs[job.id] = job
+        self.send({'cmd': 'run', 'job': job.id, 'work': work, 'params': params, 'images': images})
+        return job
+
+    async def measure(self, image: str, params: dict) -> Optional['np.ndarray']:
+        """
+        在引擎中立即测温一张图像，返回温度矩阵，取消或无法测温时返回 None
+
+        params 包括 cli_path、temp_dir、backend / sdk_lib 与测温参数 (None 表示使用图像内的值)
+        """
+        self.start()
+        job = EngineJob(self, next(self._ids), self.process)
+        self.jobs[job.id] = job
+        self.send({'cmd': 'measure', 'job': job.id, 'image': image, 'params': params})
+        try:
+            async for _ in job.events():
+                pass
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+        if job.status == 'error':
+            raise RuntimeError(job.error)
+        return job.result
+
+    def close(self, timeout: float = 10.0):
+        """通知引擎退出，超时后强制结束"""
+        if self.process is None:
+            return
+        self.send({'cmd': 'shutdown'})
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
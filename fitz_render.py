@@ -0,0 +1,398 @@
+"""
+直接用 PyMuPDF 排版报告页面
+
+按 template.html 的固定版式 (标题、图像、光谱棒与两端温度、计算参数与图像信息两张表、可选的温度统计)
+直接绘制到最终文档中，不经过 HTML / CSS 排版，也不产生单页 PDF；批次 / 分诊摘要按 summary.html 的版式绘制，
+因此 fitz 引擎完全不需要 WeasyPrint。
+
+每张图像处理完成后只写出一个很小的页面描述 <task_id>.page.json，合并时由 PageComposer 逐页绘制:
+图像流原样嵌入 (JPEG 不重新编码)，字体与各调色盘的光谱棒图像在同一文档的所有页面间共用。
+"""
+import json, pathlib
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import fitz
+
+PAGE_SUFFIX = '.page.json'
+
+# 版式，与 template.html 一致 (CSS 1px = 0.75pt)
+PX = 0.75
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89
+MARGIN = 56.69
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+TEXT_COLOR = (0.2, 0.2, 0.2)
+TITLE_COLOR = (0.4, 0.4, 0.4)
+BORDER_COLOR = (0.8, 0.8, 0.8)
+# 内置字体都不嵌入字形，整个文档只引用一次: 拉丁字符用 Helvetica，其余 (中文、符号) 用简体中文字体
+LATIN_FONT, LATIN_BOLD_FONT = 'helv', 'hebo'
+CJK_FONT = 'china-s'
+FONT_SIZE = 12 * PX
+ROW_HEIGHT = FONT_SIZE * 1.4 + 6 * PX
+LABEL_WIDTH = 120 * PX
+BOX_PADDING = 10 * PX
+IMAGE_HEIGHT = 400 * PX
+COLORBAR_WRAPPER = 60 * PX
+COLORBAR_GAP = 15 * PX
+LABEL_HEIGHT = 20 * PX
+# 摘要页，与 summary.html 一致
+SUMMARY_FONT_SIZE = 11 * PX
+SUMMARY_ROW_HEIGHT = SUMMARY_FONT_SIZE * 1.4 + 4 * PX
+SECTION_GAP = 20 * PX
+BOX_CHROME = 2 * BOX_PADDING + 14 * PX * 2.4
+CHART_HEIGHT = 80 * PX
+CHART_LABEL_SIZE = 9 * PX
+BAR_COLOR = (0.753, 0.224, 0.169)
+
+def is_page_spec(source) -> bool:
+    return isinstance(source, (str, pathlib.Path)) and str(source).endswith(PAGE_SUFFIX)
+
+def write_page_spec(path: str | pathlib.Path, spec: dict):
+    with open(path, mode='w', encoding='utf-8') as f:
+        json.dump(spec, f, ensure_ascii=False)
+
+def read_page_spec(path: str | pathlib.Path) -> dict:
+    with open(path, mode='r', encoding='utf-8') as f:
+        return json.load(f)
+
+def source_size(source) -> int:
+    """来源的字节数，页面描述按其引用的图像计"""
+    import os
+    path = source[0] if isinstance(source, tuple) else source
+    if is_page_spec(path) and (image_path := read_page_spec(path).get('image_path')):
+        return os.path.getsize(image_path)
+    return os.path.getsize(path)
+
+def insert_source(
+        doc: 'fitz.Document',
+        source: str | pathlib.Path,
+        start_at: int = -1,
+        composer: Optional['PageComposer'] = None
+    ) -> int:
+    """把一个来源 (单页 PDF 或页面描述) 插入到文档的 start_at 之前，返回插入的页数"""
+    import fitz
+
+    if is_page_spec(source):
+        return (composer or PageComposer(doc)).compose(read_page_spec(source), start_at)
+    with fitz.open(source) as src:
+        doc.insert_pdf(src, start_at=start_at if 0 <= start_at < doc.page_count else -1)
+        return src.page_count
+
+class PageComposer:
+    """向同一个文档绘制报告页面，缓存各调色盘光谱棒图像的 xref"""
+    def __init__(self, doc: 'fitz.Document'):
+        self.doc = doc
+        self.colorbars: dict[str, int] = dict()
+
+    def colorbar(self, page: 'fitz.Page', rect: 'fitz.Rect', palette: str):
+        import fitz
+        from lut_registry import get_lut
+
+        xref = self.colorbars.get(palette, 0)
+        if xref:
+            page.insert_image(rect, xref=xref, keep_proportion=False)
+            return
+        # 1 像素宽的竖条，最高温在顶端 (与模板中 to top 的渐变相同)
+        colors = get_lut(palette).colors[::-1]
+        pix = fitz.Pixmap(fitz.csRGB, 1, len(colors), colors.tobytes(), False)
+        self.colorbars[palette] = page.insert_image(rect, pixmap=pix, keep_proportion=False)
+
+    @staticmethod
+    def runs(text: str) -> list[tuple[bool, str]]:
+        """按字体切分文本，返回 [(是否为拉丁字符, 片段)]"""
+        result: list[tuple[bool, str]] = []
+        for char in text:
+            latin = ord(char) < 0x100
+            if result and result[-1][0] == latin:
+                result[-1] = (latin, result[-1][1] + char)
+            else:
+                result.append((latin, char))
+        return result
+
+    @classmethod
+    def text_width(cls, text: str, size: float = FONT_SIZE, bold: bool = False) -> float:
+        import fitz
+        return sum(
+            fitz.get_text_length(chunk, fontname=(LATIN_BOLD_FONT if bold else LATIN_FONT) if latin else CJK_FONT, fontsize=size)
+            for latin, chunk in cls.runs(text)
+        )
+
+    @classmethod
+    def text(cls, page: 'fitz.Page', point: tuple[float, float], text: str, size: float = FONT_SIZE, color=TEXT_COLOR, bold: bool = False):
+        import fitz
+
+        x, y = point
+        for latin, chunk in cls.runs(text):
+            if latin:
+                fontname = LATIN_BOLD_FONT if bold else LATIN_FONT
+                page.insert_text((x, y), chunk, fontname=fontname, fontsize=size, color=color)
+            else:
+                # 内置中文字体没有粗体，以描边加粗
+                fontname = CJK_FONT
+                page.insert_text(
+                    (x, y), chunk, fontname=fontname, fontsize=size, color=color,
+                    render_mode=2 if bold else 0, border_width=0.03
+                )
+            x += fitz.get_text_length(chunk, fontname=fontname, fontsize=size)
+
+    def box(self, page: 'fitz.Page', x: float, y: float, width: float, height: float, title: str) -> float:
+        """带标题的信息框，返回内容起始的 y"""
+        import fitz
+
+        rect = fitz.Rect(x, y, x + width, y + height)
+        page.draw_rect(rect, color=BORDER_COLOR, width=PX, radius=min(0.5, 5 * PX / min(rect.width, rect.height)))
+        self.text(page, (x + BOX_PADDING, y + BOX_PADDING + 14 * PX), title.upper(), 14 * PX, TITLE_COLOR, bold=True)
+        return y + BOX_PADDING + 14 * PX * 1.4 + 14 * PX
+
+    @classmethod
+    def fit(cls, text: str, width: float, size: float = FONT_SIZE, bold: bool = False) -> str:
+        """超出宽度的文本截断并以省略号结尾"""
+        if cls.text_width(text, size, bold) <= width:
+            return text
+        while text and cls.text_width(text + '…', size, bold) > width:
+            text = text[:-1]
+        return text + '…'
+
+    def table(self,
+            page: 'fitz.Page', x: float, y: float, rows: list[list[str]], widths: list[float],
+            header: bool = False, label_columns: tuple[int, ...] = (0,),
+            size: float = FONT_SIZE, row_height: float = ROW_HEIGHT, right: tuple[int, ...] = ()
+        ):
+        """逐行绘制表格 (right 中的列右对齐)，返回表格底部的 y"""
+        for n, row in enumerate(rows):
+            cx = x
+            for i, (cell, width) in enumerate(zip(row, widths)):
+                bold = (header and n == 0) or i in label_columns
+                cell = self.fit(cell, width - 4 * PX, size, bold)
+                offset = width - 4 * PX - self.text_width(cell, size, bold) if i in right else 0
+                self.text(page, (cx + offset, y + (row_height - size * 1.4) / 2 + size), cell, size, bold=bold)
+                cx += width
+            if header and n == 0:
+                page.draw_line((x, y + row_height), (x + sum(widths), y + row_height), color=(0.6, 0.6, 0.6), width=PX)
+            y += row_height
+        return y
+
+    def compose(self, spec: dict, start_at: int = -1) -> int:
+        """按页面描述绘制一页，返回页数"""
+        import fitz
+
+        if spec.get('kind') == 'summary':
+            return self.compose_summary(spec, start_at)
+        page = self.doc.new_page(pno=start_at if 0 <= start_at < self.doc.page_count else -1, width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        x0, y = MARGIN, MARGIN
+
+        # 标题
+        self.text(page, (x0, y + 14), spec['filename'], 14.4, bold=True)
+        self.text(page, (x0, y + 30), spec['create_time'], 10)
+        y += 40
+        page.draw_line((x0, y), (x0 + CONTENT_WIDTH, y), color=(0, 0, 0), width=2 * PX)
+        y += 15
+
+        # 图像与光谱棒
+        image_rect = fitz.Rect(x0, y, x0 + CONTENT_WIDTH - COLORBAR_WRAPPER - COLORBAR_GAP, y + IMAGE_HEIGHT)
+        page.insert_image(image_rect, filename=spec['image_path'], keep_proportion=True)
+        bar_x = image_rect.x1 + COLORBAR_GAP
+        center = bar_x + COLORBAR_WRAPPER / 2
+        for label, label_y in ((f"{spec['max_temp']}°C", y), (f"{spec['min_temp']}°C", y + IMAGE_HEIGHT - LABEL_HEIGHT)):
+            self.text(page, (center - self.text_width(label, bold=True) / 2, label_y + FONT_SIZE + 2), label, bold=True)
+        bar_width = spec['colorbar_width'] * PX
+        bar_rect = fitz.Rect(center - bar_width / 2, y + LABEL_HEIGHT, center + bar_width / 2, y + IMAGE_HEIGHT - LABEL_HEIGHT)
+        self.colorbar(page, bar_rect, spec['palette'])
+        if spec.get('colorbar_border'):
+            page.draw_rect(bar_rect, color=(0, 0, 0), width=PX)
+        y += IMAGE_HEIGHT + 30 * PX
+
+        # 计算参数 / 图像信息
+        params = [
+            ["距离:", f"{spec['distance']} m"],
+            ["空气湿度:", f"{spec['humidity']} %"],
+            ["发射率:", f"{spec['emissivity']}"],
+            ["环境温度:", f"{spec['ambient']} °C"],
+            ["反射温度:", f"{spec['reflection']} °C"],
+        ]
+        info = [
+            ["设备型号:", spec['model']],
+            ["序列号:", spec['sn']],
+            ["分辨率:", f"{spec['width']} x {spec['height']}"],
+            ["拍摄时间:", spec['create_time']],
+            ["经纬度:", spec['gps']],
+            ["焦距:", f"{spec['focal_length']} mm"],
+            ["光圈:", f"f/{spec['aperture']}"],
+        ]
+        gap = 20 * PX
+        box_width = (CONTENT_WIDTH - gap) / 2
+        box_height = 2 * BOX_PADDING + 14 * PX * 2.4 + ROW_HEIGHT * max(len(params), len(info))
+        for i, (title, rows) in enumerate((("计算参数", params), ("图像信息", info))):
+            bx = x0 + i * (box_width + gap)
+            top = self.box(page, bx, y, box_width, box_height, title)
+            self.table(page, bx + BOX_PADDING, top, rows, [LABEL_WIDTH, box_width - LABEL_WIDTH - 2 * BOX_PADDING])
+        y += box_height
+
+        if (analysis := spec.get('analysis')):
+            self.analysis(page, x0, y + 20 * PX, analysis)
+        return 1
+
+    def analysis(self, page: 'fitz.Page', x: float, y: float, analysis: dict):
+        inner = CONTENT_WIDTH - 2 * BOX_PADDING
+        pair = [40.0, inner / 3 - 40.0]
+        stats = [[
+            "最高:", f"{analysis['max']} °C ({analysis['max_at']['x']}, {analysis['max_at']['y']})",
+            "最低:", f"{analysis['min']} °C",
+            "平均:", f"{analysis['mean']} °C",
+        ]]
+        percentiles = [[f"{name.upper()}:", f"{value} °C"] for name, value in analysis['percentiles'].items()]
+        for i in range(0, len(percentiles), 3):
+            stats.append([cell for item in percentiles[i:i + 3] for cell in item])
+        hotspots = [["热点 (≥ {} °C)".format(analysis['hotspot_threshold']), "位置", "最高", "平均", "面积 (px)"]] + [
+            [f"#{i}", f"({spot['x']}, {spot['y']})", f"{spot['max']} °C", f"{spot['mean']} °C", f"{spot['area']}"]
+            for i, spot in enumerate(analysis['hotspots'], start=1)
+        ] if analysis['hotspots'] else []
+        rois = [["ROI", "最高", "最低", "平均", "面积 (px)"]] + [
+            [roi['name']] + ([f"{roi['max']} °C", f"{roi['min']} °C", f"{roi['mean']} °C"] if roi['area'] else ["N/A"] * 3) + [f"{roi['area']}"]
+            for roi in analysis['rois']
+        ] if analysis['rois'] else []
+
+        height = 2 * BOX_PADDING + 14 * PX * 2.4 + ROW_HEIGHT * (len(stats) + len(hotspots) + len(rois))
+        top = self.box(page, x, y, CONTENT_WIDTH, height, "温度统计")
+        top = self.table(page, x + BOX_PADDING, top, stats, pair * 3, label_columns=(0, 2, 4))
+        columns = [inner * 0.28] + [inner * 0.18] * 4
+        if hotspots:
+            top = self.table(page, x + BOX_PADDING, top, hotspots, columns, header=True, label_columns=())
+        if rois:
+            self.table(page, x + BOX_PADDING, top, rois, columns, header=True, label_columns=())
+
+    def compose_summary(self, spec: dict, start_at: int = -1) -> int:
+        """按 summary.html 的版式绘制批次 / 分诊摘要，内容超出一页时换页，返回页数"""
+        flow = SummaryFlow(self, start_at)
+        batch, inner = spec.get('batch'), CONTENT_WIDTH - 2 * BOX_PADDING
+        flow.header('批次摘要' if batch else '分诊摘要', spec['create_time'])
+
+        def columns(*ratios: float) -> list[float]:
+            return [inner * ratio for ratio in ratios]
+
+        def value(v) -> str:
+            return 'N/A' if v is None else f"{v}"
+
+        if batch:
+            failures = ', '.join(f"{reason} × {count}" for reason, count in batch['failures'].items())
+            flow.table("概况", [
+                ["处理成功:", f"{batch['completed']} 张"],
+                ["处理失败:", f"{batch['failed']} 张" + (f" {failures}" if failures else "")],
+            ], [LABEL_WIDTH, inner - LABEL_WIDTH], header=False, label_columns=(0,))
+            if batch['hottest']:
+                flow.table(f"最高温前 {len(batch['hottest'])} 张", [["文件名", "序列号", "拍摄时间", "最低温", "最高温"]] + [
+                    [item['filename'], value(item['sn']), value(item['create_time']), f"{item['min']}°C", f"{item['max']}°C"]
+                    for item in batch['hottest']
+                ], columns(0.3, 0.2, 0.26, 0.12, 0.12), right=(3, 4))
+            if spec.get('max_bars'):
+                charts = [("单张最高温分布 (°C)", spec['max_bars'])]
+                if spec.get('pixel_bars'):
+                    charts.append(("全部像素温度分布 (°C)", spec['pixel_bars']))
+                flow.charts(charts)
+            for title, key, label in (("按飞机", 'by_drone', "序列号"), ("按小时", 'by_hour', "时段")):
+                flow.table(title, [[label, "图像", "失败", "最低温", "最高温", "平均最高温"]] + [
+                    [name, f"{group['count']}", f"{group['failed']}", value(group['min']), value(group['max']), value(group['mean_max'])]
+                    for name, group in batch[key].items()
+                ], columns(0.3, 0.12, 0.12, 0.15, 0.15, 0.16), right=(1, 2, 3, 4, 5))
+
+        if (sites := spec.get('sites')):
+            with_report = sites[0].get('report') is not None
+            rows = [["地点", "图像", "中心", "范围 (纬度, 经度)"] + (["报告"] if with_report else [])]
+            for site in sites:
+                center = '%.6f, %.6f' % tuple(site['center'][:2]) if site.get('center') else 'N/A'
+                bbox = '%.6f, %.6f ~ %.6f, %.6f' % tuple(site['bbox'][:4]) if site.get('bbox') else 'N/A'
+                rows.append([site['name'], f"{site['count']}", center, bbox] + ([site['report']] if with_report else []))
+            widths = columns(0.12, 0.08, 0.24, 0.36, 0.2) if with_report else columns(0.15, 0.1, 0.3, 0.45)
+            flow.table(f"地点 ({len(sites)})", rows, widths)
+
+        skipped = spec.get('skipped') or []
+        if spec.get('triage'):
+            rows = []
+            if spec.get('triage_max') is not None:
+                rows.append(["最高温度 ≥", f"{spec['triage_max']} °C"])
+            if spec.get('triage_delta') is not None:
+                rows.append(["温差 ≥", f"{spec['triage_delta']} °C"])
+            rows += [["超过阈值:", f"{spec['flagged']} 张 (生成完整页面)"], ["未超过阈值:", f"{len(skipped)} 张"]]
+            flow.table("阈值", rows, [LABEL_WIDTH, inner - LABEL_WIDTH], header=False, label_columns=(0,))
+        if skipped:
+            flow.table("未超过阈值的图像", [["文件名", "拍摄时间", "经纬度", "最低温", "最高温"]] + [
+                [item['filename'], value(item['create_time']), value(item['gps']), f"{item['min_temp']}°C", f"{item['max_temp']}°C"]
+                for item in skipped
+            ], columns(0.28, 0.24, 0.24, 0.12, 0.12), right=(3, 4))
+        return flow.pages
+
+class SummaryFlow:
+    """摘要页自上而下排版，信息框放不下时换页 (表格在新的一页继续，并重复表头)"""
+    def __init__(self, composer: PageComposer, start_at: int = -1):
+        self.composer = composer
+        self.start_at = start_at
+        self.pages = 0
+        self.page: Optional['fitz.Page'] = None
+        self.y = MARGIN
+        self.new_page()
+
+    def new_page(self):
+        doc = self.composer.doc
+        pno = self.start_at + self.pages if 0 <= self.start_at < doc.page_count else -1
+        self.page = doc.new_page(pno=pno, width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self.pages += 1
+        self.y = MARGIN
+
+    @property
+    def remaining(self) -> float:
+        return PAGE_HEIGHT - MARGIN - self.y
+
+    def header(self, title: str, create_time: str):
+        self.composer.text(self.page, (MARGIN, self.y + 14), title, 14.4, bold=True)
+        self.composer.text(self.page, (MARGIN, self.y + 30), create_time, 10)
+        self.y += 40
+        self.page.draw_line((MARGIN, self.y), (MARGIN + CONTENT_WIDTH, self.y), color=(0, 0, 0), width=2 * PX)
+        self.y += SECTION_GAP
+
+    def table(self, title: str, rows: list[list[str]], widths: list[float], header: bool = True, label_columns: tuple[int, ...] = (), right: tuple[int, ...] = ()):
+        head, body = (rows[:1], rows[1:]) if header else ([], rows)
+        first = True
+        while True:
+            fit = int((self.remaining - BOX_CHROME) // SUMMARY_ROW_HEIGHT) - len(head)
+            if fit < min(1, len(body)) and self.y > MARGIN:
+                self.new_page()
+                continue
+            chunk, body = body[:fit], body[fit:]
+            height = BOX_CHROME + SUMMARY_ROW_HEIGHT * (len(head) + len(chunk))
+            top = self.composer.box(self.page, MARGIN, self.y, CONTENT_WIDTH, height, title if first else f"{title} (续)")
+            self.composer.table(
+                self.page, MARGIN + BOX_PADDING, top, head + chunk, widths, header=bool(head), label_columns=label_columns,
+                size=SUMMARY_FONT_SIZE, row_height=SUMMARY_ROW_HEIGHT, right=right
+            )
+            self.y += height + SECTION_GAP
+            if not body:
+                return
+            first = False
+            self.new_page()
+
+    def charts(self, charts: list[tuple[str, list[dict]]]):
+        """直方图放在同一个信息框中，第一个标题作为信息框的标题"""
+        import fitz
+
+        chart_block = CHART_HEIGHT + CHART_LABEL_SIZE * 1.4 + 4 * PX
+        height = BOX_CHROME + chart_block * len(charts) + 14 * PX * 2.4 * (len(charts) - 1)
+        if height > self.remaining and self.y > MARGIN:
+            self.new_page()
+        page, inner = self.page, CONTENT_WIDTH - 2 * BOX_PADDING
+        x = MARGIN + BOX_PADDING
+        y = self.composer.box(page, MARGIN, self.y, CONTENT_WIDTH, height, charts[0][0])
+        for n, (title, bars) in enumerate(charts):
+            if n:
+                self.composer.text(page, (x, y + 10 * PX + 14 * PX), title.upper(), 14 * PX, TITLE_COLOR, bold=True)
+                y += 14 * PX * 2.4
+            gap = 1 * PX
+            bar_width = (inner - gap * (len(bars) - 1)) / len(bars)
+            for i, bar in enumerate(bars):
+                bx = x + i * (bar_width + gap)
+                bar_height = max(PX, CHART_HEIGHT * bar['height'] / 100)
+                page.draw_rect(fitz.Rect(bx, y + CHART_HEIGHT - bar_height, bx + bar_width, y + CHART_HEIGHT), color=None, fill=BAR_COLOR, width=0)
+                if i % 5 == 0:
+                    self.composer.text(page, (bx, y + CHART_HEIGHT + CHART_LABEL_SIZE + 2 * PX), bar['label'], CHART_LABEL_SIZE, TITLE_COLOR)
+            page.draw_line((x, y + CHART_HEIGHT), (x + inner, y + CHART_HEIGHT), color=(0.6, 0.6, 0.6), width=PX)
+            y += chart_block
+        self.y += height + SECTION_GAP
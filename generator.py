@@ -1,15 +1,34 @@
-import os, re, datetime, exifread, io, struct, aiofiles
-import shutil, uuid, asyncio, pathlib, subprocess
-import json, traceback, locale, xmltodict, fitz # PyMuPDF
-from PIL import Image
-from jinja2 import Template
+import os, re, datetime, io, struct
+import shutil, asyncio, pathlib, subprocess, hashlib
+import json, traceback, base64, contextlib
 from enum import Enum
-from concurrent.futures import ProcessPoolExecutor
-from typing import AsyncGenerator, Optional, Literal
+from typing import AsyncGenerator, NamedTuple, Optional, Literal, TYPE_CHECKING
 from utils import get_executable_path
+from journal import JobJournal, make_task_id, file_fingerprint
+from shard import ShardPlan
+from tempstore import TempStore
+from analysis import analyze
+from summary import BatchSummary
+from archive import ArchiveWriter, ArchiveDtype, encode_frame, archive_paths
+from spatial import cluster_sites, valid_gps
+from report_index import ReportIndex, index_path
+from fitz_render import PAGE_SUFFIX, insert_source, source_size, write_page_spec
+from backends import DecodeBackend, CliBackend, MEASURE_PARAMS
+from shm_pool import BufferPool, Lease, call_shared
+from lut_registry import LEVELS, apply_lut, get_lut
 
-# 配置路径
-LUT_DIR = pathlib.Path(get_executable_path()).parent / "luts"
+# fitz / PIL / jinja2 / exifread 等依赖较重，只在用到的函数内导入，
+# 使 CLI 的帮助、参数检查和不生成 PDF 的命令能快速启动
+if TYPE_CHECKING:
+    from jinja2 import Template
+    from concurrent.futures import Future
+    from catalog import Catalog
+    import numpy as np
+
+# 输出文件夹中保存可恢复任务状态 (日志与已完成的报告页面) 的目录
+WORK_DIR_NAME = '.dji_timgrg'
+# 内存中页面图像的 URL 协议，由 WeasyPrint 的 url_fetcher 解析
+RESOURCE_SCHEME = 'dji-timgrg'
 
 class ThermalPalette(Enum):
     white_hot = 0
@@ -27,12 +46,64 @@ class ThermalPalette(Enum):
 def camel_to_snake(name: str):
     return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
 
-def get_palette(palette: ThermalPalette):
-    palette_json = pathlib.Path(LUT_DIR) / f"lut{palette.value}.json"
-    if not palette_json.exists():
-        raise FileNotFoundError("Cannot find target LUT file")
-    with open(palette_json, mode='r', encoding='utf-8') as f:
-        return ', '.join(f"rgb({r},{g},{b})" for r, g, b in json.load(f).__reversed__())
+def get_palette(palette: ThermalPalette | str) -> str:
+    """光谱棒的 CSS 渐变颜色，palette 可以是内置调色盘或 lut_registry 能解析的调色盘"""
+    return get_lut(palette.name if isinstance(palette, ThermalPalette) else palette).css_gradient()
+
+class JpegSegmentSplicer(io.RawIOBase):
+    """
+    编码器输出的 JPEG 流经此写入目标文件，在编码器写出的 APP0 / APP1 段之后插入给定的段
+
+    只缓存当前段头的几个字节，其余数据直接写穿，插入完成后不再解析
+    """
+    def __init__(self, fp: io.BufferedIOBase, segments: list[bytes]):
+        self.fp = fp
+        self.segments = segments
+        self.header = b''
+        # 当前段还需原样写出的字节数
+        self.remaining = 0
+        self.spliced = not segments
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = memoryview(b).cast('B')
+        size = len(data)
+        while data and not self.spliced:
+            if self.remaining:
+                n = min(self.remaining, len(data))
+                self.fp.write(data[:n])
+                data, self.remaining = data[n:], self.remaining - n
+                continue
+            # SOI 没有长度字段，其余段头为 [Marker (2字节)] + [Length (2字节)]
+            n = (2 if len(self.header) < 2 else 4) - len(self.header)
+            self.header += bytes(data[:n])
+            data = data[n:]
+            if self.header == b'\xff\xd8':
+                self.fp.write(self.header)
+                self.header = b''
+            elif len(self.header) == 4:
+                if self.header[1] in (0xE0, 0xE1):
+                    self.fp.write(self.header)
+                    self.remaining = struct.unpack(">H", self.header[2:4])[0] - 2
+                else:
+                    for seg in self.segments:
+                        self.fp.write(seg)
+                    self.fp.write(self.header)
+                    self.spliced = True
+                self.header = b''
+        if data:
+            self.fp.write(data)
+        return size
+
+class TriageSkip(NamedTuple):
+    """分诊时未超过阈值、不生成完整页面的图像，只在摘要页中列出"""
+    filename: str
+    create_time: str
+    gps: str
+    min_temp: str
+    max_temp: str
 
 def convert_to_decimal(coords: tuple[float, float, float] | str) -> float:
     # coords 格式为 [23, 21, 28.4713]
@@ -46,6 +117,133 @@ def convert_to_decimal(coords: tuple[float, float, float] | str) -> float:
     except:
         return 0.0
 
+def merge_pdfs(
+        sources: list[str | pathlib.Path | tuple[str | pathlib.Path, int, int]],
+        output_file: str | pathlib.Path,
+        sections: Optional[list[tuple[str, int]]] = None
+    ) -> list[tuple[int, int]]:
+    """
+    按顺序合并 PDF (Fitz 合并极快，同步即可)
+
+    来源可以是整个文件，也可以是 (文件, 起始页, 页数) 指定的页面范围。
+    sections 为 (标题, 来源序号) 时，在对应来源的第一页加入书签。
+    返回每个来源在合并结果中的 (起始页, 页数)。
+    """
+    import fitz # PyMuPDF
+    from fitz_render import PageComposer
+
+    merged_pdf = fitz.open()
+    # 页面描述直接绘制到合并结果中，字体与光谱棒在整个文档内共用
+    composer = PageComposer(merged_pdf)
+    opened: dict[str, fitz.Document] = dict()
+    placement: list[tuple[int, int]] = []
+    try:
+        for source in sources:
+            start = merged_pdf.page_count
+            if isinstance(source, tuple):
+                path, first_page, page_count = source
+                if str(path) not in opened:
+                    opened[str(path)] = fitz.open(path)
+                merged_pdf.insert_pdf(opened[str(path)], from_page=first_page, to_page=first_page + page_count - 1)
+            else:
+                insert_source(merged_pdf, source, composer=composer)
+            placement.append((start, merged_pdf.page_count - start))
+        if sections:
+            merged_pdf.set_toc([[1, title, placement[index][0] + 1] for title, index in sections])
+        merged_pdf.save(output_file)
+    finally:
+        for doc in opened.values():
+            doc.close()
+        merged_pdf.close()
+    return placement
+
+def plan_volumes(sizes: list[int], max_pages: Optional[int] = None, max_bytes: Optional[int] = None) -> list[tuple[int, int]]:
+    """
+    按页数 / 字节数上限把依次合并的来源分卷，返回每卷的来源范围 [start, end)
+
+    每个来源按一页计，字节数以来源大小 (见 fitz_render.source_size) 之和估计；单个来源超过上限时独占一卷
+    """
+    volumes: list[tuple[int, int]] = []
+    start, pages, nbytes = 0, 0, 0
+    for i, size in enumerate(sizes):
+        if i > start and ((max_pages and pages + 1 > max_pages) or (max_bytes and nbytes + size > max_bytes)):
+            volumes.append((start, i))
+            start, pages, nbytes = i, 0, 0
+        pages += 1
+        nbytes += size
+    volumes.append((start, len(sizes)))
+    return volumes
+
+class ThermalSession:
+    """
+    长期存活的处理会话
+
+    持有进程池、共享内存缓冲池、编译好的模板、LUT 与缓存，可以同时被多个任务 (ThermalReportGenerator) 共享，
+    避免每次生成都重新读取模板、重新创建进程池。
+    """
+    default_settings_cache_size = 4096
+
+    def __init__(self, max_workers: int = 4):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.max_workers = max_workers
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        # 解码得到的帧在事件循环与工作进程之间经共享内存传递
+        self.buffers = BufferPool()
+        self.templates: dict[str, 'Template'] = dict()
+        self.palette_colors: dict[ThermalPalette | str, str] = dict()
+        self.default_settings_cache: dict[tuple, dict[str, float]] = dict()
+        self.closed = False
+
+    def load_template(self, name: str) -> 'Template':
+        """首次用到时才编译模板，只改色的任务不需要加载 jinja2"""
+        if name not in self.templates:
+            from jinja2 import Template
+            with open(pathlib.Path(get_executable_path()).parent / name, "r", encoding="utf-8") as f:
+                self.templates[name] = Template(f.read())
+        return self.templates[name]
+
+    @property
+    def template(self) -> 'Template':
+        return self.load_template("template.html")
+
+    @property
+    def summary_template(self) -> 'Template':
+        return self.load_template("summary.html")
+
+    def get_palette(self, palette: ThermalPalette | str) -> str:
+        if palette not in self.palette_colors:
+            self.palette_colors[palette] = get_palette(palette)
+        return self.palette_colors[palette]
+
+    def cache_default_settings(self, key: tuple, value: dict[str, float]):
+        if len(self.default_settings_cache) >= self.default_settings_cache_size:
+            # dict 保持插入顺序，淘汰最早的一项
+            self.default_settings_cache.pop(next(iter(self.default_settings_cache)))
+        self.default_settings_cache[key] = value
+
+    def job(self, **params) -> 'ThermalReportGenerator':
+        """创建一个使用本会话资源的任务，任务参数互相独立"""
+        return ThermalReportGenerator(session=self, **params)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.executor.shutdown()
+            self.buffers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await asyncio.to_thread(self.close)
+
 class ThermalReportGenerator:
     def __init__(self, 
             input_dir: str | pathlib.Path,
@@ -68,12 +266,42 @@ class ThermalReportGenerator:
             jpeg_quality: int = 95,
             jpeg_subsampling: Literal['4:4:4', '4:2:2', '4:2:0'] = '4:4:4',
             jpeg_keepdata: bool = False,
-            max_workers: int = 4
+            overwrite: bool = False,
+            resume: bool = False,
+            triage_max: Optional[float] = None,
+            triage_delta: Optional[float] = None,
+            analysis: bool = False,
+            rois: Optional[list[dict]] = None,
+            hotspot_threshold: Optional[float] = None,
+            summary: bool = False,
+            summary_top: int = 10,
+            archive_dtype: ArchiveDtype = 'float32',
+            archive_level: int = 6,
+            site_radius: Optional[float] = None,
+            site_split: bool = False,
+            append_to: Optional[str | pathlib.Path] = None,
+            volume_pages: Optional[int] = None,
+            volume_size: Optional[int] = None,
+            engine: Literal['weasyprint', 'fitz'] = 'weasyprint',
+            custom_lut: Optional[str] = None,
+            temp_quota: Optional[int] = None,
+            ram_temp: bool = True,
+            max_workers: int = 4,
+            session: Optional[ThermalSession] = None,
+            backend: Optional[DecodeBackend] = None,
+            catalog: Optional['Catalog'] = None
         ):
         pathlib.Path(output_dir).mkdir(exist_ok=True)
         pathlib.Path(temp_dir).mkdir(exist_ok=True)
-        with open(pathlib.Path(get_executable_path()).parent / "template.html", "r", encoding="utf-8") as f:
-            self.template = Template(f.read())
+
+        # 没有传入会话时自行创建一个，并在任务结束时关闭
+        self._owns_session = session is None
+        self.session = session if session is not None else ThermalSession(max_workers)
+        self.executor = self.session.executor
+        # 进度计数，界面直接读取而不必自行累计
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
 
         self.distance = distance
         self.humidity = humidity
@@ -89,15 +317,222 @@ class ThermalReportGenerator:
         self.cli_path = cli_path
         self.temp_dir = temp_dir
         self.weasy_path = weasy_path
+        # 默认调用 dji_irp 可执行文件解码
+        self.backend = backend if backend is not None else CliBackend(cli_path, temp_dir)
+        # 中间文件放在独立的运行目录中，空间充足时使用内存盘；恢复模式下保留旧运行目录以复用其中的页面
+        # 临时存储 (可能在内存盘上) 只放中间文件，可恢复的状态放在 work_dir 中，每次启动都可以清理旧的运行目录
+        self.store = TempStore(temp_dir, quota=temp_quota, prefer_ram=ram_temp)
+        # 报告的已完成页面 (及 fitz 页面引用的图像) 所在目录，run 中设置
+        self.pages_dir: Optional[pathlib.Path] = None
+        self.backend.attach(self.executor, self.store.dir, self.session.buffers)
 
         self.img_format = img_format
         self.png_compress = png_compress
         self.jpeg_quality = jpeg_quality
         self.jpeg_subsampling = jpeg_subsampling
         self.jpeg_keepdata = jpeg_keepdata
+        self.overwrite = overwrite
+        self.resume = resume
+        # 分诊阈值，都为 None 时每张图像都生成完整页面
+        self.triage_max = triage_max
+        self.triage_delta = triage_delta
+        # 温度矩阵分析，指定了 ROI 时自动开启
+        self.analysis = analysis or bool(rois)
+        self.rois = rois or []
+        self.hotspot_threshold = hotspot_threshold
+        # 在报告前加入批次摘要页
+        self.summary = summary
+        self.summary_top = summary_top
+        # 温度矩阵归档的存储类型与 zlib 压缩等级 (0 为不压缩)
+        self.archive_dtype = archive_dtype
+        self.archive_level = archive_level
+        # 按拍摄位置分组的半径 (米)，None 时不分组；site_split 为 True 时每个地点输出一份报告
+        self.site_radius = site_radius
+        self.site_split = site_split
+        # 追加模式: 只渲染报告中还没有的图像，插入到已有报告中
+        self.append_to = append_to
+        # 分卷上限 (页数 / 字节数)，都为 None 时输出单个文件
+        self.volume_pages = volume_pages
+        self.volume_size = volume_size
+        # 页面排版引擎: weasyprint 按 template.html 渲染单页 PDF；fitz 由 PyMuPDF 在合并时直接绘制
+        self.engine = engine
+        # 自定义调色盘 (名称、文件或渐变色标)，SDK 不支持，由测温结果在本地着色；提前解析以便尽早报错
+        self.custom_lut = custom_lut
+        self.lut = get_lut(custom_lut) if custom_lut else None
+        # 元数据目录，用于跨运行保存 SDK 默认测温参数
+        self.catalog = catalog
+
+        # 本任务产出的最终文件 (报告 PDF / 导出的图像)
+        self.outputs: list[pathlib.Path] = []
 
         self.semaphore = asyncio.Semaphore(max_workers)
-        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+        # 取消状态，以及本任务创建的协程与提交到进程池的工作
+        self.cancelled = False
+        self.finalize_partial = False
+        self._tasks: list[asyncio.Task] = []
+        self._pool_futures: set['Future'] = set()
+
+    def cancel(self, finalize: bool = False):
+        """
+        取消任务 (需在事件循环所在线程调用)
+
+        立即停止调度新的图像，正在运行的 dji_irp / WeasyPrint 子进程随协程取消被结束，
+        进程池中尚未开始的工作被撤回。finalize 为 True 时用已渲染好的页面生成部分报告。
+        """
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.finalize_partial = finalize
+        for task in self._tasks:
+            task.cancel()
+        for future in list(self._pool_futures):
+            future.cancel()
+
+    async def run_in_pool(self, func, *args):
+        """提交到进程池并记录，取消时可以等待仍在运行的工作结束"""
+        future = self.executor.submit(func, *args)
+        self._pool_futures.add(future)
+        future.add_done_callback(self._pool_futures.discard)
+        return await asyncio.wrap_future(future)
+
+    async def iter_completed(self, coros) -> AsyncGenerator[tuple, None]:
+        """按完成顺序返回处理结果，任务被取消后停止"""
+        self._tasks = [asyncio.create_task(coro) for coro in coros]
+        for task in asyncio.as_completed(self._tasks):
+            try:
+                yield await task
+            except asyncio.CancelledError:
+                if not self.cancelled:
+                    raise
+                break
+
+    async def cleanup_unfinished(self, images: list[str | pathlib.Path], work: Literal['report', 'palette', 'geotiff', 'archive']):
+        """结束剩余的协程，等待进程池中仍在运行的工作，再删除未完成输入的临时文件"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool_futures:
+            import concurrent.futures
+            await asyncio.to_thread(concurrent.futures.wait, list(self._pool_futures))
+        digest = self.job_digest(work)
+        for img in images:
+            try:
+                self.remove_temp(make_task_id(img, digest))
+            except OSError:
+                continue
+
+    def remove_temp(self, task_id: str):
+        """删除某个输入在本次运行中产生的全部临时文件"""
+        for directory in (self.store.dir, self.pages_dir):
+            if directory is None:
+                continue
+            for temp_file in directory.glob(f"{task_id}.*"):
+                self.store.remove(temp_file)
+
+    def page_path(self, name: str) -> pathlib.Path:
+        """报告页面需要保留到合并 (或下一次 --resume)，放在 pages_dir 中；其余产物放在临时存储中"""
+        return self.pages_dir / name if self.pages_dir is not None else self.store.path(name)
+
+    def close(self):
+        """任务结束，释放临时存储，仅关闭自己创建的会话"""
+        self.store.close()
+        if self._owns_session:
+            self.session.close()
+
+    def decode_params(self) -> dict:
+        """传递给解码后端的处理参数"""
+        return {
+            'distance': self.distance,
+            'humidity': self.humidity,
+            'emissivity': self.emissivity,
+            'ambient': self.ambient,
+            'reflection': self.reflection,
+            'brightness': self.brightness,
+            'palette': self.palette.name if self.palette != ThermalPalette.keep else None,
+        }
+
+    def get_output_dir(self, work: Literal['report', 'palette', 'geotiff', 'archive']) -> pathlib.Path:
+        if work == 'palette':
+            return pathlib.Path(self.output_dir) / (self.lut.name if self.lut else self.palette.name)
+        return pathlib.Path(self.output_dir)
+
+    def collect_images(self, image_abs_paths: Optional[list[str | pathlib.Path]] = None) -> list[str | pathlib.Path]:
+        if not image_abs_paths:
+            return [(pathlib.Path(self.input_dir) / f).absolute() for f in os.listdir(str(self.input_dir)) if f.lower().endswith(('.jpg', '.jpeg'))]
+        images = []
+        for f in image_abs_paths:
+            if not pathlib.Path(f).is_absolute():
+                raise ValueError("Path in file list must be absolute!")
+            if str(f).lower().endswith(('.jpg', '.jpeg')):
+                images.append(str(f))
+        return images
+
+    def job_digest(self, work: Literal['report', 'palette', 'geotiff', 'archive']) -> str:
+        """影响产物内容的参数摘要，参数变化后旧的临时文件与日志不会被复用"""
+        params = {
+            'work': work,
+            'distance': self.distance,
+            'humidity': self.humidity,
+            'emissivity': self.emissivity,
+            'ambient': self.ambient,
+            'reflection': self.reflection,
+        }
+        if work != 'palette':
+            params.update({
+                'analysis': self.analysis,
+                'rois': self.rois,
+                'hotspot_threshold': self.hotspot_threshold,
+            })
+        if work == 'archive':
+            params.update({
+                'archive_dtype': self.archive_dtype,
+                'archive_level': self.archive_level,
+            })
+        elif work != 'geotiff':
+            params.update({
+                'brightness': self.brightness,
+                'palette': self.palette.name,
+                'custom_lut': self.custom_lut,
+                'img_format': self.img_format,
+                'png_compress': self.png_compress,
+                'jpeg_quality': self.jpeg_quality,
+                'jpeg_subsampling': self.jpeg_subsampling,
+            })
+        if work == 'report':
+            params.update({
+                'colorbar_width': self.colorbar_width,
+                'colorbar_border': self.border,
+                'triage_max': self.triage_max,
+                'triage_delta': self.triage_delta,
+                'engine': self.engine,
+            })
+        else:
+            params.update({
+                'jpeg_keepdata': self.jpeg_keepdata,
+                'output_dir': str(self.get_output_dir(work).absolute()),
+            })
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def work_dir(self, work: Literal['report', 'palette', 'geotiff']) -> pathlib.Path:
+        """
+        可恢复的任务状态所在目录 (输出文件夹下)
+
+        临时文件夹默认在内存盘上，重启或断电后就会丢失，日志与报告的已完成页面因此放在输出文件夹中
+        """
+        return pathlib.Path(self.output_dir) / WORK_DIR_NAME / f"{work}_{self.job_digest(work)[:12]}"
+
+    def open_journal(self, work: Literal['report', 'palette', 'geotiff']) -> JobJournal:
+        work_dir = self.work_dir(work)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        return JobJournal(work_dir / "journal.jsonl", resume=self.resume)
+
+    def remove_work_dir(self, work: Literal['report', 'palette', 'geotiff']):
+        """任务完成后删除日志与剩余的页面"""
+        work_dir = self.work_dir(work)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        with contextlib.suppress(OSError):
+            work_dir.parent.rmdir()
 
     @staticmethod
     def get_jpeg_app_segments(stream: io.BufferedIOBase, pos_only: bool = False):
@@ -138,8 +573,12 @@ class ThermalReportGenerator:
                 
         return segments
 
-    def get_metadata(self, img_path: str | pathlib.Path):
+    @staticmethod
+    def get_metadata(img_path: str | pathlib.Path):
         """从 APP1 Marker 提取元数据"""
+        import exifread, xmltodict
+        from PIL import Image
+
         xmp = ''
         exif = b''
         app_segments: dict[str, list[bytes]] = None
@@ -152,7 +591,7 @@ class ThermalReportGenerator:
                     tags.update(xmltodict.parse(xmp)['x:xmpmeta']['rdf:RDF']['rdf:Description'])
                 else:
                     return None
-            app_segments = self.get_jpeg_app_segments(f)
+            app_segments = ThermalReportGenerator.get_jpeg_app_segments(f)
 
         if not tags.get("@drone-dji:ImageSource", "") == "InfraredCamera":
             return None
@@ -186,27 +625,27 @@ class ThermalReportGenerator:
 
         # 如果有任何选项没有定义，则空跑一轮获取默认值
         if not all((self.distance, self.humidity, self.emissivity, self.ambient, self.reflection)):
-            default_vals = dict()
-            cmd = [
-                "-a", "measure", "-s", str(img_path), "-o", "NUL" if os.name == 'nt' else "/dev/null", 
-            ]+ \
-            (["--distance", "1.0",] if not self.distance else []) + \
-            (["--humidity", "20.0",] if not self.humidity else []) + \
-            (["--emissivity", "0.10",] if not self.emissivity else []) + \
-            (["--ambient", "0.0",] if not self.ambient else []) + \
-            (["--reflection", "0.0",] if not self.reflection else [])
-            proc = await asyncio.create_subprocess_exec(
-                self.cli_path, *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            # 默认值只取决于图像本身，同一会话内的重复任务直接复用
+            cache_key = (
+                str(pathlib.Path(img_path).absolute()), file_fingerprint(img_path),
+                tuple(not v for v in (self.distance, self.humidity, self.emissivity, self.ambient, self.reflection))
             )
-            stdout, _ = await proc.communicate()
-            result = stdout.decode(locale.getencoding())
-            for line in result.split('\n'):
-                if (matched := re.match(r'Change (\w+) from ([+-]?(?:\d+\.?\d*|\.\d+)) to [+-]?(?:\d+\.?\d*|\.\d+)', line)):
-                    param, default_val = matched.groups()
-                    default_vals[param.split('_')[0]] = float(default_val)
+            if cache_key in self.session.default_settings_cache:
+                return self.session.default_settings_cache[cache_key]
+
+            missing = [key for key in MEASURE_PARAMS if not getattr(self, key)]
+            # 目录中保存过的默认值跨运行复用
+            if self.catalog is not None:
+                saved = self.catalog.get_defaults(img_path)
+                if all(key in saved for key in missing):
+                    default_vals = {key: saved[key] for key in missing}
+                    self.session.cache_default_settings(cache_key, default_vals)
+                    return default_vals
+            default_vals = await self.backend.default_settings(img_path, missing)
+            if default_vals is not None:
+                self.session.cache_default_settings(cache_key, default_vals)
+                if self.catalog is not None:
+                    self.catalog.set_defaults(img_path, default_vals)
 
         return default_vals
 
@@ -217,33 +656,21 @@ class ThermalReportGenerator:
             xmp: str,
             exif: bytes,
         ):
-        raw_out = pathlib.Path(self.temp_dir) / f"{task_id}.raw"
-        
-        cmd = [
-            "-a", "measure", "--measurefmt", "float32", "-s", str(img_path), "-o", raw_out, 
-        ]
-
-        proc = await asyncio.create_subprocess_exec(
-            self.cli_path, *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        )
-        stdout, _ = await proc.communicate()
-        if not proc.returncode == 0 or not raw_out.exists():
-            return None
-        
-        result = stdout.decode(locale.getencoding())
-        w, h = 0, 0
-        for line in result.split('\n'):
-            if "image  width" in line:
-                w = int(line.split(':')[-1].strip())
-            if "image height" in line:
-                h = int(line.split(':')[-1].strip())
-        
-        import numpy as np
-        async with aiofiles.open(raw_out, mode='rb') as f:
-            temp_data = np.frombuffer(await f.read(), dtype=np.float32).reshape((h, w))
+        temps = await self.backend.measure_shared(img_path, task_id, self.decode_params())
+        if temps is None:
+            return None, None
+        with temps:
+            stats = await self.analyze_temps(temps) if self.analysis else None
+            return await self.write_geotiff(temps.array, task_id, gps, xmp, exif), stats
 
+    async def write_geotiff(self, 
+            temp_data: 'np.ndarray', 
+            task_id: str, 
+            gps: tuple[float, float, float],
+            xmp: str,
+            exif: bytes,
+        ) -> Optional[pathlib.Path]:
+        """把温度矩阵写为带地理参考的 TIFF"""
         # gps: (lat, lon, alt)
         pixel_scale = (1.0, 1.0, 0.0) 
         tiepoint = (0.0, 0.0, 0.0, gps[1], gps[0], gps[2])
@@ -264,7 +691,7 @@ class ThermalReportGenerator:
             (34735, 'H', len(geo_keys), geo_keys, True)
         ]
 
-        final_img_path = pathlib.Path(self.temp_dir) / f"{task_id}.tif"
+        final_img_path = self.store.path(f"{task_id}.tif")
 
         import tifffile
         cache_bytesIO = io.BytesIO()
@@ -278,6 +705,9 @@ class ThermalReportGenerator:
             extratags=extra_tags,
         )
 
+        from PIL import Image
+        import aiofiles
+
         cache_bytesIO_2 = io.BytesIO()
         cache_bytesIO.seek(0)
         with Image.open(cache_bytesIO) as img:
@@ -287,53 +717,69 @@ class ThermalReportGenerator:
         async with aiofiles.open(final_img_path, mode='wb') as f:
             await f.write(cache_bytesIO_2.getbuffer())
         del cache_bytesIO_2
-
-        raw_out.unlink(missing_ok=True)
+        self.store.add(final_img_path)
 
         return final_img_path if final_img_path.exists() else None
 
-    async def process_thermal_async(self, img_path: str | pathlib.Path, task_id: str, app_segments: Optional[dict[int, list[str]]] = None):
-        """调用 DJI SDK CLI 处理图像"""
-        raw_out = pathlib.Path(self.temp_dir) / f"{task_id}.raw"
-        
-        # 生成伪彩色图像数据 (RGB 格式)
-        cmd = [
-            "-a", "process", "-s", str(img_path), "-o", raw_out, 
-            "--brightness", str(self.brightness),
-        ] + \
-        (["--distance", str(self.distance),] if self.distance else []) + \
-        (["--humidity", str(self.humidity),] if self.humidity else []) + \
-        (["--emissivity", str(self.emissivity),] if self.emissivity else []) + \
-        (["--ambient", str(self.ambient),] if self.ambient else []) + \
-        (["--reflection", str(self.reflection),] if self.reflection else []) + \
-        (["-p", self.palette.name,] if self.palette != ThermalPalette.keep else [])
-
-        proc = await asyncio.create_subprocess_exec(
-            self.cli_path, *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        )
-        stdout, _ = await proc.communicate()
-        result = stdout.decode(locale.getencoding())
-        
-        # 解析 CLI 输出获取自适应温度范围
-        # 示例输出: Color bar adaptive range is [25.5, 36.8]
-        min_temp, max_temp, w, h = "N/A", "N/A", 0, 0
-        for line in result.split('\n'):
-            if "adaptive range" in line:
-                temps = line.split('[')[1].split(']')[0].split(',')
-                min_temp, max_temp = f"{float(temps[0].strip()):.1f}", f"{float(temps[1].strip()):.1f}"
-            if "image  width" in line:
-                w = int(line.split(':')[-1].strip())
-            if "image height" in line:
-                h = int(line.split(':')[-1].strip())
-
-        # 将 Raw RGB 转换指定格式
-        async with aiofiles.open(raw_out, "rb") as f:
-            img = Image.frombytes("RGB", (w, h), await f.read())
+    async def encode_archive_frame(self, full_path: pathlib.Path, img_name: str, task_id: str, meta: dict):
+        """测温并在进程池中量化压缩，数据块随结果返回，由 run_archive 顺序写入"""
+        temps = await self.backend.measure_shared(full_path, task_id, self.decode_params())
+        if temps is None:
+            return None, None, img_name, "Cannot measure temperature", None
+        with temps:
+            default_vals = await self.get_default_settings(full_path) or dict()
+            block, frame = await self.run_in_pool(call_shared, encode_frame, temps.ref, self.archive_dtype, self.archive_level)
+        frame_meta = {
+            'input': str(img_name),
+            'filename': pathlib.Path(img_name).name,
+            'create_time': meta['create_time'],
+            'gps': list(meta['raw_gps']),
+            'model': meta['model'],
+            'sn': meta['sn'],
+            'params': {key: getattr(self, key) or default_vals.get(key) for key in MEASURE_PARAMS},
+        }
+        return None, None, img_name, None, {'block': block, 'frame': frame, 'meta': frame_meta}
+
+    async def analyze_temps(self, temps: Lease) -> dict:
+        """在进程池中统计共享块上的温度矩阵"""
+        return await self.run_in_pool(call_shared, analyze, temps.ref, self.rois, self.hotspot_threshold)
+
+    async def colorize_shared(self, img_path: str | pathlib.Path, task_id: str
+        ) -> tuple[Lease, int, int, float, float]:
+        """自定义调色盘: 测温后按 LUT 着色到共享块中，返回值与 backend.process_shared 相同"""
+        temps = await self.backend.measure_shared(img_path, task_id, self.decode_params())
+        if temps is None:
+            raise RuntimeError(f"Failed to measure {img_path}")
+        with temps:
+            h, w = temps.shape
+            low, high = float(temps.array.min()), float(temps.array.max())
+            rgb = self.session.buffers.acquire((h, w, 3), 'uint8')
+            try:
+                await asyncio.to_thread(apply_lut, temps.array, self.lut, low, high, LEVELS, self.brightness, rgb.array)
+            except BaseException:
+                rgb.release()
+                raise
+        return rgb, w, h, low, high
+
+    async def process_thermal_async(self,
+            img_path: str | pathlib.Path,
+            task_id: str,
+            app_segments: Optional[dict[int, list[str]]] = None,
+            in_memory: bool = False
+        ):
+        """调用解码后端处理图像，in_memory 为 True 时不写入临时文件，直接返回编码后的图像数据"""
+        from PIL import Image
+
+        if self.lut is not None:
+            rgb, w, h, low, high = await self.colorize_shared(img_path, task_id)
+        else:
+            rgb, w, h, low, high = await self.backend.process_shared(img_path, task_id, self.decode_params())
+
+        # 将 Raw RGB 转换指定格式；RGB 不是 PIL 能直接映射的模式，frombuffer 会复制一份，之后即可归还共享块
+        with rgb:
+            img = Image.frombuffer("RGB", (w, h), rgb.array, 'raw', 'RGB', 0, 1)
         
-        final_img_path = pathlib.Path(self.temp_dir) / f"{task_id}.{self.img_format}"
+        final_img_path = self.page_path(f"{task_id}.{self.img_format}")
 
         params = {'compress_level': self.png_compress}
         if self.img_format == 'jpeg':
@@ -348,249 +794,745 @@ class ThermalReportGenerator:
                 elif seg[4:].startswith(b'http://ns.adobe.com/xap/1.0/'):
                     params['xmp'] = seg[4:]
 
-        with io.BytesIO() as stream:
-            await asyncio.to_thread(img.save, stream, self.img_format, **params)
-            if app_segments and self.img_format == 'jpeg' and self.jpeg_keepdata:
-                new_pos: dict[int, tuple[int, int]] = self.get_jpeg_app_segments(stream, pos_only=True)['pos']
-                app_end_pos = new_pos.get(0xE1, new_pos.get(0xE0, (0, stream.tell())))[1]
-                stream.seek(0)
-                async with aiofiles.open(final_img_path, mode='wb') as f:
-                    await f.write(stream.read(app_end_pos))
-                    for marker, segs in app_segments.items():
-                        if marker != 'pos' and (marker & 0xF) > 1:
-                            for seg in segs:
-                                await f.write(seg)
-                    await f.write(stream.read())
-            else:
-                async with aiofiles.open(final_img_path, mode='wb') as f:
-                    await f.write(stream.getvalue())
+        if in_memory:
+            with io.BytesIO() as stream:
+                await asyncio.to_thread(img.save, stream, self.img_format, **params)
+                return stream.getvalue(), low, high, w, h
 
-        raw_out.unlink(missing_ok=True)
+        # 保留原图的其余 APPn 段 (DJI 的测温数据等)，在编码的同时插入
+        keep_segments = [
+            seg for marker, segs in app_segments.items() if marker != 'pos' and (marker & 0xF) > 1 for seg in segs
+        ] if app_segments and self.img_format == 'jpeg' and self.jpeg_keepdata else []
+
+        def encode(image: 'Image.Image'):
+            # 编码器直接写入目标文件 (无需插入时 PIL 直接使用文件描述符)，不在内存中保留完整的编码结果
+            with open(final_img_path, mode='wb') as f:
+                image.save(JpegSegmentSplicer(f, keep_segments) if keep_segments else f, self.img_format, **params)
+
+        await asyncio.to_thread(encode, img)
+        del img
+        self.store.add(final_img_path)
         
-        return final_img_path, min_temp, max_temp, w, h
+        return final_img_path, low, high, w, h
+
+    def exceeds_threshold(self, low: Optional[float], high: Optional[float]) -> bool:
+        """分诊: 最高温或温差达到阈值时返回 True，没有温度范围时无法判断，同样生成完整页面"""
+        if self.triage_max is None and self.triage_delta is None:
+            return True
+        if low is None or high is None:
+            return True
+        if self.triage_max is not None and high >= self.triage_max:
+            return True
+        return self.triage_delta is not None and high - low >= self.triage_delta
+
+    def resource_url(self, task_id: str, data: bytes) -> str:
+        """
+        页面图像在 HTML 中的地址
+
+        图像数据不落盘: 以库形式调用时由 _sync_render_pdf 的 url_fetcher 按任务 ID 直接返回，
+        可执行文件只能读取 HTML 本身，改用 data URI。两种方式都不会重新编码图像。
+        """
+        if self.weasy_path:
+            return f"data:image/{self.img_format};base64,{base64.b64encode(data).decode('ascii')}"
+        return f"{RESOURCE_SCHEME}:{task_id}.{self.img_format}"
 
-    async def render_pdf_worker(self, html_str: str, pdf_path: str):
+    async def render_pdf_worker(self, html_str: str, pdf_path: str, resources: Optional[dict[str, bytes]] = None):
         if not self.weasy_path:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                self.executor, 
-                self._sync_render_pdf, html_str, pdf_path
-            )
+            await self.run_in_pool(self._sync_render_pdf, html_str, pdf_path, resources)
         else:
             proc = await asyncio.create_subprocess_exec(
                 str(self.weasy_path), "-", str(pdf_path),
                 stdin=asyncio.subprocess.PIPE,
                 creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
-            await proc.communicate(html_str.encode('utf-8'))
+            try:
+                await proc.communicate(html_str.encode('utf-8'))
+            finally:
+                # 被取消时结束子进程
+                if proc.returncode is None:
+                    proc.kill()
 
     @staticmethod
-    def _sync_render_pdf(html_str: str, pdf_path: str):
+    def _sync_render_pdf(html_str: str, pdf_path: str, resources: Optional[dict[str, bytes]] = None):
         try:
-            from weasyprint import HTML
-            HTML(string=html_str).write_pdf(pdf_path)
+            from weasyprint import HTML, default_url_fetcher
+
+            def url_fetcher(url: str, *args, **kwargs):
+                # 内存中的页面图像，原样交给 WeasyPrint
+                if resources and url in resources:
+                    return {'string': resources[url], 'mime_type': f"image/{url.rsplit('.', 1)[-1]}"}
+                return default_url_fetcher(url, *args, **kwargs)
+
+            HTML(string=html_str, url_fetcher=url_fetcher).write_pdf(pdf_path)
         except ImportError:
             print("错误: 未找到 weasyprint 库")
             raise
 
-    async def process_single_file(self, img_name: str, work: Literal['report', 'palette', 'geotiff'] = 'report'):
+    async def process_single_file(self, img_name: str, work: Literal['report', 'palette', 'geotiff', 'archive'] = 'report'):
         """单个文件的完整处理流水线"""
-        async with self.semaphore:
-            task_id = uuid.uuid4().hex
-            if not pathlib.Path(img_name).is_absolute():
-                full_path = pathlib.Path(self.input_dir) / img_name
-            else:
-                full_path = pathlib.Path(img_name)
-            pdf_path = pathlib.Path(self.temp_dir) / f"{task_id}.pdf"
+        async with self.semaphore, self.store.reserve():
+            result = await self._process_single_file(img_name, work)
+            # 按本张图像实际产生的临时文件调整后续预留的大小
+            self.store.observe(sum(self.store.files.get(str(p), 0) for p in result[:2] if p is not None))
+            return result
+
+    async def _process_single_file(self, img_name: str, work: Literal['report', 'palette', 'geotiff', 'archive']):
+        if not pathlib.Path(img_name).is_absolute():
+            full_path = pathlib.Path(self.input_dir) / img_name
+        else:
+            full_path = pathlib.Path(img_name)
+        
+        task_id = None
+        meta = None
+        try:
+            # 确定的临时文件名，中断后可以由日志对应回输入
+            task_id = make_task_id(full_path, self.job_digest(work))
+            pdf_path = self.page_path(f"{task_id}.pdf")
+
+            # 元数据提取 (同步)
+            meta = self.get_metadata(full_path)
+            if meta is None:
+                return None, None, img_name, "No InfraredCamera Image / Cannot find DJI XMP", None
             
-            try:
-                # 元数据提取 (同步)
-                meta = self.get_metadata(full_path)
-                if meta is None:
-                    return None, None, img_name, "No InfraredCamera Image / Cannot find DJI XMP"
-                
-                if work == 'geotiff':
-                    tiff_path = await self.measure_thermal_async(full_path, task_id, meta['raw_gps'], meta['raw_xmp'], meta['raw_exif'])
-                    return None, tiff_path, img_name, None
+            if work == 'archive':
+                return await self.encode_archive_frame(full_path, img_name, task_id, meta)
+
+            if work == 'geotiff':
+                tiff_path, stats = await self.measure_thermal_async(full_path, task_id, meta['raw_gps'], meta['raw_xmp'], meta['raw_exif'])
+                return None, tiff_path, img_name, None, stats
+        
+            # SDK 处理；WeasyPrint 渲染的报告页面直接使用内存中的图像数据，不写入临时文件
+            in_memory = work == 'report' and self.engine == 'weasyprint'
+            image, low, high, w, h = await self.process_thermal_async(
+                full_path,
+                task_id, 
+                meta['raw_segments'] if work == 'palette' else None,
+                in_memory
+            )
+            png_path, image_data = (None, image) if in_memory else (image, None)
+
+            if work == 'palette':
+                return None, png_path, img_name, None, None
+
+            stats = None
+            if self.analysis:
+                # 报告只解码了伪彩色图像，需要额外测温一次
+                temps = await self.backend.measure_shared(full_path, task_id, self.decode_params())
+                if temps is not None:
+                    with temps:
+                        stats = await self.analyze_temps(temps)
+
+            t_min = f"{low:.1f}" if low is not None else "N/A"
+            t_max = f"{high:.1f}" if high is not None else "N/A"
+            # 有温度矩阵时按实际的最值分诊与汇总
+            if stats:
+                low, high = stats['min'], stats['max']
+            # 供批次摘要累计的信息，分析结果随之交给日志后即释放
+            info = {
+                'input': str(img_name), 'filename': pathlib.Path(img_name).name,
+                'sn': meta['sn'], 'create_time': meta['create_time'], 'min': low, 'max': high,
+                'gps': list(meta['raw_gps'][:2]), 'histogram': stats['histogram'] if stats else None,
+                'analysis': stats
+            }
+            if not self.exceeds_threshold(low, high):
+                # 未超过阈值，跳过渲染，只在摘要页中列出
+                if png_path is not None:
+                    self.store.remove(png_path)
+                return None, None, img_name, TriageSkip(pathlib.Path(img_name).name, meta['create_time'], meta['gps'], t_min, t_max), info
             
-                # SDK 处理
-                png_path, t_min, t_max, w, h = await self.process_thermal_async(
-                    full_path,
-                    task_id, 
-                    meta['raw_segments'] if work == 'palette' else None
-                )
-
-                if work == 'palette':
-                    return None, png_path, img_name, None
-                
-                for key in [k for k in meta if k.startswith('raw_')]:
-                    if key in meta: meta.pop(key)
-                
-                default_vals = await self.get_default_settings(full_path) or dict()
-
-                # 渲染 HTML
-                html_out = self.template.render(
-                    filename=pathlib.Path(img_name).name,
-                    image_path=pathlib.Path(png_path).absolute().as_uri(),
-                    min_temp=t_min, max_temp=t_max,
-                    palette_colors = get_palette(
-                        self.palette 
-                        if self.palette != ThermalPalette.keep
-                        else ThermalPalette.__members__.get(
-                            meta['palette'], 
-                            ThermalPalette.iron_red
-                        )
-                    ),
-                    width=w, height=h,
-                    distance=f"{self.distance if self.distance else default_vals.get('distance', 0.0)}", 
-                    humidity=f"{self.humidity if self.humidity else default_vals.get('humidity', 0.0)}", 
-                    emissivity=f"{self.emissivity if self.emissivity else default_vals.get('emissivity', 0.0)}", 
-                    reflection=f"{self.reflection if self.reflection else default_vals.get('reflection', 0.0)}",
-                    ambient=f"{self.ambient if self.ambient else default_vals.get('ambient', 0.0)}",
-                    colorbar_width = self.colorbar_width,
-                    colorbar_border = self.border,
-                    **meta
-                )
-                
-                # 进程池渲染 PDF
-                await self.render_pdf_worker(html_out, pdf_path)
-                return pdf_path, png_path, img_name, None
-            except Exception as e:
-                traceback.print_exc()
-                return None, None, img_name, e
-
-    async def run_geotiff(self, image_abs_paths: Optional[list[str | pathlib.Path]] = None) -> AsyncGenerator[tuple[int, dict], None]:
-        if not image_abs_paths:
-            images = [(pathlib.Path(self.input_dir) / f).absolute() for f in os.listdir(str(self.input_dir)) if f.lower().endswith(('.jpg', '.jpeg'))]
+            for key in [k for k in meta if k.startswith('raw_')]:
+                if key in meta: meta.pop(key)
+            
+            default_vals = await self.get_default_settings(full_path) or dict()
+
+            palette = self.custom_lut or (self.palette if self.palette != ThermalPalette.keep else ThermalPalette.__members__.get(
+                meta['palette'], 
+                ThermalPalette.iron_red
+            )).name
+            context = dict(
+                filename=pathlib.Path(img_name).name,
+                min_temp=t_min, max_temp=t_max,
+                width=w, height=h,
+                distance=f"{self.distance if self.distance else default_vals.get('distance', 0.0)}", 
+                humidity=f"{self.humidity if self.humidity else default_vals.get('humidity', 0.0)}", 
+                emissivity=f"{self.emissivity if self.emissivity else default_vals.get('emissivity', 0.0)}", 
+                reflection=f"{self.reflection if self.reflection else default_vals.get('reflection', 0.0)}",
+                ambient=f"{self.ambient if self.ambient else default_vals.get('ambient', 0.0)}",
+                colorbar_width = self.colorbar_width,
+                analysis = stats,
+                **meta
+            )
+
+            if self.engine == 'fitz':
+                # 只写出页面描述，图像保留到合并时原样嵌入最终文档
+                spec_path = self.page_path(f"{task_id}{PAGE_SUFFIX}")
+                write_page_spec(spec_path, {
+                    **context,
+                    'image_path': str(pathlib.Path(png_path).absolute()),
+                    'palette': palette,
+                    'colorbar_border': bool(self.border),
+                })
+                self.store.add(spec_path)
+                return spec_path, png_path, img_name, None, info
+
+            # 渲染 HTML
+            image_url = self.resource_url(task_id, image_data)
+            html_out = self.session.template.render(
+                image_path=image_url,
+                palette_colors = self.session.get_palette(palette),
+                colorbar_border = self.border,
+                **context
+            )
+            
+            # 进程池渲染 PDF
+            await self.render_pdf_worker(html_out, pdf_path, {image_url: image_data} if not self.weasy_path else None)
+            del image_data
+            self.store.add(pdf_path)
+            return pdf_path, png_path, img_name, None, info
+        except Exception as e:
+            traceback.print_exc()
+            # 删除失败的图像已写入的中间文件
+            if task_id is not None:
+                self.remove_temp(task_id)
+            # 已读取到元数据时带上序列号与拍摄时间，失败也计入摘要中对应的分组
+            return None, None, img_name, e, {'sn': meta['sn'], 'create_time': meta['create_time']} if meta else None
+
+    def progress(self, success: bool, message: str) -> tuple[int, dict]:
+        """累计计数并生成一条进度结果"""
+        if success:
+            self.completed += 1
         else:
-            images = []
-            for f in image_abs_paths:
-                if not pathlib.Path(f).is_absolute():
-                    raise ValueError("Path in file list must be absolute!")
-                if str(f).lower().endswith(('.jpg', '.jpeg')):
-                    images.append(str(f))
+            self.failed += 1
+        return self.total, {'success': success, 'message': message}
+
+    @staticmethod
+    def analysis_data(journal: JobJournal, img: str | pathlib.Path) -> dict:
+        """写入清单的分析结果，从日志中读回，不常驻内存"""
+        stats = journal.detail(img)
+        return {'analysis': stats} if stats else dict()
+
+    @staticmethod
+    def journal_info(info: dict) -> dict:
+        """写入日志的图像信息，分析结果 (包括像素直方图) 作为 detail 单独保存"""
+        return {'info': {k: v for k, v in info.items() if k not in ('histogram', 'analysis')}}
+
+    @staticmethod
+    def write_json(path: str | pathlib.Path, data: dict):
+        with open(path, mode='w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    async def render_summary(self,
+            skipped: list[TriageSkip],
+            flagged: int,
+            batch: Optional[BatchSummary] = None,
+            sites: Optional[list[dict]] = None
+        ) -> pathlib.Path:
+        """渲染摘要页: 批次统计，各地点的范围，以及分诊时未超过阈值而没有生成完整页面的图像"""
+        context = dict(
+            create_time=datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S"),
+            triage=self.triage_max is not None or self.triage_delta is not None,
+            triage_max=self.triage_max,
+            triage_delta=self.triage_delta,
+            flagged=flagged,
+            batch=batch.to_dict() if batch is not None else None,
+            max_bars=BatchSummary.histogram_bars(batch.max_histogram) if batch is not None else [],
+            pixel_bars=BatchSummary.histogram_bars(batch.pixel_histogram) if batch is not None else [],
+            sites=sites
+        )
+        digest = self.job_digest('report')[:12]
+        if self.engine == 'fitz':
+            # 由 PageComposer 在合并时直接绘制，不需要 WeasyPrint
+            spec_path = self.store.path(f"summary_{digest}{PAGE_SUFFIX}")
+            write_page_spec(spec_path, {'kind': 'summary', 'skipped': [item._asdict() for item in skipped], **context})
+            self.store.add(spec_path)
+            return spec_path
+        html_out = self.session.summary_template.render(skipped=skipped, **context)
+        pdf_path = self.store.path(f"summary_{digest}.pdf")
+        await self.render_pdf_worker(html_out, pdf_path)
+        self.store.add(pdf_path)
+        return pdf_path
+
+    def update_analysis_sidecar(self, report_index: ReportIndex, journal: JobJournal, added: list[str | pathlib.Path], skipped: dict):
+        """追加后更新报告的分析结果: 加入新图像，并按输入清单重新编号页码"""
+        sidecar = report_index.report.with_suffix('.json')
+        data = {'report': report_index.report.name, 'hotspot_threshold': self.hotspot_threshold, 'rois': self.rois, 'images': []}
+        if sidecar.exists():
+            with open(sidecar, mode='r', encoding='utf-8') as f:
+                data = json.load(f)
+        entries = {entry['input']: entry for entry in data['images']}
+        for img in added:
+            entries[str(img)] = {'input': str(img), 'skipped': img in skipped, 'analysis': journal.detail(img)}
+        for entry in entries.values():
+            entry['report'] = report_index.report.name
+            entry['page'] = report_index.page(entry['input'])
+        data['images'] = sorted(entries.values(), key=lambda e: (e['page'] is None, e['page'] or 0, e['input']))
+        self.write_json(sidecar, data)
+        self.outputs.append(sidecar)
+
+    @staticmethod
+    def site_report(output_file: pathlib.Path, site: str) -> pathlib.Path:
+        return output_file.with_name(f"{output_file.stem}_{site}.pdf")
+
+    async def run_export(self,
+        work: Literal['palette', 'geotiff'],
+        image_abs_paths: Optional[list[str | pathlib.Path]] = None,
+        shard: Optional[tuple[int, int]] = None,
+        shard_by: Literal['path', 'time'] = 'path'
+    ) -> AsyncGenerator[tuple[int, dict], None]:
+        """逐张导出图像 (调色盘转换 / GeoTIFF)，输出到 get_output_dir(work)"""
+        images = self.collect_images(image_abs_paths)
+        plan = None
+        if shard and images:
+            plan = ShardPlan(images, *shard, by=shard_by)
+            images = plan.images
+        output_dir = self.get_output_dir(work)
         if not images:
+            if plan is not None:
+                # 空分片也要留下清单，合并时才能确认分片齐全
+                output_dir.mkdir(parents=True, exist_ok=True)
+                self.outputs.append(plan.write_manifest(output_dir, [], []))
             print("未发现待处理图片")
+            self.close()
             return
         
-        self.output_dir = pathlib.Path(self.output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.total, self.completed, self.failed = len(images), 0, 0
+        suffix = 'tif' if work == 'geotiff' else self.img_format
         
-        tasks = [asyncio.create_task(self.process_single_file(img, work='geotiff')) for img in images]
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            if result[0] is None and result[1] is not None:
-                output_path = pathlib.Path(self.output_dir) / pathlib.Path(result[2]).with_suffix(f".{self.img_format}").name
-                filename_out_ext = output_path.with_suffix('').name
-                i = 1
-                while output_path.exists():
-                    output_path = output_path.with_name(f'{filename_out_ext}_{i}.{self.img_format}')
-                    i += 1
-                try:
-                    shutil.move(result[1], output_path)
-                except Exception as e:
-                    pathlib.Path(result[1]).unlink(missing_ok=True)
-                    yield len(images), {'success': False, 'message': f"失败: {result[2]} ({e})"}
-                    continue
-                while output_path.exists():
-                    output_path = output_path.with_name(f'{filename_out_ext}_{i}.tif')
-                    i += 1
-                yield len(images), {'success': True, 'message': f"完成: {output_path}"}
-            else:
-                yield len(images), {'success': False, 'message': f"失败: {result[2]} ({result[3]})"}
+        journal = self.open_journal(work)
+        finished = {img: journal.completed(img) for img in images}
+        pending = [img for img in images if not finished[img]]
+        exported: dict[str | pathlib.Path, pathlib.Path] = dict()
+        for img, artifacts in finished.items():
+            if artifacts:
+                exported[img] = pathlib.Path(artifacts['output'])
+                self.outputs.append(exported[img])
+                yield self.progress(True, f"跳过(已完成): {artifacts['output']}")
+        try:
+            async for result in self.iter_completed(self.process_single_file(img, work=work) for img in pending):
+                if result[0] is None and result[1] is not None:
+                    output_path = output_dir / pathlib.Path(result[2]).with_suffix(f".{suffix}").name
+                    filename_out_ext = output_path.with_suffix('').name
+                    i = 1
+                    while output_path.exists() and not self.overwrite:
+                        output_path = output_path.with_name(f'{filename_out_ext}_{i}.{suffix}')
+                        i += 1
+                    try:
+                        shutil.move(result[1], output_path)
+                        self.store.forget(result[1])
+                    except Exception as e:
+                        self.store.remove(result[1])
+                        journal.record(result[2], False)
+                        yield self.progress(False, f"失败: {result[2]} ({e})")
+                        continue
+                    if (stats := result[4]):
+                        self.write_json(output_path.with_suffix('.json'), {'input': str(result[2]), 'output': output_path.name, **stats})
+                    journal.record(result[2], True, detail=stats, output=output_path)
+                    exported[result[2]] = output_path
+                    self.outputs.append(output_path)
+                    yield self.progress(True, f"完成: {output_path}")
+                else:
+                    journal.record(result[2], False)
+                    yield self.progress(False, f"失败: {result[2]} ({result[3]})")
+        except BaseException:
+            # 出错时同样释放临时存储，日志保留以便 --resume
+            await self.cleanup_unfinished([img for img in pending if img not in exported], work)
+            journal.close()
+            self.close()
+            raise
+        else:
+            # 取消时，清理未完成输入留下的临时文件
+            await self.cleanup_unfinished([img for img in pending if img not in exported], work)
 
-        self.executor.shutdown()
+        if self.cancelled:
+            # 保留日志，之后可以 --resume 继续；分片不完整，不写清单
+            print("任务已取消")
+            journal.close()
+            self.close()
+            return
 
-    async def run_palette_change(self, 
-        image_abs_paths: Optional[list[str | pathlib.Path]] = None
+        if plan is not None:
+            entries = [
+                {'input': img, 'position': plan.positions[img], 'output': output_path.name, **self.analysis_data(journal, img)}
+                for img, output_path in exported.items()
+            ]
+            entries.sort(key=lambda entry: entry['position'])
+            self.outputs.append(plan.write_manifest(output_dir, entries, [img for img in images if img not in exported]))
+
+        journal.close(remove=True)
+        self.remove_work_dir(work)
+        self.close()
+
+    async def run_archive(self,
+        image_abs_paths: Optional[list[str | pathlib.Path]] = None,
+        name: str = 'thermal_archive'
     ) -> AsyncGenerator[tuple[int, dict], None]:
-        if not image_abs_paths:
-            images = [(pathlib.Path(self.input_dir) / f).absolute() for f in os.listdir(str(self.input_dir)) if f.lower().endswith(('.jpg', '.jpeg'))]
-        else:
-            images = []
-            for f in image_abs_paths:
-                if not pathlib.Path(f).is_absolute():
-                    raise ValueError("Path in file list must be absolute!")
-                if str(f).lower().endswith(('.jpg', '.jpeg')):
-                    images.append(str(f))
+        """
+        把温度矩阵逐帧追加到 get_output_dir('archive') / name.tarc 归档
+
+        归档已存在时继续追加 (跳过已归档的图像)，overwrite 为 True 时重新创建
+        """
+        images = self.collect_images(image_abs_paths)
         if not images:
             print("未发现待处理图片")
+            self.close()
             return
-        
-        self.output_dir = pathlib.Path(self.output_dir) / self.palette.name
-        self.output_dir.mkdir(exist_ok=True)
-        
-        tasks = [asyncio.create_task(self.process_single_file(img, work='palette')) for img in images]
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            if result[0] is None and result[1] is not None:
-                output_path = pathlib.Path(self.output_dir) / pathlib.Path(result[2]).with_suffix(f".{self.img_format}").name
-                filename_out_ext = output_path.with_suffix('').name
-                i = 1
-                while output_path.exists():
-                    output_path = output_path.with_name(f'{filename_out_ext}_{i}.{self.img_format}')
-                    i += 1
-                try:
-                    shutil.move(result[1], output_path)
-                except Exception as e:
-                    pathlib.Path(result[1]).unlink(missing_ok=True)
-                    yield len(images), {'success': False, 'message': f"失败: {result[2]} ({e})"}
-                    continue
-                yield len(images), {'success': True, 'message': f"完成: {output_path}"}
-            else:
-                yield len(images), {'success': False, 'message': f"失败: {result[2]} ({result[3]})"}
 
-        self.executor.shutdown()
-    
-    async def run(self, image_abs_paths: Optional[list[str | pathlib.Path]] = None) -> AsyncGenerator[tuple[int, dict], None]:
-        if not image_abs_paths:
-            images = [(pathlib.Path(self.input_dir) / f).absolute() for f in os.listdir(str(self.input_dir)) if f.lower().endswith(('.jpg', '.jpeg'))]
+        output_dir = self.get_output_dir('archive')
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.total, self.completed, self.failed = len(images), 0, 0
+        if self.overwrite:
+            for path in archive_paths(output_dir / name):
+                path.unlink(missing_ok=True)
+        writer = ArchiveWriter(output_dir / name)
+
+        # 以归档索引为准: 已在归档中的图像不重复追加
+        pending = [img for img in images if str(img) not in writer.inputs]
+        for img in images:
+            if str(img) in writer.inputs:
+                yield self.progress(True, f"跳过(已归档): {img}")
+        try:
+            async for result in self.iter_completed(self.process_single_file(img, work='archive') for img in pending):
+                if result[3] is None:
+                    # 只在事件循环中顺序写入，不需要加锁
+                    frame = writer.append(result[4]['block'], result[4]['frame'], result[4]['meta'])
+                    yield self.progress(True, f"完成: {result[2]} (#{frame})")
+                else:
+                    yield self.progress(False, f"失败: {result[2]} ({result[3]})")
+        except BaseException:
+            await self.cleanup_unfinished([img for img in pending if str(img) not in writer.inputs], 'archive')
+            writer.close()
+            self.close()
+            raise
         else:
-            images = []
-            for f in image_abs_paths:
-                if not pathlib.Path(f).is_absolute():
-                    raise ValueError("Path in file list must be absolute!")
-                if str(f).lower().endswith(('.jpg', '.jpeg')):
-                    images.append(str(f))
+            await self.cleanup_unfinished([img for img in pending if str(img) not in writer.inputs], 'archive')
+        writer.close()
+        self.outputs += [writer.path, writer.index_path]
+
+        if self.cancelled:
+            # 已写入的帧保留，再次运行时继续追加
+            print("任务已取消")
+            self.close()
+            return
+
+        print(f"\n归档已写入: {writer.path} (共 {writer.count} 帧)")
+        self.close()
+
+    async def run_geotiff(self, image_abs_paths: Optional[list[str | pathlib.Path]] = None, **kwargs) -> AsyncGenerator[tuple[int, dict], None]:
+        async for r in self.run_export('geotiff', image_abs_paths, **kwargs):
+            yield r
+
+    async def run_palette_change(self, 
+        image_abs_paths: Optional[list[str | pathlib.Path]] = None,
+        **kwargs
+    ) -> AsyncGenerator[tuple[int, dict], None]:
+        async for r in self.run_export('palette', image_abs_paths, **kwargs):
+            yield r
+    
+    async def run(self,
+        image_abs_paths: Optional[list[str | pathlib.Path]] = None,
+        shard: Optional[tuple[int, int]] = None,
+        shard_by: Literal['path', 'time'] = 'path'
+    ) -> AsyncGenerator[tuple[int, dict], None]:
+        """
+        生成报告
+
+        指定 shard = (i, N) 时只处理第 i 个分片，输出分片 PDF 与清单，之后由 cli.py merge 合并为最终报告
+        """
+        images = self.collect_images(image_abs_paths)
+        plan = None
+        if shard and images:
+            plan = ShardPlan(images, *shard, by=shard_by)
+            images = plan.images
         if not images:
+            if plan is not None:
+                # 空分片也要留下清单，合并时才能确认分片齐全
+                self.outputs.append(plan.write_manifest(self.output_dir, [], []))
             print("未发现待处理图片")
+            self.close()
             return
+        report_index = None
+        if self.append_to is not None:
+            if plan is not None or self.site_radius:
+                raise ValueError("Appending to a report cannot be combined with shards or site grouping")
+            report_index = ReportIndex.load(self.append_to)
+            contained = {img for img in images if report_index.contains(img, file_fingerprint(img))}
+            images = [img for img in images if img not in contained]
+            print(f"报告中已有 {len(contained)} 张图片")
+            if not images:
+                print("报告已包含全部图片")
+                self.close()
+                return
 
         print(f"开始处理 {len(images)} 张图片...")
+        self.total, self.completed, self.failed = len(images), 0, 0
         # 利用 Python 3.6 后 dict 的有序性，保证拼合PDF时保持输入顺序
         results = {img: None for img in images}
-        tasks = [asyncio.create_task(self.process_single_file(img)) for img in images]
+        # 分诊时未超过阈值的图像
+        skipped: dict[str | pathlib.Path, TriageSkip] = dict()
+        # 批次摘要只保存定长的统计量，随结果增量累计
+        batch = BatchSummary(self.summary_top)
+        # 按地点分组时需要的拍摄位置，追加时需要的拍摄时间
+        locations: dict[str | pathlib.Path, Optional[tuple[float, float]]] = dict()
+        times: dict[str | pathlib.Path, Optional[str]] = dict()
+        # 恢复模式下，直接复用日志中已渲染好的页面
+        journal = self.open_journal('report')
+        self.pages_dir = self.work_dir('report')
+        for img in images:
+            artifacts = journal.completed(img)
+            if artifacts and 'pdf' in artifacts:
+                results[img] = (artifacts['pdf'], artifacts.get('img'))
+            elif artifacts is not None and 'triage' in journal.data(img):
+                skipped[img] = TriageSkip(**journal.data(img)['triage'])
+            if (results[img] or img in skipped) and (info := journal.data(img).get('info')):
+                if self.analysis:
+                    info = {**info, 'histogram': (journal.detail(img) or dict()).get('histogram')}
+                batch.add(info, skipped=img in skipped)
+                locations[img] = valid_gps(info.get('gps'))
+                times[img] = info.get('create_time')
+        pending = [img for img in images if not results[img] and img not in skipped]
+        for img in images:
+            if results[img] or img in skipped:
+                yield self.progress(True, f"跳过(已完成): {img}")
         
         # 并行执行所有任务
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            if result[0] is not None and result[1] is not None:
-                results[result[2]] = (result[0], result[1])
-                yield len(images), {'success': True, 'message': f"完成: {result[2]}"}
-            else:
-                yield len(images), {'success': False, 'message': f"失败: {result[2]} ({result[3]})"}
+        try:
+            async for result in self.iter_completed(self.process_single_file(img) for img in pending):
+                if result[0] is not None:
+                    if self.engine == 'fitz':
+                        # 页面描述引用图像，合并后才能删除
+                        results[result[2]] = (result[0], result[1])
+                        journal.record(result[2], True, data=self.journal_info(result[4]), detail=result[4]['analysis'], pdf=result[0], img=result[1])
+                    else:
+                        # 图像数据只在内存中传递，渲染完成后没有需要释放的临时图像
+                        results[result[2]] = (result[0], None)
+                        journal.record(result[2], True, data=self.journal_info(result[4]), detail=result[4]['analysis'], pdf=result[0])
+                    batch.add(result[4])
+                    locations[result[2]] = valid_gps(result[4].get('gps'))
+                    times[result[2]] = result[4].get('create_time')
+                    yield self.progress(True, f"完成: {result[2]}")
+                elif isinstance(result[3], TriageSkip):
+                    skipped[result[2]] = result[3]
+                    batch.add(result[4], skipped=True)
+                    locations[result[2]] = valid_gps(result[4].get('gps'))
+                    times[result[2]] = result[4].get('create_time')
+                    journal.record(result[2], True, data={'triage': result[3]._asdict(), **self.journal_info(result[4])}, detail=result[4]['analysis'])
+                    yield self.progress(True, f"未超过阈值: {result[2]} ({result[3].min_temp}~{result[3].max_temp}°C)")
+                else:
+                    failure = result[4] or dict()
+                    batch.add_failure(result[3], failure.get('sn'), failure.get('create_time'))
+                    journal.record(result[2], False)
+                    yield self.progress(False, f"失败: {result[2]} ({result[3]})")
+        except BaseException:
+            # 出错时同样释放临时存储，已渲染的页面与日志保留以便 --resume
+            await self.cleanup_unfinished([img for img in pending if not results[img] and img not in skipped], 'report')
+            journal.close()
+            self.close()
+            raise
+        else:
+            # 取消时，清理未完成输入留下的临时文件
+            await self.cleanup_unfinished([img for img in pending if not results[img] and img not in skipped], 'report')
+
+        if self.cancelled and (plan is not None or not self.finalize_partial):
+            # 已渲染的页面与日志保留，之后可以 --resume 继续
+            print("任务已取消")
+            journal.close()
+            self.close()
+            return
         
         # 筛选有效的 PDF 路径
         pdf_paths = [r[0] for r in results.values() if r]
-        all_temp_imgs = [r[1] for r in results.values() if r]
+
+        if plan is not None:
+            # 分片模式: 输出分片 PDF 与清单，记录每一页对应的全局位置
+            done = [img for img, r in results.items() if r]
+            shard_pdf = pathlib.Path(self.output_dir) / f"{plan.name}.pdf" if pdf_paths else None
+            placement = merge_pdfs(pdf_paths, shard_pdf) if pdf_paths else []
+            entries = [
+                {'input': img, 'position': plan.positions[img], 'page': start, 'pages': count, **self.analysis_data(journal, img)}
+                for img, (start, count) in zip(done, placement)
+            ]
+            if shard_pdf:
+                self.outputs.append(shard_pdf)
+            failed = [img for img, r in results.items() if not r and img not in skipped]
+            self.outputs.append(plan.write_manifest(self.output_dir, entries, failed, shard_pdf))
+            print(f"\n分片已生成: {self.outputs[-1]}")
+        elif report_index is not None and (pdf_paths or skipped):
+            # 追加模式: 新页面按拍摄时间插入已有报告并增量保存，摘要页不会更新
+            report_index.append(
+                [(img, file_fingerprint(img), times.get(img), results[img][0]) for img in images if results[img]],
+                [(img, file_fingerprint(img), times.get(img)) for img in images if img in skipped]
+            )
+            self.outputs += [report_index.report, index_path(report_index.report)]
+            print(f"\n已追加 {len(pdf_paths)} 张图片到报告: {report_index.report}")
+            if self.analysis:
+                self.update_analysis_sidecar(report_index, journal, [img for img in images if results[img] or img in skipped], skipped)
+        elif pdf_paths or skipped:
+            has_summary = self.summary or self.triage_max is not None or self.triage_delta is not None
+            done = [img for img, r in results.items() if r]
+            # 按拍摄位置分组 (包括分诊跳过的图像，地点范围才完整)
+            sites = cluster_sites(
+                {img: locations.get(img) for img in images if results[img] or img in skipped}, self.site_radius
+            ) if self.site_radius else None
+            # 取消后用已完成的页面生成部分报告
+            partial = '_partial' if self.cancelled else ''
+            output_file = pathlib.Path(self.output_dir) / f"DJI_Thermal_Report_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}{partial}.pdf"
+            if has_summary:
+                # 批次 / 分诊摘要页放在报告最前
+                pdf_paths.insert(0, await self.render_summary(
+                    [skipped[img] for img in images if img in skipped], len(done),
+                    batch if self.summary else None,
+                    [
+                        {**site.to_dict(), 'report': self.site_report(output_file, site.name).name if self.site_split else None}
+                        for site in sites
+                    ] if sites else None
+                ))
+            # 每张图像所在的 (报告文件, 页码)
+            pages: dict[str | pathlib.Path, tuple[str, int]] = dict()
+            site_files: dict[str, tuple[str, int]] = dict()
+            if sites and self.site_split:
+                # 每个地点一份报告，各地点在进程池中并行合并；摘要页单独成为主报告
+                jobs = [
+                    (site, [img for img in site.images if results[img]], self.site_report(output_file, site.name))
+                    for site in sites
+                ]
+                jobs = [job for job in jobs if job[1]]
+                placements = await asyncio.gather(*(
+                    self.run_in_pool(merge_pdfs, [results[img][0] for img in site_images], site_file)
+                    for _, site_images, site_file in jobs
+                ))
+                for (site, site_images, site_file), placement in zip(jobs, placements):
+                    pages.update((img, (site_file.name, start)) for img, (start, _) in zip(site_images, placement))
+                    site_files[site.name] = (site_file.name, 0)
+                    self.outputs.append(site_file)
+                    print(f"报告已生成: {site_file} ({len(site_images)} 张)")
+                if has_summary:
+                    merge_pdfs(pdf_paths[:1], output_file)
+                    self.outputs.append(output_file)
+                    print(f"\n摘要已生成: {output_file}")
+            else:
+                ordered = done
+                # 各地点第一张图像的序号 -> 地点名
+                site_starts: dict[int, str] = dict()
+                if sites:
+                    # 同一份报告中按地点分节，每个地点一个书签
+                    ordered = []
+                    for site in sites:
+                        site_images = [img for img in site.images if results[img]]
+                        if site_images:
+                            site_starts[int(has_summary) + len(ordered)] = site.name
+                            ordered += site_images
+                sources = pdf_paths[:int(has_summary)] + [results[img][0] for img in ordered]
+                # 来源序号 -> 图像 (摘要页之后)
+                source_images = dict(enumerate(ordered, start=int(has_summary)))
+                volumes = plan_volumes([source_size(f) for f in sources], self.volume_pages, self.volume_size)
+                if len(volumes) == 1:
+                    files = [output_file]
+                else:
+                    files = [output_file.with_name(f"{output_file.stem}_vol{n:03d}.pdf") for n in range(1, len(volumes) + 1)]
+
+                def volume_sections(start: int, end: int) -> list[tuple[str, int]]:
+                    # 从上一卷延续的地点在卷首也加一个书签
+                    current = [name for index, name in site_starts.items() if index <= start]
+                    sections = [(current[-1], 0)] if current and start not in site_starts else []
+                    return sections + [(name, index - start) for index, name in site_starts.items() if start <= index < end]
+
+                if len(volumes) == 1:
+                    placements = [merge_pdfs(sources, output_file, volume_sections(0, len(sources)) if sites else None)]
+                else:
+                    # 每卷在独立的工作进程中合并保存，单个进程只持有一卷
+                    placements = await asyncio.gather(*(
+                        self.run_in_pool(merge_pdfs, sources[start:end], file, volume_sections(start, end) if sites else None)
+                        for (start, end), file in zip(volumes, files)
+                    ))
+                placement = [item for volume in placements for item in volume]
+                volume_of = [file for (start, end), file in zip(volumes, files) for _ in range(start, end)]
+                pages = {source_images[i]: (volume_of[i].name, start) for i, (start, _) in enumerate(placement) if i in source_images}
+                for index, name in site_starts.items():
+                    site_files[name] = (volume_of[index].name, placement[index][0])
+                self.outputs += files
+                if len(volumes) == 1:
+                    print(f"\n报告已生成: {output_file}")
+                    # 输入清单，之后可以用追加模式加入新的图像
+                    report_index = ReportIndex(output_file, placement[0][1] if has_summary else 0)
+                    for img, (start, count) in zip(ordered, placement[int(has_summary):]):
+                        report_index.add(img, file_fingerprint(img), times.get(img), start, count)
+                    for img in images:
+                        if img in skipped:
+                            report_index.add(img, file_fingerprint(img), times.get(img))
+                    self.outputs.append(report_index.save())
+                else:
+                    volumes_file = output_file.with_name(f"{output_file.stem}_volumes.json")
+                    entries = []
+                    for (start, end), file, volume in zip(volumes, files, placements):
+                        volume_images = [source_images[i] for i in range(start, end) if i in source_images]
+                        volume_times = [times[img] for img in volume_images if times.get(img)]
+                        entries.append({
+                            'report': file.name,
+                            'pages': sum(count for _, count in volume),
+                            'bytes': file.stat().st_size,
+                            'images': len(volume_images),
+                            'first': str(volume_images[0]) if volume_images else None,
+                            'last': str(volume_images[-1]) if volume_images else None,
+                            'start_time': min(volume_times) if volume_times else None,
+                            'end_time': max(volume_times) if volume_times else None,
+                        })
+                        print(f"报告已生成: {file} ({entries[-1]['pages']} 页)")
+                    self.write_json(volumes_file, {'volumes': entries})
+                    self.outputs.append(volumes_file)
+                    print(f"\n分卷索引: {volumes_file}")
+            report_name = output_file.name if output_file.exists() else None
+            if self.analysis:
+                # 与报告同名的分析结果，页码从 0 开始
+                sidecar = output_file.with_suffix('.json')
+                self.write_json(sidecar, {
+                    'report': report_name,
+                    'hotspot_threshold': self.hotspot_threshold,
+                    'rois': self.rois,
+                    'images': [
+                        {
+                            'input': str(img), 'report': pages[img][0] if img in pages else None, 'page': pages[img][1] if img in pages else None,
+                            'skipped': img in skipped, 'analysis': journal.detail(img)
+                        }
+                        for img in images if img in pages or img in skipped
+                    ]
+                })
+                self.outputs.append(sidecar)
+            if self.summary:
+                summary_file = output_file.with_name(f"{output_file.stem}_summary.json")
+                self.write_json(summary_file, {'report': report_name, **batch.to_dict()})
+                self.outputs.append(summary_file)
+            if sites:
+                sites_file = output_file.with_name(f"{output_file.stem}_sites.json")
+                self.write_json(sites_file, {
+                    'radius': self.site_radius,
+                    'sites': [
+                        {
+                            **site.to_dict(),
+                            'report': site_files[site.name][0] if site.name in site_files else None,
+                            'page': site_files[site.name][1] if site.name in site_files else None,
+                            'images': [str(img) for img in site.images]
+                        }
+                        for site in sites
+                    ]
+                })
+                self.outputs.append(sites_file)
+
+        if self.cancelled:
+            # 部分报告不是最终结果，页面与日志继续保留，之后可以 --resume 补全
+            print("任务已取消")
+            journal.close()
+            self.close()
+            return
 
         if pdf_paths:
-            # 合并 PDF (Fitz 合并极快，同步即可)
-            merged_pdf = fitz.open()
-            for p in pdf_paths:
-                with fitz.open(p) as f:
-                    merged_pdf.insert_pdf(f)
-            
-            output_file = pathlib.Path(self.output_dir) / f"DJI_Thermal_Report_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
-            merged_pdf.save(output_file)
-            merged_pdf.close()
-            print(f"\n报告已生成: {output_file}")
-
-            # 清理所有临时文件
-            for f in pdf_paths + all_temp_imgs:
-                pathlib.Path(f).unlink(missing_ok=True)
+            # 清理所有页面 (包括恢复时复用的页面，以及页面描述引用的图像)
+            for f in pdf_paths + [r[1] for r in results.values() if r and r[1]]:
+                self.store.remove(f)
         
-        self.executor.shutdown()
+        journal.close(remove=True)
+        self.remove_work_dir('report')
+        self.close()
 
 if __name__ == "__main__":
     if os.name == 'nt':
@@ -0,0 +1,130 @@
+import os, json, time, hashlib, pathlib
+from typing import Optional
+
+def file_fingerprint(path: str | pathlib.Path) -> str:
+    """以 文件大小 + 修改时间 标识输入文件的版本"""
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def make_task_id(path: str | pathlib.Path, digest: str) -> str:
+    """由 输入路径 + 文件版本 + 任务参数 得到确定的临时文件名，保证中断后可以对应回输入"""
+    path = pathlib.Path(path).absolute()
+    key = f"{path}|{file_fingerprint(path)}|{digest}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class JobJournal:
+    """
+    追加式任务日志 (JSON Lines)
+
+    每完成一个输入就追加一行并写入系统缓冲，进程被杀死时最多丢失正在写入的那一行；
+    fsync 按 sync_every 条 / sync_interval 秒批量执行，断电时最多丢失最近一批记录 (这些输入会重新处理)。
+    恢复时只认可 文件版本未变 且 产物仍然存在 的记录。
+    体积较大的附加数据 (detail，如温度分析结果) 只写入文件，内存中只保留每条记录的位置，需要时再读回。
+    """
+    sync_every = 32
+    sync_interval = 5.0
+
+    def __init__(self, path: str | pathlib.Path, resume: bool = False):
+        self.path = pathlib.Path(path)
+        self.entries: dict[str, dict] = dict()
+        # 每个输入最新一条记录在文件中的位置
+        self.offsets: dict[str, int] = dict()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        if resume and self.path.exists():
+            self._load()
+        else:
+            self.path.unlink(missing_ok=True)
+        self._file = open(self.path, mode='ab')
+
+    def _load(self):
+        offset = 0
+        with open(self.path, mode='rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 崩溃时写了一半的最后一行，截掉后新记录才能从行首开始
+                    break
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    record = None
+                if isinstance(record, dict) and 'input' in record:
+                    record.pop('detail', None)
+                    self.entries[record['input']] = record
+                    self.offsets[record['input']] = offset
+                offset += len(line)
+        os.truncate(self.path, offset)
+
+    def completed(self, img_path: str | pathlib.Path) -> Optional[dict[str, str]]:
+        """返回已完成输入的产物路径，未完成或已失效时返回 None"""
+        record = self.entries.get(str(img_path))
+        if not record or record.get('status') != 'done':
+            return None
+        try:
+            if record.get('fingerprint') != file_fingerprint(img_path):
+                return None
+        except OSError:
+            return None
+        artifacts: dict[str, str] = record.get('artifacts', dict())
+        try:
+            # 断电时日志可能比产物先落盘，空文件同样视为失效
+            if not all(os.path.getsize(p) > 0 for p in artifacts.values()):
+                return None
+        except OSError:
+            return None
+        return artifacts
+
+    def data(self, img_path: str | pathlib.Path) -> dict:
+        """返回记录中附带的非文件数据"""
+        return self.entries.get(str(img_path), dict()).get('data', dict())
+
+    def detail(self, img_path: str | pathlib.Path) -> Optional[dict]:
+        """从文件中读回记录附带的 detail"""
+        offset = self.offsets.get(str(img_path))
+        if offset is None:
+            return None
+        with open(self.path, mode='rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline()).get('detail')
+
+    def record(self,
+            img_path: str | pathlib.Path,
+            success: bool,
+            data: Optional[dict] = None,
+            detail: Optional[dict] = None,
+            **artifacts: str | pathlib.Path
+        ):
+        try:
+            fingerprint = file_fingerprint(img_path)
+        except OSError:
+            fingerprint = None
+        record = {
+            'input': str(img_path),
+            'fingerprint': fingerprint,
+            'status': 'done' if success else 'failed',
+            'artifacts': {k: str(pathlib.Path(v).absolute()) for k, v in artifacts.items() if v is not None}
+        }
+        if data:
+            record['data'] = data
+        self.entries[record['input']] = record
+        self.offsets[record['input']] = self._file.tell()
+        line = {**record, 'detail': detail} if detail else record
+        self._file.write((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self, remove: bool = False):
+        if not self._file.closed:
+            if not remove:
+                self.sync()
+            self._file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
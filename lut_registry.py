@@ -0,0 +1,241 @@
+"""
+调色盘 (LUT) 注册表
+
+内置的 10 个 DJI 调色盘 (luts/lutN.json，没有时读取 lutN.raw) 与用户调色盘 (luts/custom 下的文件)
+在首次使用时各读取一次，编译为连续的 (256, 3) uint8 数组，索引 0 对应最低温；
+需要更细的色阶时 (16 位数据) 按需插值出更高分辨率的表并缓存。
+
+用户调色盘支持:
+  * JSON: [[r, g, b], ...] 颜色列表，或 {"stops": [[位置, "#rrggbb"], ...]} 渐变色标
+  * CSV: 每行 r,g,b，或 位置,r,g,b / 位置,#rrggbb (色标)
+  * raw: 与 DJI 相同的格式，N 个色阶 × 重复像素 × RGB
+  * 渐变色标字符串: "0:#000000,0.5:#ff0000,1:#ffffff"
+用户文件中的颜色从最低温排到最高温；DJI 的内置文件相反 (第一种颜色为最高温)，读取时翻转。
+
+apply_lut 为报告、改色导出、光谱棒与预览共用的向量化着色函数。
+"""
+import csv, json, pathlib, threading
+from typing import Optional, TYPE_CHECKING
+from utils import get_executable_path
+from backends import PALETTE_NAMES
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LUT_DIR = pathlib.Path(get_executable_path()).parent / "luts"
+CUSTOM_DIR = LUT_DIR / "custom"
+LUT_SUFFIXES = ('.json', '.csv', '.raw')
+LEVELS = 256
+
+def parse_color(value) -> tuple[int, int, int]:
+    """'#rrggbb' / '#rgb' 或 [r, g, b]"""
+    if isinstance(value, str):
+        value = value.strip().lstrip('#')
+        if len(value) == 3:
+            value = ''.join(c * 2 for c in value)
+        if len(value) != 6:
+            raise ValueError(f"Invalid color: #{value}")
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    r, g, b = value
+    return int(r), int(g), int(b)
+
+def resample(colors: 'np.ndarray', levels: int, positions: Optional['np.ndarray'] = None) -> 'np.ndarray':
+    """把颜色 (默认等距分布) 线性插值为 levels 级的连续 uint8 数组"""
+    import numpy as np
+    colors = np.asarray(colors, dtype=np.float64)
+    if positions is None:
+        positions = np.linspace(0.0, 1.0, len(colors))
+    x = np.linspace(0.0, 1.0, levels)
+    table = np.stack([np.interp(x, positions, colors[:, c]) for c in range(3)], axis=1)
+    return np.ascontiguousarray(np.rint(table).clip(0, 255).astype(np.uint8))
+
+def compile_stops(stops: list[tuple[float, tuple[int, int, int]]]) -> 'np.ndarray':
+    import numpy as np
+    if len(stops) < 2:
+        raise ValueError("A gradient needs at least 2 stops")
+    stops = sorted(stops, key=lambda stop: stop[0])
+    positions = np.asarray([float(p) for p, _ in stops])
+    if positions[0] == positions[-1]:
+        raise ValueError("Gradient stops must not all be at the same position")
+    positions = (positions - positions[0]) / (positions[-1] - positions[0])
+    return resample([c for _, c in stops], LEVELS, positions)
+
+def parse_stops(text: str) -> 'np.ndarray':
+    """渐变色标字符串 "0:#000000,0.5:#ff0000,1:#ffffff" """
+    stops = []
+    for item in text.split(','):
+        position, _, color = item.partition(':')
+        stops.append((float(position), parse_color(color)))
+    return compile_stops(stops)
+
+def load_json(path: str | pathlib.Path) -> 'np.ndarray':
+    with open(path, mode='r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        if 'stops' in data:
+            return compile_stops([(p, parse_color(c)) for p, c in data['stops']])
+        data = data['colors']
+    return resample([parse_color(c) for c in data], LEVELS)
+
+def load_csv(path: str | pathlib.Path) -> 'np.ndarray':
+    with open(path, mode='r', encoding='utf-8', newline='') as f:
+        rows = [[cell.strip() for cell in row] for row in csv.reader(f) if row and not row[0].lstrip().startswith('#')]
+    # 跳过表头
+    if rows and not rows[0][0].replace('.', '', 1).isdigit():
+        rows = rows[1:]
+    if rows and len(rows[0]) == 3:
+        return resample([parse_color(row) for row in rows], LEVELS)
+    # 色标: 位置,r,g,b 或 位置,#rrggbb
+    return compile_stops([(float(row[0]), parse_color(row[1] if len(row) == 2 else row[1:4])) for row in rows])
+
+def load_raw(path: str | pathlib.Path, levels: int = LEVELS) -> 'np.ndarray':
+    """DJI 的 raw 格式: levels 个色阶，每个色阶重复若干像素 (RGB)，取每组的第一个像素"""
+    import numpy as np
+    data = np.fromfile(path, dtype=np.uint8)
+    repeat = len(data) // (levels * 3)
+    if repeat == 0 or len(data) != levels * repeat * 3:
+        raise ValueError(f"{path} is not a raw LUT of {levels} levels")
+    return np.ascontiguousarray(data.reshape(levels, repeat, 3)[:, 0, :])
+
+def load_file(path: str | pathlib.Path) -> 'np.ndarray':
+    suffix = pathlib.Path(path).suffix.lower()
+    if suffix == '.json':
+        return load_json(path)
+    if suffix == '.csv':
+        return load_csv(path)
+    if suffix == '.raw':
+        return load_raw(path)
+    raise ValueError(f"Unsupported LUT file: {path}")
+
+class Lut:
+    """编译后的调色盘，colors 为只读的 (256, 3) uint8 数组，索引 0 对应最低温"""
+    def __init__(self, name: str, colors: 'np.ndarray'):
+        import numpy as np
+        self.name = name
+        colors = np.ascontiguousarray(colors, dtype=np.uint8)
+        if colors.shape != (LEVELS, 3):
+            colors = resample(colors, LEVELS)
+        colors.flags.writeable = False
+        self.colors = colors
+        self._tables: dict[int, 'np.ndarray'] = {LEVELS: colors}
+        self._lock = threading.Lock()
+
+    def table(self, levels: int = LEVELS) -> 'np.ndarray':
+        """levels 级的表 (如 65536 级用于 16 位数据)，首次使用时插值生成"""
+        with self._lock:
+            if levels not in self._tables:
+                table = resample(self.colors, levels)
+                table.flags.writeable = False
+                self._tables[levels] = table
+            return self._tables[levels]
+
+    def css_gradient(self) -> str:
+        """模板中 linear-gradient(to top, ...) 的颜色列表，最低温在底部"""
+        return ', '.join(f"rgb({r},{g},{b})" for r, g, b in self.colors.tolist())
+
+class LutRegistry:
+    """按名称查找调色盘，内置与用户调色盘只在第一次查找时读取"""
+    def __init__(self, builtin_dir: str | pathlib.Path = LUT_DIR, custom_dir: str | pathlib.Path = CUSTOM_DIR):
+        self.builtin_dir = pathlib.Path(builtin_dir)
+        self.custom_dir = pathlib.Path(custom_dir)
+        self.luts: dict[str, Lut] = dict()
+        # 按文件路径或渐变色标解析出的调色盘，不出现在 names 中
+        self.resolved: dict[str, Lut] = dict()
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        import numpy as np
+        for index, name in enumerate(PALETTE_NAMES):
+            json_path, raw_path = self.builtin_dir / f"lut{index}.json", self.builtin_dir / f"lut{index}.raw"
+            if json_path.exists():
+                with open(json_path, mode='r', encoding='utf-8') as f:
+                    colors = np.asarray(json.load(f), dtype=np.uint8)
+            elif raw_path.exists():
+                colors = load_raw(raw_path)
+            else:
+                continue
+            # DJI 的文件第一种颜色为最高温
+            self.luts[name] = Lut(name, colors[::-1])
+        if self.custom_dir.is_dir():
+            for path in sorted(self.custom_dir.iterdir()):
+                if path.suffix.lower() in LUT_SUFFIXES and path.stem not in self.luts:
+                    try:
+                        self.luts[path.stem] = Lut(path.stem, load_file(path))
+                    except Exception as e:
+                        print(f"警告: 无法读取调色盘 {path} ({e})")
+        self._loaded = True
+
+    def names(self) -> list[str]:
+        with self._lock:
+            self._load()
+            return list(self.luts)
+
+    def custom_names(self) -> list[str]:
+        return [name for name in self.names() if name not in PALETTE_NAMES]
+
+    def register(self, lut: Lut):
+        with self._lock:
+            self._load()
+            self.luts[lut.name] = lut
+
+    def get(self, spec: str) -> Lut:
+        """
+        查找调色盘: 名称、文件路径或渐变色标字符串
+
+        路径与色标编译后以原字符串为键缓存，工作进程中用同一个字符串可以得到同一个调色盘
+        """
+        with self._lock:
+            self._load()
+            if spec in self.luts:
+                return self.luts[spec]
+            if spec in self.resolved:
+                return self.resolved[spec]
+            path = pathlib.Path(spec)
+            if path.suffix.lower() in LUT_SUFFIXES and path.is_file():
+                lut = Lut(path.stem, load_file(path))
+            elif ':' in spec:
+                lut = Lut('gradient', parse_stops(spec))
+            else:
+                raise KeyError(f"Unknown palette: {spec}")
+            self.resolved[spec] = lut
+            return lut
+
+registry = LutRegistry()
+
+def get_lut(spec: str) -> Lut:
+    return registry.get(spec)
+
+def apply_lut(
+        values: 'np.ndarray',
+        lut: Lut,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        levels: int = LEVELS,
+        brightness: int = 50,
+        out: Optional['np.ndarray'] = None
+    ) -> 'np.ndarray':
+    """
+    向量化着色，返回 (..., 3) uint8 数组
+
+    uint8 / uint16 数据且没有指定范围时直接按值查 256 / 65536 级的表；
+    其余数据把 [low, high] (默认为数据的最值) 线性映射到 levels 级的表。
+    brightness 以色阶偏移近似 SDK 的亮度调节，50 为不偏移。
+    """
+    import numpy as np
+    values = np.asarray(values)
+    if low is None and high is None and values.dtype in (np.uint8, np.uint16) and brightness == 50:
+        table = lut.table(256 if values.dtype == np.uint8 else 65536)
+        return np.take(table, values, axis=0, out=out)
+    low = float(values.min()) if low is None else low
+    high = float(values.max()) if high is None else high
+    table = lut.table(levels)
+    index = np.empty(values.shape, dtype=np.float32)
+    np.subtract(values, low, out=index)
+    np.multiply(index, (levels - 1) / max(high - low, 1e-6), out=index)
+    if brightness != 50:
+        np.add(index, (brightness - 50) / 100 * (levels - 1), out=index)
+    np.clip(index, 0, levels - 1, out=index)
+    return np.take(table, index.astype(np.uint16 if levels <= 65536 else np.uint32), axis=0, out=out)
@@ -1,24 +1,21 @@
-import json
+"""
+把 dji_ircm 输出的 lutN.raw 转换为 lutN.json (第一种颜色对应最高温，与 DJI 的顺序相同)
+
+python luts/lut_mapping.py [LUT 目录]，默认为本脚本所在目录
+"""
+import json, pathlib, sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).absolute().parent.parent))
+from lut_registry import load_raw
 
 def convert_raw_lut_to_json(input_file, output_file):
-    # dji_ircm 输出的格式为 256个色阶，每个色阶重复 25 次像素 (RGB)
-    with open(input_file, 'rb') as f:
-        data = f.read()
-    
-    lut_colors = []
-    # 只需提取 256 个独特的颜色值
-    for i in range(256):
-        # 取得每一组（色阶）的第一个像素
-        offset = i * 25 * 3
-        r = data[offset]
-        g = data[offset + 1]
-        b = data[offset + 2]
-        lut_colors.append([r, g, b])
-    
-    # 导出为 JSON 供前端读取
+    # dji_ircm 输出的格式为 256个色阶，每个色阶重复若干次像素 (RGB)
     with open(output_file, 'w') as f:
-        json.dump(lut_colors, f)
+        json.dump(load_raw(input_file).tolist(), f)
     print(f"转换完成: {output_file}")
 
-for i in range(0, 10):
-    convert_raw_lut_to_json(r'D:\Work\Batch\DJI_Thermal_IMG_Reporter\lut\lut{}.raw'.format(i), r'D:\Work\Batch\DJI_Thermal_IMG_Reporter\lut\lut{}.json'.format(i))
\ No newline at end of file
+if __name__ == '__main__':
+    lut_dir = pathlib.Path(sys.argv[1] if len(sys.argv) > 1 else pathlib.Path(__file__).parent)
+    for i in range(0, 10):
+        if (lut_dir / f"lut{i}.raw").exists():
+            convert_raw_lut_to_json(lut_dir / f"lut{i}.raw", lut_dir / f"lut{i}.json")
@@ -1,12 +1,28 @@
-import flet as ft, pathlib, shutil, os, platform, asyncio
+import flet as ft, pathlib, shutil, os, platform, asyncio, multiprocessing
 from components.spin_box import SpinBox
 from components.gallery_item import GalleryItem
-from generator import ThermalReportGenerator
-from utils import check_weasyprint, check_dji_irp, get_executable_path
+from components.progress_log import ProgressLog, ProgressAggregator
+from components.preview_panel import PreviewPanel, MEASURE_KEYS
+from engine_host import EngineHost, EngineJob
+from backends import PALETTE_NAMES
+from utils import ToolCache, get_executable_path
+
+def custom_palettes() -> list[str]:
+    from lut_registry import registry
+    return registry.custom_names()
+
+def with_custom_lut(params: dict) -> dict:
+    """用户调色盘不能交给 SDK，改为通过 custom_lut 在本地着色"""
+    if params.get('palette') not in (*PALETTE_NAMES, 'keep', None):
+        return {**params, 'custom_lut': params['palette'], 'palette': 'iron_red'}
+    return params
 
 files_in_grid: dict[str, bool] = dict()
 settings: dict[str, int | float | str | None] = {
     'temp_dir': str(pathlib.Path(get_executable_path()).parent / 'temps'),
+    # 解码后端，与命令行的 --backend / --sdk-lib 相同
+    'backend': 'cli',
+    'sdk_lib': '',
     'distance': 5.0,
     'humidity': 50.0,
     'emissivity': 0.95,
@@ -37,6 +53,17 @@ font_preset = {
     "Darwin": "PingFang SC"
 }
 is_running = False
+engine: EngineHost | None = None
+tool_cache = ToolCache()
+
+def get_engine() -> EngineHost:
+    """复用常驻的引擎进程 (进程池与模板都在其中)，仅在并发数改变时重建"""
+    global engine
+    if engine is None or engine.max_workers != settings['max_workers']:
+        if engine is not None:
+            engine.close()
+        engine = EngineHost(settings['max_workers'])
+    return engine
 
 def SettingRow(title: str, subtitle: str, control: ft.Control, visible: bool = True):
     return ft.Container(
@@ -60,18 +87,19 @@ async def main(page: ft.Page):
     page.window.prevent_close = True
     file_picker = ft.FilePicker()
 
-    weasyprint_method, which_weasyprint = await check_weasyprint()
-
-    dji_irp_textfield = ft.TextField(await check_dji_irp() or '', max_lines=1, expand=True, read_only=True)
+    # 工具检测在窗口显示后于后台进行，配置文件中的路径先记录下来
+    configured_tools: dict[str, str] = dict()
+    dji_irp_textfield = ft.TextField('', hint_text='正在检测...', max_lines=1, expand=True, read_only=True)
     weasyprint_textfield = ft.TextField(
-        which_weasyprint or '',
+        '',
+        hint_text='正在检测...',
         max_lines=1, 
         expand=True,
         read_only=True
     )
 
     async def read_config():
-        global settings, preset_overwrite
+        global settings, preset_overwrite, tool_cache
         import json
         config_path = pathlib.Path(get_executable_path()).parent / 'dji_timgrg_config.json'
         if not config_path.exists():
@@ -83,15 +111,11 @@ async def main(page: ft.Page):
                 return
             
             for k, v in all_config.items():
-                if k == 'cli_path':
-                    if (await check_dji_irp(v)) is not None:
-                        dji_irp_textfield.value = v
-                        dji_irp_textfield.update()
-                elif k == 'weasy_path':
-                    if weasyprint_method == 'none':
-                        if (await check_weasyprint(v))[0] == 'exe':
-                            weasyprint_textfield.value = v
-                            weasyprint_textfield.update()
+                if k in ('cli_path', 'weasy_path'):
+                    if v and isinstance(v, str):
+                        configured_tools[k] = v
+                elif k == 'tool_cache':
+                    tool_cache = ToolCache(v)
                 elif k in settings and k != 'temp_dir' and isinstance(v, type(settings[k])):
                     settings[k] = v
         except Exception as e:
@@ -132,6 +156,28 @@ async def main(page: ft.Page):
         alignment=ft.Alignment.CENTER
     )
 
+    async def measure_preview(img_path: str, params: dict):
+        if not dji_irp_textfield.value or not await tool_cache.dji_irp(dji_irp_textfield.value):
+            raise FileNotFoundError("未找到 dji_irp")
+        return await get_engine().measure(img_path, dict(
+            cli_path=dji_irp_textfield.value,
+            temp_dir=settings['temp_dir'],
+            backend=settings['backend'],
+            sdk_lib=settings['sdk_lib'],
+            **params
+        ))
+
+    # 选中图像的实时预览，调色盘与亮度在缓存的温度矩阵上直接着色
+    preview_panel = PreviewPanel(measure=measure_preview, width=360, padding=10)
+
+    def update_preview():
+        preview_panel.set_options(
+            {k: settings[k] if preset_overwrite[k] else None for k in MEASURE_KEYS},
+            settings['palette'],
+            settings['brightness']
+        )
+    update_preview()
+
     def on_settings_value_change(value, key: str):
         global settings
         settings[key] = value
@@ -140,25 +186,19 @@ async def main(page: ft.Page):
                 v.visible = k.startswith(value)
                 v.update()
             # settings_view.update()
+        if key in MEASURE_KEYS or key in ('palette', 'brightness'):
+            update_preview()
 
     def on_preset_overwrite_value_change(value, key: str):
         global preset_overwrite
         preset_overwrite[key] = value
+        if key in MEASURE_KEYS:
+            update_preview()
 
     palette_dropdown = ft.Dropdown(
         value='iron_red',
-        options=[
-            ft.DropdownOption('white_hot'),
-            ft.DropdownOption('fulgurite'), 
-            ft.DropdownOption('iron_red'), 
-            ft.DropdownOption('hot_iron'), 
-            ft.DropdownOption('medical'), 
-            ft.DropdownOption('arctic'), 
-            ft.DropdownOption('rainbow1'), 
-            ft.DropdownOption('rainbow2'), 
-            ft.DropdownOption('tint'), 
-            ft.DropdownOption('black_hot')
-        ],
+        # 内置调色盘之后列出 luts/custom 下的用户调色盘
+        options=[ft.DropdownOption(name) for name in (*PALETTE_NAMES, *custom_palettes())],
         text_size=13,
         height=44,
         width=140,
@@ -343,7 +383,7 @@ async def main(page: ft.Page):
                     max_val=100,
                     precision=0,
                     step=1,
-                    on_change=lambda v: on_settings_value_change(int(float(v.data)), 'brigetness')
+                    on_change=lambda v: on_settings_value_change(int(float(v.data)), 'brightness')
                 )
             ),
             SettingRow(
@@ -405,15 +445,25 @@ async def main(page: ft.Page):
 
     uni_progress_bar = ft.ProgressBar(1.0)
     uni_progress_info = ft.Text("等待任务开始", text_align=ft.TextAlign.CENTER)
-    uni_progress_log = ft.ListView(
-        controls=[ft.Container(ft.Text("系统启动"), border=ft.Border.only(
-            top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT),
-        ))], 
+    uni_progress_log = ProgressLog(
         expand=True, 
-        auto_scroll=True, 
-        margin=10, 
-        divider_thickness = 5
+        margin=10
     )
+    uni_progress_log.append("系统启动")
+    # 进度与日志按固定帧率合并刷新，避免每张图片都推送一次界面更新
+    progress = ProgressAggregator(page, uni_progress_bar, uni_progress_info, uni_progress_log)
+    # 正在运行的任务，供停止按钮取消
+    running_job: list[EngineJob] = []
+
+    def on_stop(e):
+        if running_job:
+            # 报告任务用已完成的页面生成部分报告
+            running_job[0].cancel(finalize=True)
+            progress.push("正在取消任务...")
+            stop_button.disabled = True
+            stop_button.update()
+
+    stop_button = ft.Button('停止任务', ft.Icons.STOP, on_click=on_stop, disabled=True)
 
     tab_view = ft.Tabs(
         selected_index=0,
@@ -433,8 +483,13 @@ async def main(page: ft.Page):
                     expand=True,
                     controls=[
                         image_grid_container,
-                        ft.Container(
-                            settings_view
+                        ft.Row(
+                            [
+                                ft.Container(settings_view, expand=True),
+                                preview_panel,
+                            ],
+                            expand=True,
+                            vertical_alignment=ft.CrossAxisAlignment.START,
                         ),
                         ft.Column(
                             [
@@ -442,6 +497,7 @@ async def main(page: ft.Page):
                                     [
                                         uni_progress_info,
                                         uni_progress_bar,
+                                        stop_button,
                                     ],
                                     margin=20,
                                     horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -514,7 +570,7 @@ async def main(page: ft.Page):
     async def on_dji_irp_pick(e):
         file = await on_executable_pick()
         if file:
-            if await check_dji_irp(file.path):
+            if await tool_cache.dji_irp(file.path):
                 dji_irp_textfield.value = file.path
                 dji_irp_textfield.update()
             else:
@@ -545,7 +601,8 @@ async def main(page: ft.Page):
                 GalleryItem(
                     img_url=file.path,
                     alignment=ft.Alignment.CENTER,
-                    files_in_grid=files_in_grid
+                    files_in_grid=files_in_grid,
+                    on_preview=preview_panel.show
                 )
             )
             if image_grid_container.content != image_grid:
@@ -589,6 +646,32 @@ async def main(page: ft.Page):
         open=True,
     )
 
+    async def consume_job(job, done_message: str):
+        """接收引擎推送的事件直到任务结束"""
+        global is_running
+        running_job.append(job)
+        stop_button.disabled = False
+        stop_button.update()
+        async for event in job.events():
+            if event['event'] == 'progress':
+                progress.push(event['message'], event['success'])
+        
+        running_job.clear()
+        stop_button.disabled = True
+        stop_button.update()
+        is_running = False
+        if job.status == 'done':
+            progress.push(done_message)
+            await progress.stop("任务已完成")
+        elif job.status == 'cancelled':
+            for output in job.outputs:
+                progress.push(f"已保存: {output}")
+            progress.push("任务已取消")
+            await progress.stop("任务已取消")
+        else:
+            progress.push(f"任务失败: {job.error}", False)
+            await progress.stop("任务失败")
+
     async def on_generate_report(e):
         global is_running
         if is_running:
@@ -604,18 +687,18 @@ async def main(page: ft.Page):
             is_running = False
             return
 
-        if not dji_irp_textfield.value or not os.path.exists(dji_irp_textfield.value) or not await check_dji_irp(dji_irp_textfield.value):
+        if not dji_irp_textfield.value or not os.path.exists(dji_irp_textfield.value) or not await tool_cache.dji_irp(dji_irp_textfield.value):
             page.show_dialog(no_dji_irp_alert)
             is_running = False
             return
         
         if not weasyprint_textfield.value or not os.path.exists(weasyprint_textfield.value):
-            check_result = await check_weasyprint()
+            check_result = await tool_cache.weasyprint()
             if check_result[0] == 'exe':
                 weasyprint_textfield.value = check_result[1]
                 weasyprint_textfield.update()
         else:
-            check_result = await check_weasyprint(weasyprint_textfield.value)
+            check_result = await tool_cache.weasyprint(weasyprint_textfield.value)
         if check_result[0] == 'none':
             page.show_dialog(no_weasyprint_alert)
             is_running = False
@@ -637,47 +720,17 @@ async def main(page: ft.Page):
             if not v:
                 temp_settings[setting] = None if setting != 'palette' else 'keep'
         
-        uni_progress_bar.value = 0
-        uni_progress_bar.update()
-        gen = ThermalReportGenerator(
+        # 在引擎进程中处理，界面只接收进度事件
+        job = get_engine().submit('report', dict(
             input_dir=None,
             output_dir=output_dir,
             cli_path=dji_irp_textfield.value,
             weasy_path=weasyprint_textfield.value if weasyprint_method == 'exe' else None,
-            **temp_settings
-        )
+            **with_custom_lut(temp_settings)
+        ), selected_items)
 
-        count = 1
-        async for i, r in gen.run(selected_items):
-            uni_progress_bar.value = count / i
-            uni_progress_info.value = f"正在处理报告 {count}/{i}"
-            uni_progress_log.controls.append(
-                ft.Container(
-                    ft.Text(r['message'], color=ft.Colors.GREEN_400 if r['success'] else ft.Colors.RED_400), 
-                    border=ft.Border.only(
-                        top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT),
-                    )
-                )
-            )
-            if len(uni_progress_log.controls) > 1000:
-                uni_progress_log.controls.pop(0)
-            uni_progress_info.update()
-            uni_progress_bar.update()
-            uni_progress_log.update()
-            count += 1
-        
-        is_running = False
-        uni_progress_info.value = f"任务已完成"
-        uni_progress_log.controls.append(
-            ft.Container(
-                ft.Text(f'任务已完成，请检查输出文件夹 "{output_dir}"'), 
-                border=ft.Border.only(
-                    top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT),
-                )
-            )
-        )
-        uni_progress_log.update()
-        uni_progress_info.update()
+        progress.start(lambda: (job.completed + job.failed, job.total), "正在处理报告")
+        await consume_job(job, f'任务已完成，请检查输出文件夹 "{output_dir}"')
 
     async def on_change_palette(e):
         global is_running
@@ -694,7 +747,7 @@ async def main(page: ft.Page):
             is_running = False
             return
 
-        if not dji_irp_textfield.value or not os.path.exists(dji_irp_textfield.value) or not await check_dji_irp(dji_irp_textfield.value):
+        if not dji_irp_textfield.value or not os.path.exists(dji_irp_textfield.value) or not await tool_cache.dji_irp(dji_irp_textfield.value):
             page.show_dialog(no_dji_irp_alert)
             is_running = False
             return
@@ -708,48 +761,17 @@ async def main(page: ft.Page):
         tab_view.selected_index = 2
         tab_view.update()
         
-        uni_progress_bar.value = 0
-        uni_progress_bar.update()
         working_palette = settings['palette']
-        gen = ThermalReportGenerator(
+        job = get_engine().submit('palette', dict(
             input_dir=None,
             output_dir=output_dir,
             cli_path=dji_irp_textfield.value,
             weasy_path=None,
-            **settings
-        )
+            **with_custom_lut(settings)
+        ), selected_items)
 
-        count = 1
-        async for i, r in gen.run_palette_change(selected_items):
-            uni_progress_bar.value = count / i
-            uni_progress_info.value = f"正在处理LUT {count}/{i}"
-            uni_progress_log.controls.append(
-                ft.Container(
-                    ft.Text(r['message'], color=ft.Colors.GREEN_400 if r['success'] else ft.Colors.RED_400), 
-                    border=ft.Border.only(
-                        top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT),
-                    )
-                )
-            )
-            if len(uni_progress_log.controls) > 1000:
-                uni_progress_log.controls.pop(0)
-            uni_progress_info.update()
-            uni_progress_bar.update()
-            uni_progress_log.update()
-            count += 1
-        
-        is_running = False
-        uni_progress_info.value = f"任务已完成"
-        uni_progress_log.controls.append(
-            ft.Container(
-                ft.Text(f'任务已完成，请检查输出文件夹 "{os.path.join(output_dir, working_palette)}"'), 
-                border=ft.Border.only(
-                    top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT),
-                )
-            )
-        )
-        uni_progress_log.update()
-        uni_progress_info.update()
+        progress.start(lambda: (job.completed + job.failed, job.total), "正在处理LUT")
+        await consume_job(job, f'任务已完成，请检查输出文件夹 "{os.path.join(output_dir, working_palette)}"')
 
     async def save_config():
         global settings, preset_overwrite
@@ -759,6 +781,7 @@ async def main(page: ft.Page):
         all_config = settings.copy()
         all_config['cli_path'] = dji_irp_textfield.value
         all_config['weasy_path'] = weasyprint_textfield.value
+        all_config['tool_cache'] = tool_cache.to_dict()
         with open(config_path1, mode='w', encoding='utf-8') as f:
             json.dump(all_config, f)
         with open(config_path2, mode='w', encoding='utf-8') as f:
@@ -767,6 +790,8 @@ async def main(page: ft.Page):
     async def handle_window_event(e: ft.WindowEvent):
         if e.type == ft.WindowEventType.CLOSE:
             await save_config()
+            if engine is not None:
+                await asyncio.to_thread(engine.close)
             await page.window.destroy()
 
     page.window.on_event = handle_window_event
@@ -825,22 +850,48 @@ async def main(page: ft.Page):
             border=ft.Border.only(top=ft.BorderSide(0.5, ft.Colors.OUTLINE_VARIANT))
         )
     )
-    if platform.system() == 'Windows' and weasyprint_method != 'lib':
-        page.add(
-            ft.Row(
-                alignment=ft.MainAxisAlignment.CENTER,
-                controls=[
-                    ft.Button(
-                        "选择weasyprint路径", 
-                        on_click=on_weasyprint_pick,
-                        width=180
-                    ),
-                    weasyprint_textfield,
-                ]
-            )
-        )
+    weasyprint_row = ft.Row(
+        alignment=ft.MainAxisAlignment.CENTER,
+        controls=[
+            ft.Button(
+                "选择weasyprint路径", 
+                on_click=on_weasyprint_pick,
+                width=180
+            ),
+            weasyprint_textfield,
+        ],
+        visible=False
+    )
+    if platform.system() == 'Windows':
+        page.add(weasyprint_row)
+
+    async def probe_tools():
+        """后台检测工具，文件未变化时直接使用缓存的结果"""
+        dji_irp = None
+        if configured_tools.get('cli_path'):
+            dji_irp = await tool_cache.dji_irp(configured_tools['cli_path'])
+        dji_irp = dji_irp or await tool_cache.dji_irp()
+        # 检测期间用户已手动选择时不覆盖
+        if not dji_irp_textfield.value:
+            dji_irp_textfield.value = dji_irp or ''
+        dji_irp_textfield.hint_text = None
+        dji_irp_textfield.update()
+
+        weasyprint_method, which_weasyprint = await tool_cache.weasyprint()
+        if weasyprint_method == 'none' and configured_tools.get('weasy_path'):
+            weasyprint_method, which_weasyprint = await tool_cache.weasyprint(configured_tools['weasy_path'])
+        if not weasyprint_textfield.value:
+            weasyprint_textfield.value = which_weasyprint or ''
+        weasyprint_textfield.hint_text = None
+        if platform.system() == 'Windows':
+            weasyprint_row.visible = weasyprint_method != 'lib'
+            weasyprint_row.update()
+
+    page.run_task(probe_tools)
 
 if __name__ == "__main__":
+    # 打包后引擎进程以 spawn 方式启动，需要 freeze_support
+    multiprocessing.freeze_support()
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
     ft.run(main)
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+报告的输入清单 <报告名>_inputs.json
+
+记录报告中每张输入图像的版本 (文件大小 + 修改时间)、拍摄时间与所在页码。
+追加模式据此只渲染新增或修改过的图像，把新页面按拍摄时间插入已有报告，
+并以增量方式保存: 修改写在原文件末尾，已有内容不会被重写。
+"""
+import os, json, pathlib
+from typing import Optional
+
+INDEX_SUFFIX = '_inputs.json'
+
+def index_path(report: str | pathlib.Path) -> pathlib.Path:
+    report = pathlib.Path(report)
+    return report.with_name(f"{report.stem}{INDEX_SUFFIX}")
+
+class ReportIndex:
+    def __init__(self, report: str | pathlib.Path, offset: int = 0, entries: Optional[list[dict]] = None):
+        self.report = pathlib.Path(report)
+        # 第一张图像之前的页数 (摘要页)
+        self.offset = offset
+        self.entries: dict[str, dict] = {entry['input']: entry for entry in entries or []}
+
+    @classmethod
+    def load(cls, report: str | pathlib.Path) -> 'ReportIndex':
+        path = index_path(report)
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found, only reports generated with an inputs index can be appended to")
+        with open(path, mode='r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(report, data.get('offset', 0), data['images'])
+
+    def contains(self, img: str | pathlib.Path, fingerprint: str) -> bool:
+        entry = self.entries.get(str(img))
+        return entry is not None and entry['fingerprint'] == fingerprint
+
+    def add(self,
+            img: str | pathlib.Path,
+            fingerprint: str,
+            create_time: Optional[str],
+            page: Optional[int] = None,
+            pages: int = 0
+        ):
+        """page 为 None 表示图像没有页面 (分诊时未超过阈值)"""
+        self.entries[str(img)] = {
+            'input': str(img), 'fingerprint': fingerprint, 'create_time': create_time, 'page': page, 'pages': pages
+        }
+
+    def page(self, img: str | pathlib.Path) -> Optional[int]:
+        entry = self.entries.get(str(img))
+        return entry['page'] if entry else None
+
+    def save(self) -> pathlib.Path:
+        path = index_path(self.report)
+        with open(path, mode='w', encoding='utf-8') as f:
+            json.dump({
+                'report': self.report.name,
+                'offset': self.offset,
+                'images': sorted(self.entries.values(), key=lambda e: (e['page'] is None, e['page'] or 0, e['input']))
+            }, f, ensure_ascii=False, indent=1)
+        return path
+
+    def append(self,
+            pages: list[tuple[str | pathlib.Path, str, Optional[str], str | pathlib.Path]],
+            skipped: list[tuple[str | pathlib.Path, str, Optional[str]]]
+        ):
+        """
+        把新页面插入报告并增量保存
+
+        pages 为 (输入, 版本, 拍摄时间, 单页 PDF 或页面描述)，skipped 为没有页面的 (输入, 版本, 拍摄时间)。
+        已在报告中但版本变化的图像，先删除其旧页面。
+        """
+        import fitz # PyMuPDF
+        from fitz_render import PageComposer, insert_source
+
+        replaced = {str(item[0]) for item in pages} | {str(item[0]) for item in skipped}
+        # 按页码排列的现有页面
+        ordered = sorted((e for e in self.entries.values() if e['page'] is not None), key=lambda e: e['page'])
+
+        doc = fitz.open(self.report)
+        composer = PageComposer(doc)
+        try:
+            for entry in reversed(ordered):
+                if entry['input'] in replaced:
+                    doc.delete_pages(from_page=entry['page'], to_page=entry['page'] + entry['pages'] - 1)
+            ordered = [e for e in ordered if e['input'] not in replaced]
+
+            for img, fingerprint, create_time, pdf in sorted(pages, key=lambda item: (item[2] is None, item[2] or '')):
+                # 插入到第一张拍摄时间更晚的图像之前，没有拍摄时间时放在最后
+                position = next(
+                    (i for i, e in enumerate(ordered) if create_time is not None and e['create_time'] is not None and e['create_time'] > create_time),
+                    len(ordered)
+                )
+                target = self.offset + sum(e['pages'] for e in ordered[:position])
+                count = insert_source(doc, pdf, target, composer)
+                self.add(img, fingerprint, create_time, target, count)
+                ordered.insert(position, self.entries[str(img)])
+
+            page = self.offset
+            for entry in ordered:
+                entry['page'] = page
+                page += entry['pages']
+            for img, fingerprint, create_time in skipped:
+                self.add(img, fingerprint, create_time)
+
+            if doc.can_save_incrementally():
+                doc.save(self.report, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            else:
+                # 文件需要修复时无法增量保存，完整写入临时文件后替换
+                temp_file = self.report.with_name(f"{self.report.name}.tmp")
+                doc.save(temp_file, garbage=1)
+                doc.close()
+                os.replace(temp_file, self.report)
+        finally:
+            if not doc.is_closed:
+                doc.close()
+        self.save()
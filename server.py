@@ -0,0 +1,479 @@
+import asyncio, json, time, pathlib, uuid, datetime, shutil, mimetypes, aiofiles
+from collections import deque
+from urllib.parse import urlsplit
+from typing import Optional, Literal
+from generator import ThermalSession, ThermalPalette
+from backends import create_backend
+from analysis import validate_rois
+from lut_registry import registry
+
+PALETTES = [p.name for p in ThermalPalette]
+SUBSAMPLINGS = ['4:4:4', '4:2:2', '4:2:0']
+# 每个任务保留的事件数，更早的进度事件由最后的进度状态代替
+EVENT_HISTORY = 256
+# 已结束的任务最多保留的个数与时长 (秒)，超出后从任务列表中移除 (输出文件不删除)
+FINISHED_JOBS = 100
+FINISHED_TTL = 24 * 3600
+# 请求体大小上限
+MAX_BODY = 1 << 20
+
+# 与 cli.py 中 report / palette 命令的选项保持一致: 选项 -> (类型, 取值范围 或 可选值)
+CALC_OPTIONS = {
+    'distance': (float, (1.0, 25.0)),
+    'humidity': (float, (20.0, 100.0)),
+    'emissivity': (float, (0.10, 1.00)),
+    'ambient': (float, (-40.0, 80.0)),
+    'reflection': (float, (-40.0, 500.0)),
+}
+IMAGE_OPTIONS = {
+    'brightness': (int, (0, 100)),
+    'img_format': (str, ['png', 'jpeg']),
+    'png_compress': (int, (0, 9)),
+    'jpeg_quality': (int, (0, 100)),
+    'jpeg_subsampling': (str, SUBSAMPLINGS),
+}
+# 临时存储的选项，temp_quota 的单位为字节
+TEMP_OPTIONS = {
+    'temp_quota': (int, (1, None)),
+    'ram_temp': (bool, None),
+}
+JOB_OPTIONS = {
+    'report': {
+        **CALC_OPTIONS, **IMAGE_OPTIONS,
+        'palette': (str, PALETTES),
+        'colorbar_width': (int, (1, 100)),
+        'colorbar_border': (bool, None),
+        'triage_max': (float, None),
+        'triage_delta': (float, (0, None)),
+        'summary': (bool, None),
+        'summary_top': (int, (1, None)),
+        'analysis': (bool, None),
+        'rois': (list, None),
+        'hotspot_threshold': (float, None),
+        'site_radius': (float, (1, None)),
+        'site_split': (bool, None),
+        'volume_pages': (int, (1, None)),
+        'volume_size': (int, (1, None)),
+        'engine': (str, ['weasyprint', 'fitz']),
+        'custom_lut': (str, None),
+        'resume': (bool, None),
+        'partial_on_cancel': (bool, None),
+        **TEMP_OPTIONS,
+        'max_workers': (int, (1, None)),
+    },
+    'palette': {
+        **IMAGE_OPTIONS,
+        'palette': (str, [p for p in PALETTES if p != 'keep']),
+        'custom_lut': (str, None),
+        'overwrite': (bool, None),
+        'jpeg_keepdata': (bool, None),
+        'resume': (bool, None),
+        **TEMP_OPTIONS,
+        'max_workers': (int, (1, None)),
+    },
+    'archive': {
+        **CALC_OPTIONS,
+        'archive_dtype': (str, ['float32', 'float16', 'int16']),
+        'archive_level': (int, (0, 9)),
+        'overwrite': (bool, None),
+        **TEMP_OPTIONS,
+        'max_workers': (int, (1, None)),
+    },
+    'geotiff': {
+        **CALC_OPTIONS,
+        'analysis': (bool, None),
+        'rois': (list, None),
+        'hotspot_threshold': (float, None),
+        'overwrite': (bool, None),
+        'resume': (bool, None),
+        **TEMP_OPTIONS,
+        'max_workers': (int, (1, None)),
+    },
+}
+
+HTTP_REASONS = {200: 'OK', 201: 'Created', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 413: 'Content Too Large', 500: 'Internal Server Error'}
+
+def parse_options(work: str, options: dict) -> dict:
+    """按对应命令的约束校验任务参数，返回可直接传给 ThermalReportGenerator 的参数"""
+    if work not in JOB_OPTIONS:
+        raise ValueError(f"Unknown work '{work}', expect one of {list(JOB_OPTIONS)}")
+    if not isinstance(options, dict):
+        raise ValueError("'options' must be an object")
+    specs = JOB_OPTIONS[work]
+    params = dict()
+    for key, value in options.items():
+        if key not in specs:
+            raise ValueError(f"Unknown option '{key}' for {work}")
+        value_type, constraint = specs[key]
+        if value_type is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, value_type) or (value_type is int and isinstance(value, bool)):
+            raise ValueError(f"Option '{key}' must be {value_type.__name__}")
+        if isinstance(constraint, list) and value not in constraint:
+            raise ValueError(f"Option '{key}' must be one of {constraint}")
+        if isinstance(constraint, tuple):
+            low, high = constraint
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise ValueError(f"Option '{key}' out of range [{low}, {high}]")
+        params[key] = value
+    if 'rois' in params:
+        params['rois'] = validate_rois(params['rois'])
+    # 只接受已注册的调色盘名称，不按客户端给出的路径读取文件
+    if 'custom_lut' in params and params['custom_lut'] not in (names := registry.names()):
+        raise ValueError(f"Option 'custom_lut' must be one of {names}")
+    return params
+
+class Job:
+    def __init__(self,
+            work: Literal['report', 'palette', 'geotiff', 'archive'],
+            params: dict,
+            input_dir: Optional[pathlib.Path],
+            input_files: list[str],
+            output_dir: pathlib.Path,
+            partial_on_cancel: bool = False
+        ):
+        self.id = uuid.uuid4().hex[:12]
+        self.work = work
+        self.params = params
+        self.input_dir = input_dir
+        self.input_files = input_files
+        self.output_dir = output_dir
+        # 取消请求没有指定 finalize 时，是否用已完成的页面生成部分报告
+        self.partial_on_cancel = partial_on_cancel
+        self.status: Literal['queued', 'running', 'done', 'failed', 'cancelled'] = 'queued'
+        self.created = datetime.datetime.now().isoformat(timespec='seconds')
+        self.finished_at: Optional[float] = None
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.outputs: list[pathlib.Path] = []
+        # (序号, 事件)，emitted 为已产生的事件总数
+        self.events: deque[tuple[int, dict]] = deque(maxlen=EVENT_HISTORY)
+        self.emitted = 0
+        self.progress: Optional[dict] = None
+        self.changed = asyncio.Condition()
+        # 运行中的生成器，以及在生成器创建前收到的取消请求
+        self.generator = None
+        self.cancel_request: Optional[bool] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    async def cancel(self, finalize: bool = False):
+        """排队中的任务直接取消，运行中的任务交给生成器取消"""
+        if self.status == 'queued':
+            self.status = 'cancelled'
+            await self.emit({'type': 'cancelled', **self.describe()})
+        elif self.status == 'running':
+            if self.generator is not None:
+                self.generator.cancel(finalize=finalize)
+            else:
+                self.cancel_request = finalize
+
+    async def emit(self, event: dict):
+        self.events.append((self.emitted, event))
+        self.emitted += 1
+        if event['type'] == 'progress':
+            self.progress = event
+        elif event['type'] in ('done', 'failed', 'cancelled'):
+            self.finished_at = time.monotonic()
+        async with self.changed:
+            self.changed.notify_all()
+
+    def events_since(self, sent: int) -> list[dict]:
+        """序号不小于 sent 的事件，已被丢弃的部分以最后的进度状态代替"""
+        events = [event for seq, event in self.events if seq >= sent]
+        first = self.events[0][0] if self.events else self.emitted
+        if first > sent and self.progress is not None and all(event is not self.progress for event in events):
+            events.insert(0, self.progress)
+        return events
+
+    def describe(self) -> dict:
+        return {
+            'id': self.id,
+            'work': self.work,
+            'status': self.status,
+            'created': self.created,
+            'options': self.params,
+            'output_dir': str(self.output_dir),
+            'total': self.total,
+            'completed': self.completed,
+            'failed': self.failed,
+            'artifacts': [
+                {'index': i, 'name': p.name, 'size': p.stat().st_size if p.exists() else None, 'url': f"/jobs/{self.id}/artifacts/{i}"}
+                for i, p in enumerate(self.outputs)
+            ],
+        }
+
+class JobService:
+    """
+    本地 HTTP 任务服务
+
+    所有任务共享同一个常驻的 ThermalSession，由 max_jobs 个执行者从队列中依次取出执行，
+    单个任务的并发数不超过 job_workers。
+    """
+    def __init__(self,
+            session: ThermalSession,
+            cli_path: str | pathlib.Path,
+            output_dir: str | pathlib.Path,
+            temp_dir: str | pathlib.Path,
+            weasy_path: Optional[str | pathlib.Path] = None,
+            max_jobs: int = 1,
+            job_workers: int = 4,
+            backend: Literal['cli', 'sdk', 'auto'] = 'cli',
+            sdk_lib: Optional[str | pathlib.Path] = None
+        ):
+        self.session = session
+        self.backend = backend
+        self.sdk_lib = sdk_lib
+        self.cli_path = cli_path
+        self.weasy_path = weasy_path
+        self.output_dir = pathlib.Path(output_dir).absolute()
+        self.temp_dir = pathlib.Path(temp_dir).absolute()
+        self.max_jobs = max_jobs
+        self.job_workers = job_workers
+        self.jobs: dict[str, Job] = dict()
+        self.queue: asyncio.Queue[Job] = asyncio.Queue()
+        self.runners: list[asyncio.Task] = []
+
+    def start(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.runners = [asyncio.create_task(self._runner()) for _ in range(self.max_jobs)]
+
+    def submit(self, payload: dict) -> Job:
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        work = payload.get('work', 'report')
+        params = parse_options(work, payload.get('options', dict()))
+        params['max_workers'] = min(params.get('max_workers', self.job_workers), self.job_workers)
+        partial_on_cancel = params.pop('partial_on_cancel', False)
+
+        input_dir = payload.get('input_dir')
+        input_files = payload.get('input_files', [])
+        if not isinstance(input_files, list) or not all(isinstance(f, str) for f in input_files):
+            raise ValueError("'input_files' must be a list of absolute paths")
+        if not input_dir and not input_files:
+            raise ValueError("No any input")
+        if input_dir and not pathlib.Path(input_dir).is_dir():
+            raise ValueError(f"Input directory not found: {input_dir}")
+        for f in input_files:
+            if not pathlib.Path(f).is_absolute():
+                raise ValueError("Path in file list must be absolute!")
+
+        job = Job(work, params, pathlib.Path(input_dir) if input_dir else None, input_files, self.output_dir, partial_on_cancel)
+        job.output_dir = self.job_output_dir(payload['output_dir']) if payload.get('output_dir') else self.output_dir / job.id
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    def evict(self):
+        """移除超过保留时长或个数的已结束任务"""
+        finished = sorted((job for job in self.jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at)
+        now = time.monotonic()
+        for i, job in enumerate(finished):
+            if len(finished) - i > FINISHED_JOBS or now - job.finished_at > FINISHED_TTL:
+                del self.jobs[job.id]
+
+    def job_output_dir(self, output_dir) -> pathlib.Path:
+        """客户端指定的输出文件夹只能位于服务的输出文件夹之下"""
+        if not isinstance(output_dir, str):
+            raise ValueError("'output_dir' must be a path relative to the service output directory")
+        root = self.output_dir.resolve()
+        path = (root / output_dir).resolve()
+        if path == root or not path.is_relative_to(root):
+            raise ValueError("'output_dir' must be inside the service output directory")
+        return path
+
+    async def _runner(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == 'queued':
+                    await self._execute(job)
+            finally:
+                self.queue.task_done()
+
+    async def _execute(self, job: Job):
+        job.status = 'running'
+        await job.emit({'type': 'status', 'status': job.status})
+        # 每个任务独立的临时目录，避免相同输入的并发任务互相覆盖临时文件
+        temp_dir = self.temp_dir / job.id
+        try:
+            job.output_dir.mkdir(parents=True, exist_ok=True)
+            gen = self.session.job(
+                input_dir=job.input_dir,
+                output_dir=job.output_dir,
+                temp_dir=temp_dir,
+                cli_path=self.cli_path,
+                weasy_path=self.weasy_path if job.work == 'report' else None,
+                backend=create_backend(self.backend, self.cli_path, temp_dir, self.sdk_lib),
+                **job.params
+            )
+            job.generator = gen
+            if job.cancel_request is not None:
+                gen.cancel(finalize=job.cancel_request)
+            run = {
+                'report': gen.run,
+                'palette': gen.run_palette_change,
+                'geotiff': gen.run_geotiff,
+                'archive': gen.run_archive
+            }[job.work]
+            async for total, r in run(job.input_files or None):
+                job.total = total
+                if r['success']:
+                    job.completed += 1
+                else:
+                    job.failed += 1
+                await job.emit({
+                    'type': 'progress',
+                    'total': total,
+                    'completed': job.completed,
+                    'failed': job.failed,
+                    'success': r['success'],
+                    'message': r['message']
+                })
+            job.outputs = list(gen.outputs)
+            job.status = 'cancelled' if gen.cancelled else 'done'
+            await job.emit({'type': job.status, **job.describe()})
+        except Exception as e:
+            job.status = 'failed'
+            await job.emit({'type': 'failed', 'message': f"{type(e).__name__}: {e}"})
+        finally:
+            job.generator = None
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers: dict[str, str] = dict()
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                key, value = line.decode('latin-1').split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0) or 0)
+            if length < 0:
+                raise ValueError(length)
+            if length > MAX_BODY:
+                return await self._send_json(writer, 413, {'error': f'Request body larger than {MAX_BODY} bytes'})
+            body = await reader.readexactly(length)
+            await self.route(method.upper(), urlsplit(target).path.rstrip('/') or '/', body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await self._send_json(writer, 400, {'error': 'Malformed request'})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = path.strip('/').split('/') if path != '/' else []
+        self.evict()
+        if not parts:
+            return await self._send_json(writer, 200, {
+                'service': 'DJI Thermal Image Report Generator',
+                'jobs': len(self.jobs),
+                'queued': self.queue.qsize(),
+                'works': list(JOB_OPTIONS)
+            })
+        if parts[0] != 'jobs':
+            return await self._send_json(writer, 404, {'error': 'Not found'})
+
+        if len(parts) == 1:
+            if method == 'GET':
+                return await self._send_json(writer, 200, [job.describe() for job in self.jobs.values()])
+            if method == 'POST':
+                try:
+                    job = self.submit(json.loads(body or b'{}'))
+                except (ValueError, TypeError) as e:
+                    return await self._send_json(writer, 400, {'error': str(e)})
+                return await self._send_json(writer, 201, job.describe())
+            return await self._send_json(writer, 405, {'error': 'Method not allowed'})
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return await self._send_json(writer, 404, {'error': 'Job not found'})
+        if method == 'DELETE' and len(parts) == 2:
+            if job.finished:
+                return await self._send_json(writer, 409, {'error': f'Job already {job.status}'})
+            try:
+                finalize = bool(json.loads(body or b'{}').get('finalize', job.partial_on_cancel))
+            except (ValueError, AttributeError):
+                return await self._send_json(writer, 400, {'error': 'Request body must be a JSON object'})
+            await job.cancel(finalize)
+            return await self._send_json(writer, 202, job.describe())
+        if method != 'GET':
+            return await self._send_json(writer, 405, {'error': 'Method not allowed'})
+        if len(parts) == 2:
+            return await self._send_json(writer, 200, job.describe())
+        if len(parts) == 3 and parts[2] == 'events':
+            return await self._send_events(writer, job)
+        if len(parts) == 3 and parts[2] == 'artifacts':
+            return await self._send_json(writer, 200, job.describe()['artifacts'])
+        if len(parts) == 4 and parts[2] == 'artifacts' and parts[3].isdigit() and int(parts[3]) < len(job.outputs):
+            return await self._send_file(writer, job.outputs[int(parts[3])])
+        return await self._send_json(writer, 404, {'error': 'Not found'})
+
+    @staticmethod
+    def _write_head(writer: asyncio.StreamWriter, status: int, headers: dict[str, str]):
+        head = f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        head += ''.join(f"{k}: {v}\r\n" for k, v in {**headers, 'Connection': 'close'}.items())
+        writer.write((head + '\r\n').encode('latin-1'))
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, obj):
+        data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self._write_head(writer, status, {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(data))})
+        writer.write(data)
+        await writer.drain()
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: pathlib.Path):
+        if not path.exists():
+            return await self._send_json(writer, 404, {'error': 'Artifact no longer exists'})
+        self._write_head(writer, 200, {
+            'Content-Type': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+            'Content-Length': str(path.stat().st_size),
+            'Content-Disposition': f'attachment; filename="{path.name}"'
+        })
+        async with aiofiles.open(path, mode='rb') as f:
+            while (chunk := await f.read(1 << 20)):
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _send_events(self, writer: asyncio.StreamWriter, job: Job):
+        """以 Server-Sent Events 推送任务进度，先补发历史事件，任务结束后关闭连接"""
+        self._write_head(writer, 200, {'Content-Type': 'text/event-stream; charset=utf-8', 'Cache-Control': 'no-cache'})
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: job.emitted > sent or job.finished)
+            for event in job.events_since(sent):
+                writer.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            sent = job.emitted
+            await writer.drain()
+            if job.finished and sent == job.emitted:
+                break
+
+async def serve(
+        host: str,
+        port: int,
+        cli_path: str | pathlib.Path,
+        output_dir: str | pathlib.Path,
+        temp_dir: str | pathlib.Path,
+        weasy_path: Optional[str | pathlib.Path] = None,
+        max_workers: int = 4,
+        max_jobs: int = 1,
+        job_workers: int = 4,
+        backend: Literal['cli', 'sdk', 'auto'] = 'cli',
+        sdk_lib: Optional[str | pathlib.Path] = None
+    ):
+    # 提前检查 SDK 动态库，避免每个任务都失败
+    create_backend(backend, cli_path, temp_dir, sdk_lib)
+    async with ThermalSession(max_workers) as session:
+        service = JobService(session, cli_path, output_dir, temp_dir, weasy_path, max_jobs, job_workers, backend, sdk_lib)
+        service.start()
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f"服务已启动: http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,123 @@
+import os, re, json, hashlib, pathlib, datetime
+from typing import Literal, Optional
+
+CREATE_DATE_RE = re.compile(rb'xmp:CreateDate(?:="|>)([^"<]+)')
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """解析 "i/N" 形式的分片参数，i 从 1 开始"""
+    matched = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec or '')
+    if not matched:
+        raise ValueError(f"Invalid shard '{spec}', expect i/N such as 1/4")
+    index, count = int(matched.group(1)), int(matched.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}', i must be in [1, N]")
+    return index, count
+
+def shard_name(index: int, count: int) -> str:
+    return f"shard_{index:04d}_of_{count:04d}"
+
+def read_capture_time(img_path: str | pathlib.Path) -> str:
+    """只扫描文件头部的 XMP 获取拍摄时间，读取失败时退回到修改时间"""
+    try:
+        with open(img_path, mode='rb') as f:
+            head = f.read(128 * 1024)
+        if (matched := CREATE_DATE_RE.search(head)):
+            return datetime.datetime.fromisoformat(matched.group(1).decode('ascii').strip()).isoformat()
+    except (OSError, ValueError, UnicodeDecodeError):
+        pass
+    return datetime.datetime.fromtimestamp(os.path.getmtime(img_path)).isoformat()
+
+class ShardPlan:
+    """
+    确定性的输入分片
+
+    所有节点看到相同的输入集合时，对输入的全局排序与分片结果都相同，
+    position 为输入在全局排序中的位置，合并时据此还原最终顺序。
+    """
+    def __init__(self,
+            images: list[str | pathlib.Path],
+            index: int,
+            count: int,
+            by: Literal['path', 'time'] = 'path'
+        ):
+        self.index = index
+        self.count = count
+        self.by = by
+
+        paths = sorted({str(pathlib.Path(p).absolute()) for p in images})
+        if by == 'time':
+            capture_times = {p: read_capture_time(p) for p in paths}
+            paths.sort(key=lambda p: (capture_times[p], p))
+            # 按时间切成连续的 N 段，每个分片负责一段
+            begin, end = len(paths) * (index - 1) // count, len(paths) * index // count
+            selected = range(begin, end)
+        else:
+            selected = [i for i, p in enumerate(paths) if self.hash_shard(p, count) == index]
+
+        self.total = len(paths)
+        self.positions: dict[str, int] = {paths[i]: i for i in selected}
+        self.images: list[str] = [paths[i] for i in selected]
+
+    @staticmethod
+    def hash_shard(path: str, count: int) -> int:
+        return int(hashlib.sha1(path.encode('utf-8')).hexdigest()[:16], 16) % count + 1
+
+    @property
+    def name(self) -> str:
+        return shard_name(self.index, self.count)
+
+    def write_manifest(self,
+            output_dir: str | pathlib.Path,
+            entries: list[dict],
+            failed: list[str],
+            pdf: Optional[str | pathlib.Path] = None
+        ) -> pathlib.Path:
+        manifest_path = pathlib.Path(output_dir) / f"{self.name}.json"
+        manifest = {
+            'index': self.index,
+            'count': self.count,
+            'by': self.by,
+            'total': self.total,
+            'pdf': pathlib.Path(pdf).name if pdf else None,
+            'entries': entries,
+            'failed': failed,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        # 先写临时文件再改名，其他节点不会读到写了一半的清单
+        temp_path = manifest_path.with_suffix('.json.part')
+        with open(temp_path, mode='w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, manifest_path)
+        return manifest_path
+
+def load_manifests(shard_dir: str | pathlib.Path) -> list[dict]:
+    """读取目录下的全部分片清单，并检查分片是否齐全"""
+    shard_dir = pathlib.Path(shard_dir)
+    manifests = []
+    for manifest_path in sorted(shard_dir.glob('shard_*_of_*.json')):
+        with open(manifest_path, mode='r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['dir'] = str(shard_dir)
+        manifests.append(manifest)
+    if not manifests:
+        raise FileNotFoundError(f"No shard manifest in {shard_dir}")
+
+    counts = {m['count'] for m in manifests}
+    if len(counts) != 1:
+        raise ValueError(f"Manifests from different shard layouts: N = {sorted(counts)}")
+    count = counts.pop()
+    missing = sorted(set(range(1, count + 1)) - {m['index'] for m in manifests})
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(shard_name(i, count) for i in missing)}")
+    return manifests
+
+def ordered_pages(manifests: list[dict]) -> list[tuple[pathlib.Path, int, int]]:
+    """按全局顺序列出所有分片中的页面 (分片 PDF 路径, 起始页, 页数)"""
+    pages = []
+    for manifest in manifests:
+        if not manifest.get('pdf'):
+            continue
+        pdf_path = pathlib.Path(manifest['dir']) / manifest['pdf']
+        pages.extend((entry['position'], pdf_path, entry['page'], entry['pages']) for entry in manifest['entries'])
+    pages.sort(key=lambda x: x[0])
+    return [(pdf_path, page, count) for _, pdf_path, page, count in pages]
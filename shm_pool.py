@@ -0,0 +1,168 @@
+"""
+基于 multiprocessing.shared_memory 的帧缓冲池
+
+解码得到的 RGB / float32 帧放在共享内存块中，事件循环与工作进程之间只传递 BufferRef (块名、形状、类型)，
+像素数据不经过 pickle 与管道复制。
+
+块由主进程的 BufferPool 创建与回收: acquire 得到一个租约 (Lease)，用完后 release，
+块回到空闲列表供下一帧复用 (同一批图像的分辨率相同，稳定后不再创建新块)；
+工作进程只通过 attach 映射，不负责释放。
+"""
+import sys, threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 块大小按页对齐，分辨率相同的帧落在同一个尺寸上
+PAGE_SIZE = 4096
+# 空闲块占用的上限，超出时直接删除归还的块
+MAX_IDLE_BYTES = 256 * 1024 * 1024
+# 每个工作进程保留映射的块数
+ATTACH_CACHE_SIZE = 32
+
+class BufferRef(NamedTuple):
+    """共享块上的一个数组，可以传给工作进程"""
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        import numpy as np
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+def block_size(nbytes: int) -> int:
+    return max(PAGE_SIZE, -(-nbytes // PAGE_SIZE) * PAGE_SIZE)
+
+class Lease:
+    """从缓冲池借出的块，release 后归还，不能再访问 array"""
+    def __init__(self, pool: 'BufferPool', shm: shared_memory.SharedMemory, shape: tuple[int, ...], dtype: str):
+        self.pool = pool
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.released = False
+
+    @property
+    def ref(self) -> BufferRef:
+        return BufferRef(self.shm.name, self.shape, self.dtype)
+
+    @property
+    def array(self) -> 'np.ndarray':
+        import numpy as np
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def fits(self, shape: tuple[int, ...]) -> bool:
+        return BufferRef(self.shm.name, tuple(shape), self.dtype).nbytes <= self.shm.size
+
+    def resize(self, shape: tuple[int, ...]):
+        """工作进程写入的实际形状与申请时不同时，改为按实际形状访问"""
+        if not self.fits(shape):
+            raise ValueError(f"Shape {shape} does not fit in a block of {self.shm.size} bytes")
+        self.shape = tuple(shape)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool.give_back(self.shm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+class BufferPool:
+    """主进程中的共享块池，可被多个任务与线程同时使用"""
+    def __init__(self, max_idle_bytes: int = MAX_IDLE_BYTES):
+        self.max_idle_bytes = max_idle_bytes
+        self._free: dict[int, list[shared_memory.SharedMemory]] = dict()
+        self._leased: dict[str, shared_memory.SharedMemory] = dict()
+        self._lock = threading.Lock()
+        self.idle_bytes = 0
+        self.closed = False
+
+    def acquire(self, shape: tuple[int, ...], dtype: str = 'float32') -> Lease:
+        size = block_size(BufferRef('', tuple(shape), dtype).nbytes)
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("Buffer pool is closed")
+            if self._free.get(size):
+                shm = self._free[size].pop()
+                self.idle_bytes -= size
+            else:
+                shm = shared_memory.SharedMemory(create=True, size=size)
+            self._leased[shm.name] = shm
+        return Lease(self, shm, shape, dtype)
+
+    def share(self, data: 'np.ndarray') -> Lease:
+        """把已有的数组复制进共享块 (一次内存复制，代替 pickle 与管道传输)"""
+        lease = self.acquire(data.shape, data.dtype.str)
+        lease.array[...] = data
+        return lease
+
+    def give_back(self, shm: shared_memory.SharedMemory):
+        with self._lock:
+            self._leased.pop(shm.name, None)
+            if not self.closed and self.idle_bytes + shm.size <= self.max_idle_bytes:
+                self._free.setdefault(shm.size, []).append(shm)
+                self.idle_bytes += shm.size
+                return
+        self._destroy(shm)
+
+    @staticmethod
+    def _destroy(shm: shared_memory.SharedMemory):
+        try:
+            shm.close()
+        except BufferError:
+            # 仍有数组视图引用该块，映射随视图释放，名称照常删除
+            pass
+        shm.unlink()
+
+    def close(self):
+        """删除全部空闲块；仍借出的块在归还时删除"""
+        with self._lock:
+            self.closed = True
+            blocks = [shm for blocks in self._free.values() for shm in blocks]
+            self._free.clear()
+            self.idle_bytes = 0
+        for shm in blocks:
+            self._destroy(shm)
+
+# 工作进程中已映射的块
+_attached: OrderedDict[str, shared_memory.SharedMemory] = OrderedDict()
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    # 3.12 及以前映射已有的块也会登记到 resource_tracker，工作进程退出时会删除仍在使用的块
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+def attach(ref: BufferRef, shape: Optional[tuple[int, ...]] = None) -> 'np.ndarray':
+    """在工作进程中执行: 取得共享块上的数组视图 (不复制)，shape 指定时按该形状访问"""
+    import numpy as np
+    shm = _attached.get(ref.name)
+    if shm is None:
+        shm = _attached[ref.name] = _open(ref.name)
+        while len(_attached) > ATTACH_CACHE_SIZE:
+            _, oldest = _attached.popitem(last=False)
+            try:
+                oldest.close()
+            except BufferError:
+                pass
+    else:
+        _attached.move_to_end(ref.name)
+    return np.ndarray(shape or ref.shape, dtype=ref.dtype, buffer=shm.buf)
+
+def call_shared(func, ref: BufferRef, *args):
+    """在工作进程中执行: 以共享块上的数组为第一个参数调用 func"""
+    return func(attach(ref), *args)
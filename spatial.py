@@ -0,0 +1,101 @@
+"""
+按拍摄位置分组
+
+以聚类半径为边长把经纬度划分为网格，每个点只与所在及相邻 3x3 网格中的点比较距离，
+距离不超过半径的点归入同一组 (单链接)，整体开销与点数近似成正比，而不是两两比较。
+"""
+import math
+from typing import Hashable, NamedTuple, Optional, Iterable
+
+# 每纬度的距离 (米)
+METERS_PER_DEGREE = 111_320.0
+NO_GPS_SITE = 'no_gps'
+
+class Site(NamedTuple):
+    name: str
+    images: list
+    # (lat0, lon0, lat1, lon1)，没有定位的组为 None
+    bbox: Optional[tuple[float, float, float, float]]
+    center: Optional[tuple[float, float]]
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'count': len(self.images),
+            'bbox': list(self.bbox) if self.bbox else None,
+            'center': list(self.center) if self.center else None,
+        }
+
+def valid_gps(gps: Optional[Iterable[float]]) -> Optional[tuple[float, float]]:
+    """(lat, lon)，没有定位 (解析失败时为 0, 0) 时返回 None"""
+    if not gps:
+        return None
+    lat, lon = tuple(gps)[:2]
+    if (not lat and not lon) or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return float(lat), float(lon)
+
+def cluster_sites(points: dict[Hashable, Optional[tuple[float, float]]], radius: float) -> list[Site]:
+    """
+    把 {图像: (lat, lon) 或 None} 分组，radius 单位为米
+
+    返回的组按其第一张图像在 points 中的顺序排列，组内保持输入顺序；没有定位的图像单独成组并排在最后
+    """
+    keys = list(points)
+    located = [i for i, key in enumerate(keys) if points[key] is not None]
+    parent = list(range(len(keys)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if located:
+        # 经度方向的网格按这批点的平均纬度换算，同一批图像的范围很小，误差可以忽略
+        mean_lat = sum(points[keys[i]][0] for i in located) / len(located)
+        lon_scale = max(math.cos(math.radians(mean_lat)), 1e-6)
+        cell_lat = radius / METERS_PER_DEGREE
+        cell_lon = cell_lat / lon_scale
+
+        grid: dict[tuple[int, int], list[int]] = dict()
+        for i in located:
+            lat, lon = points[keys[i]]
+            grid.setdefault((math.floor(lat / cell_lat), math.floor(lon / cell_lon)), []).append(i)
+
+        limit = (radius / METERS_PER_DEGREE) ** 2
+        for (gy, gx), members in grid.items():
+            # 只检查一半的相邻网格，每对网格只比较一次
+            for dy, dx in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+                others = grid.get((gy + dy, gx + dx))
+                if not others:
+                    continue
+                same = dy == 0 and dx == 0
+                for a_pos, a in enumerate(members):
+                    lat_a, lon_a = points[keys[a]]
+                    for b in (members[a_pos + 1:] if same else others):
+                        lat_b, lon_b = points[keys[b]]
+                        # 等距矩形近似，单位为纬度
+                        if (lat_a - lat_b) ** 2 + ((lon_a - lon_b) * lon_scale) ** 2 <= limit:
+                            root_a, root_b = find(a), find(b)
+                            if root_a != root_b:
+                                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: dict[int, list[int]] = dict()
+    for i in located:
+        groups.setdefault(find(i), []).append(i)
+
+    sites = []
+    for members in sorted(groups.values(), key=lambda m: m[0]):
+        lats = [points[keys[i]][0] for i in members]
+        lons = [points[keys[i]][1] for i in members]
+        sites.append(Site(
+            f"site_{len(sites) + 1:02d}",
+            [keys[i] for i in members],
+            (min(lats), min(lons), max(lats), max(lons)),
+            (round(sum(lats) / len(lats), 6), round(sum(lons) / len(lons), 6))
+        ))
+    missing = [key for key in keys if points[key] is None]
+    if missing:
+        sites.append(Site(NO_GPS_SITE, missing, None, None))
+    return sites
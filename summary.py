@@ -0,0 +1,154 @@
+"""
+批次摘要
+
+在 run 逐个取得处理结果时增量累计，只保存定长的统计量:
+最热的前 N 张图像 (小顶堆)、固定分箱的温度直方图、按飞机序列号 / 按小时的聚合与失败计数，
+内存占用与图像数量无关。
+"""
+import heapq, itertools
+from collections import Counter
+from typing import Optional
+from analysis import HIST_LOW, HIST_WIDTH, HIST_BINS
+
+# 失败原因最多单独统计的种类，其余归入 "其他"
+MAX_FAILURE_KINDS = 20
+
+def hist_bin(temp: float) -> int:
+    """与 analysis.histogram 相同的分箱"""
+    return min(HIST_BINS - 1, max(0, int((temp - HIST_LOW) // HIST_WIDTH)))
+
+class Aggregate:
+    """一组图像的计数与温度统计"""
+    __slots__ = ('count', 'failed', 'max', 'min', 'sum_max')
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.max: Optional[float] = None
+        self.min: Optional[float] = None
+        self.sum_max = 0.0
+
+    def add(self, low: Optional[float], high: Optional[float]):
+        self.count += 1
+        if high is not None:
+            self.max = high if self.max is None else max(self.max, high)
+            self.sum_max += high
+        if low is not None:
+            self.min = low if self.min is None else min(self.min, low)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'failed': self.failed,
+            'max': self.max,
+            'min': self.min,
+            'mean_max': round(self.sum_max / self.count, 2) if self.count else None,
+        }
+
+class BatchSummary:
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        # (最高温, 序号, 记录) 的小顶堆，堆顶是当前入选图像中最凉的一张
+        self._hottest: list[tuple[float, int, dict]] = []
+        self._seq = itertools.count()
+        # 每张图像最高温的分布，以及全部像素的分布 (仅在开启分析时有)
+        self.max_histogram = [0] * HIST_BINS
+        self.pixel_histogram = [0] * HIST_BINS
+        self.by_drone: dict[str, Aggregate] = dict()
+        self.by_hour: dict[str, Aggregate] = dict()
+        self.failures: Counter[str] = Counter()
+
+    @staticmethod
+    def hour_of(create_time: Optional[str]) -> str:
+        # create_time 格式为 "%Y/%m/%d %H:%M:%S"
+        return f"{create_time[:13]}:00" if create_time and len(create_time) >= 13 else "N/A"
+
+    def _group(self, groups: dict[str, Aggregate], key: str) -> Aggregate:
+        if key not in groups:
+            groups[key] = Aggregate()
+        return groups[key]
+
+    def add(self, info: dict, skipped: bool = False):
+        """
+        累计一张成功处理的图像
+
+        info 包含 input / filename / sn / create_time / min / max，开启分析时还有像素直方图 histogram
+        """
+        self.completed += 1
+        self.skipped += skipped
+        low, high = info.get('min'), info.get('max')
+        self._group(self.by_drone, info.get('sn') or "N/A").add(low, high)
+        self._group(self.by_hour, self.hour_of(info.get('create_time'))).add(low, high)
+        if high is not None:
+            self.max_histogram[hist_bin(high)] += 1
+            entry = (high, next(self._seq), {k: info.get(k) for k in ('input', 'filename', 'sn', 'create_time', 'min', 'max')})
+            if len(self._hottest) < self.top:
+                heapq.heappush(self._hottest, entry)
+            elif high > self._hottest[0][0]:
+                heapq.heapreplace(self._hottest, entry)
+        if (histogram := info.get('histogram')):
+            offset = histogram['offset']
+            for i, count in enumerate(histogram['counts']):
+                self.pixel_histogram[min(HIST_BINS - 1, offset + i)] += count
+
+    def add_failure(self, reason: object, sn: Optional[str] = None, create_time: Optional[str] = None):
+        self.failed += 1
+        kind = reason if isinstance(reason, str) else type(reason).__name__
+        if kind not in self.failures and len(self.failures) >= MAX_FAILURE_KINDS:
+            kind = "其他"
+        self.failures[kind] += 1
+        if sn is not None:
+            self._group(self.by_drone, sn).failed += 1
+        if create_time is not None:
+            self._group(self.by_hour, self.hour_of(create_time)).failed += 1
+
+    @property
+    def hottest(self) -> list[dict]:
+        return [record for _, _, record in sorted(self._hottest, key=lambda entry: (-entry[0], entry[1]))]
+
+    @staticmethod
+    def histogram_range(histogram: list[int]) -> Optional[dict]:
+        """去掉两端的空分箱，返回 {'low': 起始温度, 'width': 分箱宽度, 'counts': [...]}"""
+        nonzero = [i for i, count in enumerate(histogram) if count]
+        if not nonzero:
+            return None
+        return {
+            'low': HIST_LOW + nonzero[0] * HIST_WIDTH,
+            'width': HIST_WIDTH,
+            'counts': histogram[nonzero[0]:nonzero[-1] + 1]
+        }
+
+    @staticmethod
+    def histogram_bars(histogram: list[int], max_bars: int = 40) -> list[dict]:
+        """合并相邻分箱，得到最多 max_bars 根柱，用于摘要页绘图"""
+        trimmed = BatchSummary.histogram_range(histogram)
+        if trimmed is None:
+            return []
+        counts = trimmed['counts']
+        step = -(-len(counts) // max_bars)
+        merged = [sum(counts[i:i + step]) for i in range(0, len(counts), step)]
+        peak = max(merged)
+        return [
+            {
+                'label': f"{trimmed['low'] + i * step * HIST_WIDTH:.0f}",
+                'count': count,
+                'height': round(count / peak * 100, 1),
+            }
+            for i, count in enumerate(merged)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'triage_skipped': self.skipped,
+            'hottest': self.hottest,
+            'max_histogram': self.histogram_range(self.max_histogram),
+            'pixel_histogram': self.histogram_range(self.pixel_histogram),
+            'by_drone': {key: value.to_dict() for key, value in sorted(self.by_drone.items())},
+            'by_hour': {key: value.to_dict() for key, value in sorted(self.by_hour.items())},
+            'failures': dict(self.failures.most_common()),
+        }
@@ -0,0 +1,218 @@
+import os, time, shutil, asyncio, hashlib, pathlib, itertools, contextlib
+from typing import Optional
+
+RAM_DIR = pathlib.Path('/dev/shm')
+RUN_PREFIX = 'run_'
+LOCK_NAME = '.lock'
+
+_run_ids = itertools.count(1)
+
+def _try_lock(f) -> bool:
+    """非阻塞地加独占锁，进程退出 (包括崩溃) 后锁自动释放"""
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            # msvcrt 锁定的是当前位置开始的字节，持有者与清理者都必须锁第 0 个字节
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def free_space(path: str | pathlib.Path) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+def sweep_orphans(base: str | pathlib.Path) -> int:
+    """删除已退出 (或崩溃) 的进程留下的运行目录，返回删除的目录数"""
+    removed = 0
+    for run_dir in pathlib.Path(base).glob(f'{RUN_PREFIX}*'):
+        lock_path = run_dir / LOCK_NAME
+        if not lock_path.exists():
+            # 刚创建、还没来得及加锁的目录
+            try:
+                if time.time() - run_dir.stat().st_mtime < 60:
+                    continue
+            except OSError:
+                continue
+        else:
+            try:
+                with open(lock_path, mode='a+') as f:
+                    # 能拿到锁说明持有者已不在
+                    if not _try_lock(f):
+                        continue
+            except OSError:
+                continue
+        shutil.rmtree(run_dir, ignore_errors=True)
+        removed += 1
+    return removed
+
+class _Budget:
+    """同一目录下未指定配额的 TempStore 共用一份配额，多个任务并发时合计不超过它"""
+    def __init__(self, quota: int):
+        self.quota = quota
+        self.stores: set['TempStore'] = set()
+
+    @property
+    def committed(self) -> int:
+        return sum(store.used + store.reserved for store in self.stores)
+
+# 基础目录 -> 共用的配额，最后一个使用者关闭时移除
+_budgets: dict[pathlib.Path, _Budget] = dict()
+
+class TempStore:
+    """
+    临时文件存储
+
+    每次运行使用独立的 run_<pid>_<n> 目录并持有其中的锁文件，启动时清理没有持有者的旧目录。
+    空间充足时放在内存盘 /dev/shm 上；记录所有产物的大小，超过配额时让新的图像等待，
+    直到已有的临时文件被释放 (没有其他图像在处理时总是放行，避免死锁)。
+    未指定配额时，同一进程中使用相同目录的 TempStore 共用一份默认配额。
+    """
+    ram_min_free = 1 << 30
+    default_estimate = 4 << 20
+
+    def __init__(self,
+            root: str | pathlib.Path,
+            quota: Optional[int] = None,
+            prefer_ram: bool = True,
+            sweep: bool = True
+        ):
+        self.root = pathlib.Path(root).absolute()
+        self.root.mkdir(parents=True, exist_ok=True)
+        ram_base = RAM_DIR / f"dji_timgrg_{hashlib.sha1(str(self.root).encode('utf-8')).hexdigest()[:8]}"
+
+        if sweep:
+            for base in (self.root, ram_base):
+                if base.is_dir():
+                    sweep_orphans(base)
+
+        self.base = self.root
+        if prefer_ram and os.name != 'nt' and RAM_DIR.is_dir() and free_space(RAM_DIR) >= max(self.ram_min_free, quota or 0):
+            try:
+                ram_base.mkdir(exist_ok=True)
+                self.base = ram_base
+            except OSError:
+                pass
+        self.in_ram = self.base == ram_base
+
+        self.dir = self.base / f"{RUN_PREFIX}{os.getpid()}_{next(_run_ids)}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = open(self.dir / LOCK_NAME, mode='a+')
+        _try_lock(self._lock)
+        self._lock.seek(0)
+        self._lock.truncate()
+        self._lock.write(str(os.getpid()))
+        self._lock.flush()
+
+        # 未指定配额时，最多使用所在磁盘剩余空间的一半；这一份只在第一个使用者创建时计算
+        self.budget: Optional[_Budget] = None
+        if not quota:
+            if (budget := _budgets.get(self.base)) is None:
+                budget = _budgets[self.base] = _Budget(free_space(self.base) // 2)
+            budget.stores.add(self)
+            self.budget = budget
+        self.quota = quota if quota else self.budget.quota
+        self.files: dict[str, int] = dict()
+        self.used = 0
+        self.reserved = 0
+        self.in_flight = 0
+        self.estimate = self.default_estimate
+        self._changed: Optional[asyncio.Condition] = None
+        self.closed = False
+
+    def path(self, name: str) -> pathlib.Path:
+        return self.dir / name
+
+    def add(self, path: str | pathlib.Path) -> int:
+        """登记新写入的临时文件，返回文件大小"""
+        path = str(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        self.used += size - self.files.get(path, 0)
+        self.files[path] = size
+        return size
+
+    def forget(self, path: str | pathlib.Path):
+        """文件被移出临时目录 (如导出到输出文件夹) 后不再计入"""
+        self.used -= self.files.pop(str(path), 0)
+        self._notify()
+
+    def remove(self, path: str | pathlib.Path):
+        pathlib.Path(path).unlink(missing_ok=True)
+        self.forget(path)
+
+    def committed(self) -> int:
+        """已占用与已预留的空间，共用配额时包括其他 TempStore"""
+        return self.budget.committed if self.budget is not None else self.used + self.reserved
+
+    def _peers(self) -> list['TempStore']:
+        return list(self.budget.stores) if self.budget is not None else [self]
+
+    def _notify(self):
+        # 共用配额时，其他 TempStore 中等待的图像同样可能可以继续
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for store in self._peers():
+            if store._changed is not None:
+                loop.create_task(store._notify_async())
+
+    async def _notify_async(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, nbytes: Optional[int] = None):
+        """为一张图像预留空间，超出配额时等待"""
+        nbytes = nbytes or self.estimate
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight == 0 or self.committed() + nbytes <= self.quota)
+            self.reserved += nbytes
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.reserved -= nbytes
+            self.in_flight -= 1
+            self._notify()
+
+    def observe(self, nbytes: int):
+        """根据单张图像实际产生的临时文件调整预估值"""
+        if nbytes > 0:
+            self.estimate = (self.estimate * 3 + nbytes) // 4
+
+    def close(self, keep: bool = False):
+        """
+        释放锁并删除运行目录
+
+        keep 为 True 时保留文件，目录会在下一次运行启动时被清理
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._lock.close()
+        if self.budget is not None:
+            # 释放的空间可供其他任务使用
+            self._notify()
+            self.budget.stores.discard(self)
+            if not self.budget.stores:
+                _budgets.pop(self.base, None)
+        if not keep:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.files.clear()
+            self.used = 0
+            if self.in_ram:
+                # 内存盘上的空目录一并删除
+                with contextlib.suppress(OSError):
+                    self.base.rmdir()
@@ -0,0 +1,37 @@
+import datetime, pathlib
+import pytest
+
+def write_rjpeg(path: pathlib.Path, create_time: datetime.datetime, sn: str, gps: tuple[float, float]):
+    """只带有元数据的 R-JPEG，温度由 MockBackend 按路径生成"""
+    from PIL import Image
+
+    xmp = (
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+        '<rdf:Description rdf:about="" xmlns:tiff="http://ns.adobe.com/tiff/1.0/" xmlns:xmp="http://ns.adobe.com/xap/1.0/" '
+        'xmlns:drone-dji="http://www.dji.com/drone-dji/1.0/" tiff:Model="M3T" '
+        f'xmp:CreateDate="{create_time.isoformat()}" drone-dji:ImageSource="InfraredCamera" drone-dji:DroneSerialNumber="{sn}"/>'
+        '</rdf:RDF></x:xmpmeta>'
+    )
+    lat, lon = gps
+    exif = Image.Exif()
+    exif[0x010e] = 'IronRed'
+    # 度 / 分 / 秒
+    exif[0x8825] = {
+        1: 'N', 2: (float(int(lat)), float(int(lat * 60 % 60)), lat * 3600 % 60),
+        3: 'E', 4: (float(int(lon)), float(int(lon * 60 % 60)), lon * 3600 % 60),
+        6: 100.0
+    }
+    Image.new('RGB', (64, 48)).save(path, exif=exif, xmp=xmp.encode('utf-8'))
+
+@pytest.fixture
+def rjpegs(tmp_path):
+    """8 张图像: 两台飞机交替拍摄，每 7 分钟一张，前 4 张与后 4 张相距约 2 km"""
+    input_dir = tmp_path / 'in'
+    input_dir.mkdir()
+    images = []
+    for i in range(8):
+        path = input_dir / f"DJI_{i:04d}_T.JPG"
+        create_time = datetime.datetime(2026, 5, 1, 10, 0) + datetime.timedelta(minutes=7 * i)
+        write_rjpeg(path, create_time, f"SN{i % 2}", (30.5 + (i // 4) * 0.02, 114.3 + i * 0.0001))
+        images.append(path)
+    return images
@@ -0,0 +1,101 @@
+import sys
+import numpy as np
+import pytest
+from analysis import analyze, find_hotspots, label_components, percentiles, roi_mask, validate_rois
+from backends import MockBackend
+
+@pytest.fixture(params=['scipy', 'numpy'])
+def labeler(request, monkeypatch):
+    """有无 scipy 两种实现"""
+    if request.param == 'scipy':
+        pytest.importorskip('scipy')
+    else:
+        monkeypatch.setitem(sys.modules, 'scipy', None)
+    return label_components
+
+def flood_fill_count(mask: np.ndarray) -> int:
+    seen = np.zeros_like(mask)
+    count = 0
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        count += 1
+        stack = [start]
+        seen[start] = True
+        while stack:
+            y, x = stack.pop()
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1] and mask[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    stack.append((ny, nx))
+    return count
+
+def test_label_components(labeler):
+    mask = np.zeros((6, 8), dtype=bool)
+    mask[0:2, 0:2] = True
+    mask[4, 1:7] = True
+    mask[2, 7] = True
+    # 只有对角相邻，属于不同的连通域
+    mask[3, 0] = True
+    labels, count = labeler(mask)
+    assert count == 4
+    assert len(np.unique(labels[mask])) == 4
+    assert (labels[~mask] == 0).all()
+    assert len(np.unique(labels[4, 1:7])) == 1
+
+def test_label_components_random(labeler):
+    rng = np.random.default_rng(0)
+    mask = rng.random((40, 50)) > 0.55
+    labels, count = labeler(mask)
+    assert count == flood_fill_count(mask)
+    assert set(np.unique(labels)) == set(range(count + 1))
+
+def test_label_components_empty(labeler):
+    labels, count = labeler(np.zeros((4, 4), dtype=bool))
+    assert count == 0 and not labels.any()
+
+def test_roi_masks():
+    rois = validate_rois([
+        {'rect': [2, 1, 6, 4]},
+        {'name': 'tri', 'polygon': [[0, 0], [8, 0], [0, 8]]},
+        {'rect': [-5, -5, 100, 100]},
+    ])
+    assert [roi['name'] for roi in rois] == ['ROI1', 'tri', 'ROI3']
+    rect = roi_mask(rois[0], (10, 10))
+    assert rect.sum() == 4 * 3 and rect[1:4, 2:6].all()
+    # 像素中心 (x + 0.5, y + 0.5) 在 x + y < 8 的三角形内
+    ys, xs = np.mgrid[0:10, 0:10]
+    assert (roi_mask(rois[1], (10, 10)) == (xs + ys + 1 < 8)).all()
+    # 超出图像的部分被裁剪
+    assert roi_mask(rois[2], (10, 10)).all()
+    assert not roi_mask(rois[0], (10, 10)).flags.writeable
+    with pytest.raises(ValueError):
+        validate_rois([{'rect': [0, 0, 1, 1], 'polygon': [[0, 0], [1, 0], [0, 1]]}])
+
+def test_analyze_mock_frame():
+    temps = MockBackend(64, 48).temperature('/data/DJI_0001_T.JPG')
+    rois = validate_rois([{'name': 'all', 'rect': [0, 0, 64, 48]}, {'name': 'none', 'rect': [100, 100, 200, 200]}])
+    result = analyze(temps, rois)
+    assert result['max'] == round(float(temps.max()), 2)
+    assert np.allclose(
+        list(result['percentiles'].values()), np.percentile(temps, [5, 25, 50, 75, 95, 99]), atol=0.01
+    )
+    peak = result['max_at']
+    assert temps[peak['y'], peak['x']] == temps.max()
+    assert result['hotspots'][0]['max'] == result['max']
+    assert sum(result['histogram']['counts']) == temps.size
+    assert result['rois'][0]['area'] == temps.size and result['rois'][0]['max'] == result['max']
+    assert result['rois'][1] == {'name': 'none', 'area': 0}
+
+def test_find_hotspots_order():
+    temps = np.zeros((10, 10), dtype=np.float32)
+    temps[1, 1] = 50
+    temps[5:7, 5:7] = [[60, 61], [62, 70]]
+    spots = find_hotspots(temps, 40)
+    assert [(s['x'], s['y'], s['max'], s['area']) for s in spots] == [(6, 6, 70.0, 4), (1, 1, 50.0, 1)]
+    assert spots[0]['mean'] == 63.25
+    assert find_hotspots(temps, 100) == []
+
+def test_percentiles():
+    values = np.random.default_rng(1).normal(30, 5, (20, 30)).astype(np.float32)
+    assert np.allclose(percentiles(values, (1, 50, 99.5)), np.percentile(values, (1, 50, 99.5)), atol=1e-4)
@@ -0,0 +1,82 @@
+import asyncio, zlib
+import numpy as np
+import pytest
+from archive import ArchiveReader, ArchiveWriter, archive_paths, encode_frame
+from backends import MockBackend
+from generator import ThermalSession
+
+@pytest.mark.parametrize('dtype, level, tolerance', [
+    ('float32', 6, 0.0),
+    ('float32', 0, 0.0),
+    ('float16', 6, 0.05),
+    ('int16', 6, 0.0051),
+])
+def test_round_trip(tmp_path, dtype, level, tolerance):
+    backend = MockBackend(64, 48)
+    frames = [backend.temperature(f"/in/{i}.jpg") for i in range(3)]
+    with ArchiveWriter(tmp_path / 'flight') as writer:
+        for i, temps in enumerate(frames):
+            block, frame = encode_frame(temps, dtype, level)
+            writer.append(block, frame, {'input': f"/in/{i}.jpg", 'sn': f"SN{i % 2}"})
+    assert archive_paths(tmp_path / 'flight')[0].exists()
+
+    with ArchiveReader(tmp_path / 'flight.tarc') as archive:
+        assert len(archive) == 3
+        assert archive.find(sn='SN0') == [0, 2]
+        for temps, decoded in zip(frames, archive):
+            assert decoded.shape == temps.shape and decoded.dtype == np.float32
+            assert np.abs(decoded - temps).max() <= tolerance
+        if dtype == 'int16':
+            # 量化步长不小于 0.01 °C，值域以中点为零点
+            assert archive.index[0]['scale'] == 0.01
+            assert archive.raw(0).dtype == np.int16
+
+def test_int16_wide_range():
+    temps = np.linspace(-40, 1500, 64 * 48, dtype=np.float32).reshape(48, 64)
+    block, frame = encode_frame(temps, 'int16')
+    assert frame['scale'] > 0.01
+    stored = np.frombuffer(zlib.decompress(block), dtype='<i2').reshape(frame['shape'])
+    decoded = stored.astype(np.float32) * frame['scale'] + frame['offset']
+    assert np.abs(decoded - temps).max() <= frame['scale'] / 2 + 1e-3
+
+def test_append_skips_archived(tmp_path):
+    block, frame = encode_frame(np.zeros((2, 2), dtype=np.float32))
+    with ArchiveWriter(tmp_path / 'a') as writer:
+        writer.append(block, frame, {'input': 'x'})
+    # 崩溃时写了一半的索引行
+    with open(tmp_path / 'a.tarc.jsonl', mode='a', encoding='utf-8') as f:
+        f.write('{"frame": 1')
+    with ArchiveWriter(tmp_path / 'a') as writer:
+        assert writer.count == 1 and writer.inputs == {'x'}
+        assert writer.append(block, frame, {'input': 'y'}) == 1
+    with ArchiveReader(tmp_path / 'a') as archive:
+        assert len(archive) == 2
+
+async def run_archive(images, tmp_path) -> list[str]:
+    async with ThermalSession(2) as session:
+        gen = session.job(
+            input_dir=None,
+            output_dir=tmp_path / 'out',
+            temp_dir=tmp_path / 'temps',
+            cli_path=None,
+            archive_dtype='int16',
+            ram_temp=False,
+            max_workers=2,
+            backend=MockBackend(64, 48)
+        )
+        return [r['message'] async for _, r in gen.run_archive([str(p) for p in images], name='flight')]
+
+def test_run_archive(tmp_path, rjpegs):
+    messages = asyncio.run(run_archive(rjpegs[:3], tmp_path))
+    assert sum(message.startswith("完成") for message in messages) == 3
+    # 再次运行时跳过已归档的图像，只追加新的
+    messages = asyncio.run(run_archive(rjpegs[:5], tmp_path))
+    assert sum(message.startswith("跳过(已归档)") for message in messages) == 3
+
+    backend = MockBackend(64, 48)
+    with ArchiveReader(tmp_path / 'out' / 'flight') as archive:
+        assert len(archive) == 5
+        for img in rjpegs[:5]:
+            (frame,) = archive.find(input=str(img))
+            assert np.abs(archive[frame] - backend.temperature(img)).max() <= 0.0051
+            assert archive.index[frame]['meta']['sn'] in ('SN0', 'SN1')
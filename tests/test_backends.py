@@ -0,0 +1,131 @@
+import asyncio, ctypes
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import backends
+from backends import SdkBackend, FallbackBackend, MockBackend, CliBackend, SdkLoadError, create_backend
+from shm_pool import BufferPool
+
+WIDTH, HEIGHT = 8, 6
+
+class FakeDirp:
+    """按 libdirp 的调用约定写入结果，在线程池中代替动态库"""
+    def __init__(self):
+        self.params = (5.0, 70.0, 1.0, 23.0, 25.0)
+        self.palette = None
+
+    def dirp_create_from_rjpeg(self, data, size, handle):
+        handle._obj.value = 1
+        return 0
+
+    def dirp_destroy(self, handle):
+        return 0
+
+    def dirp_get_rjpeg_resolution(self, handle, resolution):
+        resolution._obj.width, resolution._obj.height = WIDTH, HEIGHT
+        return 0
+
+    def dirp_get_measurement_params(self, handle, params):
+        for name, value in zip(('distance', 'humidity', 'emissivity', 'reflection', 'ambient_temp'), self.params):
+            setattr(params._obj, name, value)
+        return 0
+
+    def dirp_set_measurement_params(self, handle, params):
+        self.params = tuple(getattr(params._obj, name) for name in ('distance', 'humidity', 'emissivity', 'reflection', 'ambient_temp'))
+        return 0
+
+    def dirp_set_pseudo_color(self, handle, palette):
+        self.palette = palette
+        return 0
+
+    def dirp_set_enhancement_params(self, handle, params):
+        return 0
+
+    def dirp_get_color_bar_adaptive_params(self, handle, color_bar):
+        color_bar._obj.low, color_bar._obj.high = 20.0, 40.0
+        return 0
+
+    def dirp_process(self, handle, out, size):
+        rgb = np.arange(WIDTH * HEIGHT * 3, dtype=np.uint8)
+        ctypes.memmove(out, rgb.ctypes.data, size)
+        return 0
+
+    def dirp_measure_ex(self, handle, out, size):
+        ctypes.memmove(out, temperature().ctypes.data, size)
+        return 0
+
+def temperature() -> np.ndarray:
+    return np.linspace(20, 40, WIDTH * HEIGHT, dtype=np.float32).reshape((HEIGHT, WIDTH))
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(2) as executor:
+        buffers = BufferPool()
+        yield executor, buffers
+        buffers.close()
+
+def test_sdk_backend(monkeypatch, tmp_path, pool):
+    lib = FakeDirp()
+    monkeypatch.setattr(backends, '_dirp_lib', lib)
+    img = tmp_path / 'a.jpg'
+    img.write_bytes(b'rjpeg')
+    backend = SdkBackend('libdirp.so')
+    backend.attach(*pool[:1], None, pool[1])
+
+    async def run():
+        rgb, w, h, low, high = await backend.process(img, 'a', {'palette': 'rainbow1', 'distance': 10})
+        assert (w, h, low, high) == (WIDTH, HEIGHT, 20.0, 40.0) and len(rgb) == WIDTH * HEIGHT * 3
+        assert lib.palette == backends.PALETTE_NAMES.index('rainbow1') and lib.params[0] == 10
+        # 第一帧复制进共享块，之后由工作进程直接写入
+        for _ in range(2):
+            with await backend.measure_shared(img, 'a', {}) as lease:
+                assert np.array_equal(lease.array, temperature())
+            lease, w, h, _, _ = await backend.process_shared(img, 'a', {})
+            with lease:
+                assert lease.array.shape == (HEIGHT, WIDTH, 3) and lease.array.reshape(-1)[5] == 5
+        assert backend.frame_size == (HEIGHT, WIDTH)
+        assert await backend.default_settings(img, ['humidity']) == {'humidity': 70.0}
+
+    asyncio.run(run())
+
+def test_sdk_load_error(tmp_path):
+    lib_path = tmp_path / 'libdirp.so'
+    lib_path.write_bytes(b'not a library')
+    with pytest.raises(SdkLoadError):
+        backends._load_dirp(str(lib_path))
+
+def test_auto_falls_back(monkeypatch, tmp_path, pool, capsys):
+    monkeypatch.setattr(backends, '_dirp_lib', None)
+    lib_path = tmp_path / 'libdirp.so'
+    lib_path.write_bytes(b'not a library')
+    img = tmp_path / 'a.jpg'
+    img.write_bytes(b'rjpeg')
+    mock = MockBackend(WIDTH, HEIGHT)
+    backend = FallbackBackend(SdkBackend(lib_path), mock)
+    backend.attach(*pool[:1], None, pool[1])
+
+    async def run():
+        results = await asyncio.gather(*(backend.measure(img, 'a', {}) for _ in range(3)))
+        for temp_data in results:
+            assert np.array_equal(temp_data, mock.temperature(img))
+
+    asyncio.run(run())
+    assert backend.active is mock
+    assert capsys.readouterr().out.count("改用 dji_irp") == 1
+
+def test_create_backend(tmp_path, capsys):
+    lib_path = tmp_path / 'libdirp.so'
+    lib_path.write_bytes(b'')
+    cli_path = tmp_path / 'dji_irp'
+    assert isinstance(create_backend('cli', cli_path, tmp_path), CliBackend)
+    assert isinstance(create_backend('sdk', cli_path, tmp_path, lib_path), SdkBackend)
+    assert isinstance(create_backend('auto', cli_path, tmp_path, lib_path), FallbackBackend)
+    assert isinstance(create_backend('auto', None, tmp_path, lib_path), SdkBackend)
+    # 找不到动态库
+    missing = tmp_path / 'missing.so'
+    assert isinstance(create_backend('auto', cli_path, tmp_path, missing), CliBackend)
+    assert "dji_irp" in capsys.readouterr().out
+    with pytest.raises(FileNotFoundError):
+        create_backend('sdk', cli_path, tmp_path, missing)
+    with pytest.raises(FileNotFoundError):
+        create_backend('auto', None, tmp_path, missing)
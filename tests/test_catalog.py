@@ -0,0 +1,60 @@
+import os
+import pytest
+from PIL import Image
+from catalog import Catalog, parse_selection
+
+@pytest.fixture
+def catalog(tmp_path, rjpegs):
+    with Catalog(tmp_path / 'catalog.sqlite3') as catalog:
+        yield catalog
+
+def test_ingest_only_parses_changes(catalog, rjpegs):
+    # 不是红外图像的 JPEG 也会登记，但不参与筛选
+    plain = rjpegs[0].parent / 'plain.jpg'
+    Image.new('RGB', (8, 8)).save(plain)
+    images, parsed = catalog.ingest([rjpegs[0].parent])
+    assert len(images) == len(rjpegs) + 1 and parsed == len(rjpegs) + 1
+    assert catalog.ingest([rjpegs[0].parent])[1] == 0
+    assert str(plain) not in catalog.query()
+
+    stat = os.stat(rjpegs[1])
+    os.utime(rjpegs[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert catalog.ingest([rjpegs[0].parent])[1] == 1
+
+def test_query_bbox(catalog, rjpegs):
+    catalog.ingest(rjpegs)
+    paths = [str(p) for p in rjpegs]
+    # 前 4 张在 30.50°N，后 4 张在 30.52°N，按拍摄时间排序
+    assert catalog.query(bbox=(30.49, 114.29, 30.51, 114.31)) == paths[:4]
+    assert catalog.query(bbox=(30.51, 114.31, 30.49, 114.29)) == paths[:4]
+    # 跨越多个网格
+    assert catalog.query(bbox=(30.495, 114.2995, 30.525, 114.3008)) == paths
+    # 网格粗筛后仍按经纬度精确比较
+    assert catalog.query(bbox=(30.49, 114.2999, 30.53, 114.30025)) == paths[:3]
+    assert catalog.query(bbox=(30.6, 114.3, 30.7, 114.4)) == []
+
+def test_query_filters(catalog, rjpegs):
+    catalog.ingest(rjpegs)
+    paths = [str(p) for p in rjpegs]
+    assert catalog.query(sn='SN1') == paths[1::2]
+    assert catalog.query(start='2026-05-01 10:10', end='2026/05/01 10:30:00') == paths[2:5]
+    assert catalog.query(sn='SN0', bbox=(30.515, 114.29, 30.525, 114.31)) == [paths[4], paths[6]]
+    assert catalog.query(paths=paths[:2], sn='SN0') == paths[:1]
+
+def test_defaults_and_prune(catalog, rjpegs):
+    catalog.ingest(rjpegs)
+    catalog.set_defaults(rjpegs[0], {'distance': 5.0})
+    catalog.set_defaults(rjpegs[0], {'humidity': 70.0})
+    assert catalog.get_defaults(rjpegs[0]) == {'distance': 5.0, 'humidity': 70.0}
+    # 文件变化后旧的默认参数失效
+    rjpegs[0].write_bytes(rjpegs[0].read_bytes() + b'\0')
+    assert catalog.get_defaults(rjpegs[0]) == {}
+    rjpegs[1].unlink()
+    assert catalog.prune() == 1
+    assert catalog.get(rjpegs[1]) is None
+
+def test_parse_selection():
+    assert parse_selection("sn=SN0; bbox=30.5,114.3,30.6,114.4;") == {'sn': 'SN0', 'bbox': (30.5, 114.3, 30.6, 114.4)}
+    for text in ("bbox=1,2,3", "color=red", "sn"):
+        with pytest.raises(ValueError):
+            parse_selection(text)
@@ -0,0 +1,142 @@
+import asyncio, os
+from journal import JobJournal
+from backends import MockBackend
+from generator import ThermalSession, WORK_DIR_NAME
+
+def test_resume_accepts_valid_records(tmp_path):
+    img, other, page = tmp_path / 'a.jpg', tmp_path / 'b.jpg', tmp_path / 'a.pdf'
+    img.write_bytes(b'a')
+    other.write_bytes(b'b')
+    page.write_bytes(b'%PDF')
+    journal = JobJournal(tmp_path / 'journal.jsonl')
+    journal.record(img, True, {'max': 42.0}, pdf=page)
+    journal.record(other, False)
+    journal.close()
+    # 崩溃时写了一半的行
+    with open(tmp_path / 'journal.jsonl', mode='a', encoding='utf-8') as f:
+        f.write('{"input": "')
+
+    resumed = JobJournal(tmp_path / 'journal.jsonl', resume=True)
+    try:
+        assert resumed.completed(img) == {'pdf': str(page.absolute())}
+        assert resumed.data(img) == {'max': 42.0}
+        assert resumed.completed(other) is None
+    finally:
+        resumed.close()
+
+def test_detail_is_read_back(tmp_path):
+    img, other = tmp_path / 'a.jpg', tmp_path / 'b.jpg'
+    img.write_bytes(b'a')
+    other.write_bytes(b'b')
+    journal = JobJournal(tmp_path / 'journal.jsonl')
+    journal.record(img, True, {'max': 42.0}, detail={'histogram': [1, 2]})
+    journal.record(other, True, detail={'histogram': [3]})
+    journal.record(other, True)
+    # 只保存在文件中
+    assert 'detail' not in journal.entries[str(img)]
+    assert journal.detail(img) == {'histogram': [1, 2]}
+    assert journal.detail(other) is None
+    journal.close()
+    with open(tmp_path / 'journal.jsonl', mode='a', encoding='utf-8') as f:
+        f.write('{"input": "')
+
+    resumed = JobJournal(tmp_path / 'journal.jsonl', resume=True)
+    try:
+        assert resumed.detail(img) == {'histogram': [1, 2]} and resumed.data(img) == {'max': 42.0}
+        # 写了一半的行被截掉，新记录从行首开始
+        resumed.record(other, True, detail={'histogram': [4]})
+        assert resumed.detail(other) == {'histogram': [4]}
+    finally:
+        resumed.close()
+    assert len(JobJournal(tmp_path / 'journal.jsonl', resume=True).entries) == 2
+
+def test_resume_rejects_stale_records(tmp_path):
+    img, page = tmp_path / 'a.jpg', tmp_path / 'a.pdf'
+    img.write_bytes(b'a')
+    page.write_bytes(b'%PDF')
+    journal = JobJournal(tmp_path / 'journal.jsonl')
+    journal.record(img, True, pdf=page)
+    journal.close()
+
+    # 产物为空文件，或输入被修改
+    page.write_bytes(b'')
+    resumed = JobJournal(tmp_path / 'journal.jsonl', resume=True)
+    assert resumed.completed(img) is None
+    resumed.close()
+    page.write_bytes(b'%PDF')
+    img.write_bytes(b'changed')
+    resumed = JobJournal(tmp_path / 'journal.jsonl', resume=True)
+    assert resumed.completed(img) is None
+    resumed.close()
+    # 不恢复时丢弃旧日志
+    fresh = JobJournal(tmp_path / 'journal.jsonl')
+    assert fresh.completed(img) is None and not fresh.entries
+    fresh.close(remove=True)
+    assert not (tmp_path / 'journal.jsonl').exists()
+
+async def run_report(images, tmp_path, resume: bool = False, cancel_after: int = 0, partial: bool = False, **params) -> tuple[bool, list[str]]:
+    async with ThermalSession(2) as session:
+        gen = session.job(
+            input_dir=images[0].parent,
+            output_dir=tmp_path / 'out',
+            temp_dir=tmp_path / 'temps',
+            cli_path=None,
+            engine='fitz',
+            resume=resume,
+            ram_temp=False,
+            max_workers=2,
+            backend=MockBackend(64, 48),
+            **params
+        )
+        messages = []
+        async for _, r in gen.run():
+            messages.append(r['message'])
+            if len(messages) == cancel_after:
+                gen.cancel(finalize=partial)
+        return gen.cancelled, messages
+
+def test_report_resume(tmp_path, rjpegs):
+    import fitz
+
+    cancelled, messages = asyncio.run(run_report(rjpegs, tmp_path, cancel_after=3))
+    assert cancelled
+    done = sum(message.startswith("完成") for message in messages)
+    assert done >= 3
+    # 可恢复的状态保存在输出文件夹中
+    assert list((tmp_path / 'out' / WORK_DIR_NAME).glob('report_*/journal.jsonl'))
+
+    cancelled, messages = asyncio.run(run_report(rjpegs, tmp_path, resume=True))
+    assert not cancelled
+    assert sum(message.startswith("跳过(已完成)") for message in messages) == done
+    assert sum(message.startswith("完成") for message in messages) == len(rjpegs) - done
+    reports = list((tmp_path / 'out').glob('*.pdf'))
+    assert len(reports) == 1
+    with fitz.open(reports[0]) as doc:
+        assert doc.page_count == len(rjpegs)
+    assert not (tmp_path / 'out' / WORK_DIR_NAME).exists()
+    assert os.listdir(tmp_path / 'temps') == []
+
+def test_partial_report_keeps_state(tmp_path, rjpegs):
+    cancelled, messages = asyncio.run(run_report(rjpegs, tmp_path, cancel_after=3, partial=True))
+    assert cancelled
+    done = sum(message.startswith("完成") for message in messages)
+    assert len(list((tmp_path / 'out').glob('*_partial.pdf'))) == 1
+    # 部分报告之后仍可以继续
+    cancelled, messages = asyncio.run(run_report(rjpegs, tmp_path, resume=True))
+    assert not cancelled
+    assert sum(message.startswith("跳过(已完成)") for message in messages) == done
+    assert not (tmp_path / 'out' / WORK_DIR_NAME).exists()
+
+def test_resumed_analysis(tmp_path, rjpegs):
+    import json
+
+    asyncio.run(run_report(rjpegs, tmp_path, cancel_after=3, analysis=True, summary=True))
+    asyncio.run(run_report(rjpegs, tmp_path, resume=True, analysis=True, summary=True))
+    # 恢复的图像从日志中读回分析结果
+    sidecar = next((tmp_path / 'out').glob('*.pdf')).with_suffix('.json')
+    with open(sidecar, encoding='utf-8') as f:
+        images = json.load(f)['images']
+    assert len(images) == len(rjpegs) and all(entry['analysis'] for entry in images)
+    summary = next((tmp_path / 'out').glob('*_summary.json'))
+    with open(summary, encoding='utf-8') as f:
+        assert sum(json.load(f)['pixel_histogram']['counts']) == 64 * 48 * len(rjpegs)
@@ -0,0 +1,62 @@
+import fitz
+from report_index import ReportIndex, index_path
+
+def write_pdf(path, *labels: str):
+    doc = fitz.open()
+    for label in labels:
+        doc.new_page().insert_text((72, 72), label)
+    doc.save(path)
+    doc.close()
+
+def page_labels(path) -> list[str]:
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+def make_report(tmp_path) -> ReportIndex:
+    """摘要页 + a (2 页), c, e，拍摄时间分别为 10:00, 10:20, 10:40"""
+    report = tmp_path / 'report.pdf'
+    write_pdf(report, 'summary', 'a1', 'a2', 'c', 'e')
+    index = ReportIndex(report, offset=1)
+    index.add('/in/a.jpg', 'v1', '2026/05/01 10:00:00', 1, 2)
+    index.add('/in/c.jpg', 'v1', '2026/05/01 10:20:00', 3, 1)
+    index.add('/in/e.jpg', 'v1', '2026/05/01 10:40:00', 4, 1)
+    index.add('/in/s.jpg', 'v1', '2026/05/01 10:50:00')
+    index.save()
+    return index
+
+def test_append_inserts_by_capture_time(tmp_path):
+    index = make_report(tmp_path)
+    original = index.report.read_bytes()
+    for name in ('b', 'd', 'f', 'x'):
+        write_pdf(tmp_path / f"{name}.pdf", name)
+
+    loaded = ReportIndex.load(index.report)
+    assert loaded.offset == 1 and loaded.contains('/in/c.jpg', 'v1') and not loaded.contains('/in/c.jpg', 'v2')
+    loaded.append([
+        ('/in/f.jpg', 'v1', '2026/05/01 11:00:00', tmp_path / 'f.pdf'),
+        ('/in/b.jpg', 'v1', '2026/05/01 10:10:00', tmp_path / 'b.pdf'),
+        ('/in/d.jpg', 'v1', '2026/05/01 10:30:00', tmp_path / 'd.pdf'),
+        # 没有拍摄时间的放在最后
+        ('/in/x.jpg', 'v1', None, tmp_path / 'x.pdf'),
+    ], [('/in/t.jpg', 'v1', '2026/05/01 10:05:00')])
+
+    assert page_labels(index.report) == ['summary', 'a1', 'a2', 'b', 'c', 'd', 'e', 'f', 'x']
+    # 增量保存: 原有内容不被重写
+    assert index.report.read_bytes().startswith(original)
+    saved = ReportIndex.load(index.report)
+    assert [saved.page(f"/in/{name}.jpg") for name in 'abcdefx'] == [1, 3, 4, 5, 6, 7, 8]
+    assert saved.page('/in/t.jpg') is None and saved.contains('/in/t.jpg', 'v1')
+    assert index_path(index.report).name == 'report_inputs.json'
+
+def test_append_replaces_modified_image(tmp_path):
+    index = make_report(tmp_path)
+    write_pdf(tmp_path / 'a.pdf', 'a-new')
+    write_pdf(tmp_path / 'c.pdf', 'c-new')
+    loaded = ReportIndex.load(index.report)
+    # a 被修改且拍摄时间不变，c 被修改后未超过分诊阈值
+    loaded.append([('/in/a.jpg', 'v2', '2026/05/01 10:00:00', tmp_path / 'a.pdf')], [('/in/c.jpg', 'v2', '2026/05/01 10:20:00')])
+
+    assert page_labels(index.report) == ['summary', 'a-new', 'e']
+    saved = ReportIndex.load(index.report)
+    assert saved.contains('/in/a.jpg', 'v2') and saved.entries['/in/a.jpg']['pages'] == 1
+    assert (saved.page('/in/a.jpg'), saved.page('/in/c.jpg'), saved.page('/in/e.jpg')) == (1, None, 2)
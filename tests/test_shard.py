@@ -0,0 +1,57 @@
+import fitz
+from shard import ShardPlan, load_manifests, ordered_pages, parse_shard
+import pytest
+
+def test_parse_shard():
+    assert parse_shard(' 2 / 4 ') == (2, 4)
+    for spec in ('0/4', '5/4', '1-4'):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+def test_path_shards_partition_inputs(rjpegs):
+    plans = [ShardPlan(rjpegs, i, 3) for i in range(1, 4)]
+    selected = [img for plan in plans for img in plan.images]
+    assert sorted(selected) == sorted(str(p) for p in rjpegs)
+    # 位置为全局排序中的序号，各分片互不重叠
+    positions = sorted(pos for plan in plans for pos in plan.positions.values())
+    assert positions == list(range(len(rjpegs)))
+    # 输入顺序不影响分片
+    assert ShardPlan(list(reversed(rjpegs)), 2, 3).images == plans[1].images
+
+def test_time_shards_are_contiguous(rjpegs):
+    plans = [ShardPlan(rjpegs, i, 3, by='time') for i in range(1, 4)]
+    # 图像按拍摄时间编号，每个分片是连续的一段
+    assert [img for plan in plans for img in plan.images] == [str(p) for p in rjpegs]
+    assert [len(plan.images) for plan in plans] == [2, 3, 3]
+
+def write_pdf(path, pages: int):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    doc.save(path)
+    doc.close()
+
+def test_ordered_pages(tmp_path, rjpegs):
+    plans = [ShardPlan(rjpegs, i, 2) for i in (1, 2)]
+    for plan in plans:
+        # 第一张图像占两页，其余各一页
+        entries, page = [], 0
+        for img in plan.images:
+            pages = 2 if plan.positions[img] == 0 else 1
+            entries.append({'input': img, 'position': plan.positions[img], 'page': page, 'pages': pages})
+            page += pages
+        write_pdf(tmp_path / f"{plan.name}.pdf", page)
+        plan.write_manifest(tmp_path, entries, [], tmp_path / f"{plan.name}.pdf")
+
+    pages = ordered_pages(load_manifests(tmp_path))
+    assert len(pages) == len(rjpegs)
+    assert sum(count for _, _, count in pages) == len(rjpegs) + 1
+    # 按全局位置交错两个分片的页面
+    owner = {img: plan.name for plan in plans for img in plan.images}
+    assert [pdf.stem for pdf, _, _ in pages] == [owner[str(p)] for p in sorted(str(p) for p in rjpegs)]
+
+def test_missing_shard(tmp_path, rjpegs):
+    plan = ShardPlan(rjpegs, 1, 2)
+    plan.write_manifest(tmp_path, [], [])
+    with pytest.raises(ValueError, match='shard_0002_of_0002'):
+        load_manifests(tmp_path)
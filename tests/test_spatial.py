@@ -0,0 +1,40 @@
+from spatial import METERS_PER_DEGREE, NO_GPS_SITE, cluster_sites, valid_gps
+
+def offset(lat: float, lon: float, north: float = 0.0) -> tuple[float, float]:
+    """向北偏移 north 米"""
+    return lat + north / METERS_PER_DEGREE, lon
+
+def test_cluster_sites():
+    points = {
+        'a': (30.5, 114.3),
+        'b': offset(30.5, 114.3, 40),
+        'c': (30.6, 114.3),
+        'd': None,
+        'e': offset(30.6, 114.3, -30),
+    }
+    sites = cluster_sites(points, 50)
+    assert [(site.name, site.images) for site in sites] == [
+        ('site_01', ['a', 'b']), ('site_02', ['c', 'e']), (NO_GPS_SITE, ['d'])
+    ]
+    assert sites[0].bbox == (30.5, 114.3, points['b'][0], 114.3)
+    assert sites[2].bbox is None and sites[2].to_dict()['count'] == 1
+
+def test_single_linkage_across_cells():
+    # 相邻两点相距 40 m，首尾相距 400 m，仍属于同一组
+    points = {i: offset(30.5, 114.3, 40 * i) for i in range(11)}
+    assert [site.images for site in cluster_sites(points, 50)] == [list(range(11))]
+    assert len(cluster_sites(points, 30)) == 11
+
+def test_longitude_scale():
+    # 60°N 处经度 0.001° 约 56 m
+    points = {'a': (60.0, 10.0), 'b': (60.0, 10.001)}
+    assert len(cluster_sites(points, 60)) == 1
+    assert len(cluster_sites(points, 50)) == 2
+
+def test_valid_gps():
+    assert valid_gps((0.0, 0.0, 100)) is None
+    assert valid_gps(None) is None
+    assert valid_gps((91.0, 10.0)) is None
+    assert valid_gps([30.5, 114.3, 20]) == (30.5, 114.3)
+    assert cluster_sites({'a': None}, 50)[0].name == NO_GPS_SITE
+    assert cluster_sites({}, 50) == []
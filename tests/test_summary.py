@@ -0,0 +1,64 @@
+from analysis import HIST_BINS, histogram
+from backends import MockBackend
+from summary import BatchSummary, MAX_FAILURE_KINDS, hist_bin
+
+def info(i: int, high: float, sn: str = 'SN0', hour: int = 10, **extra) -> dict:
+    return {
+        'input': f"/in/{i}.jpg", 'filename': f"{i}.jpg", 'sn': sn,
+        'create_time': f"2026/05/01 {hour:02d}:{i:02d}:00", 'min': 20.0, 'max': high, **extra
+    }
+
+def test_hottest_keeps_top_n():
+    summary = BatchSummary(top=3)
+    for i, high in enumerate([40.0, 55.5, 31.0, 70.0, 48.0, 62.0]):
+        summary.add(info(i, high))
+    assert [(item['filename'], item['max']) for item in summary.hottest] == [('3.jpg', 70.0), ('5.jpg', 62.0), ('1.jpg', 55.5)]
+    assert summary.completed == 6
+    assert sum(summary.max_histogram) == 6
+
+def test_hottest_ties_keep_input_order():
+    summary = BatchSummary(top=3)
+    for i, high in enumerate([50.0, 60.0, 50.0]):
+        summary.add(info(i, high))
+    assert [item['filename'] for item in summary.hottest] == ['1.jpg', '0.jpg', '2.jpg']
+
+def test_groups_and_failures():
+    summary = BatchSummary()
+    summary.add(info(0, 50.0, 'SN0', 10))
+    summary.add(info(1, 60.0, 'SN1', 10), skipped=True)
+    summary.add(info(2, 40.0, 'SN0', 11))
+    summary.add_failure(ValueError("bad"), 'SN1', "2026/05/01 11:30:00")
+    summary.add_failure("timeout")
+    data = summary.to_dict()
+    assert (data['completed'], data['failed'], data['triage_skipped']) == (3, 2, 1)
+    assert data['by_drone']['SN0'] == {'count': 2, 'failed': 0, 'max': 50.0, 'min': 20.0, 'mean_max': 45.0}
+    assert data['by_drone']['SN1']['failed'] == 1
+    assert data['by_hour']['2026/05/01 11:00'] == {'count': 1, 'failed': 1, 'max': 40.0, 'min': 20.0, 'mean_max': 40.0}
+    assert data['failures'] == {'ValueError': 1, 'timeout': 1}
+
+def test_failure_kinds_are_bounded():
+    summary = BatchSummary()
+    for i in range(MAX_FAILURE_KINDS + 5):
+        summary.add_failure(f"reason {i}")
+    assert len(summary.failures) == MAX_FAILURE_KINDS + 1
+    assert summary.failures["其他"] == 5
+
+def test_pixel_histogram_and_bars():
+    backend = MockBackend(64, 48)
+    summary = BatchSummary()
+    for i in range(4):
+        temps = backend.temperature(f"/in/{i}.jpg")
+        summary.add(info(i, float(temps.max()), histogram=histogram(temps)))
+    assert len(summary.pixel_histogram) == HIST_BINS
+    assert sum(summary.pixel_histogram) == 4 * 64 * 48
+    trimmed = BatchSummary.histogram_range(summary.pixel_histogram)
+    assert trimmed['counts'][0] and trimmed['counts'][-1]
+    bars = BatchSummary.histogram_bars(summary.pixel_histogram, max_bars=10)
+    assert 0 < len(bars) <= 10
+    assert sum(bar['count'] for bar in bars) == 4 * 64 * 48
+    assert max(bar['height'] for bar in bars) == 100
+    assert BatchSummary.histogram_bars([0] * HIST_BINS) == []
+
+def test_hist_bin_clips():
+    assert hist_bin(-100) == 0
+    assert hist_bin(1000) == HIST_BINS - 1
@@ -0,0 +1,74 @@
+import os, time, asyncio
+from tempstore import TempStore, sweep_orphans, RUN_PREFIX, LOCK_NAME
+
+def test_sweep_keeps_live_runs(tmp_path):
+    first = TempStore(tmp_path, prefer_ram=False)
+    second = TempStore(tmp_path, prefer_ram=False)
+    try:
+        (first.dir / 'page.png').write_bytes(b'x')
+        assert sweep_orphans(tmp_path) == 0
+        # 新的运行启动时同样不能删除正在使用的目录
+        third = TempStore(tmp_path, prefer_ram=False)
+        third.close()
+        assert first.dir.is_dir() and second.dir.is_dir()
+        assert (first.dir / 'page.png').exists()
+        assert (first.dir / LOCK_NAME).read_text() == str(os.getpid())
+    finally:
+        first.close()
+        second.close()
+
+def test_sweep_removes_orphans(tmp_path):
+    store = TempStore(tmp_path, prefer_ram=False)
+    store.close(keep=True)
+    assert store.dir.is_dir()
+    # 没有锁文件且已超过宽限期的目录
+    stale = tmp_path / f"{RUN_PREFIX}0_0"
+    stale.mkdir()
+    os.utime(stale, (time.time() - 120, time.time() - 120))
+    assert sweep_orphans(tmp_path) == 2
+    assert not store.dir.exists() and not stale.exists()
+
+def test_quota_accounting(tmp_path):
+    store = TempStore(tmp_path, quota=1024, prefer_ram=False)
+    try:
+        path = store.path('a.bin')
+        path.write_bytes(b'\0' * 100)
+        assert store.add(path) == 100
+        assert store.used == 100
+        store.remove(path)
+        assert store.used == 0 and not path.exists()
+    finally:
+        store.close()
+    assert not store.dir.exists()
+
+def test_default_quota_is_shared(tmp_path):
+    first = TempStore(tmp_path, prefer_ram=False)
+    second = TempStore(tmp_path, prefer_ram=False)
+    try:
+        assert first.budget is second.budget and first.quota == second.quota
+        path = first.path('a.bin')
+        path.write_bytes(b'\0' * 100)
+        first.add(path)
+        assert second.committed() == 100
+
+        async def next_image():
+            async with second.reserve(40):
+                pass
+
+        async def run():
+            # 另一个任务占满配额时，第二张图像等待其释放
+            first.quota = second.quota = first.budget.quota = 150
+            async with second.reserve(40):
+                waiting = asyncio.create_task(next_image())
+                await asyncio.sleep(0.01)
+                assert not waiting.done()
+                first.remove(path)
+                await asyncio.wait_for(waiting, 1)
+        asyncio.run(run())
+    finally:
+        first.close()
+        second.close()
+    # 之后创建的 TempStore 重新计算配额
+    third = TempStore(tmp_path, prefer_ram=False)
+    assert third.budget is not first.budget
+    third.close()
@@ -0,0 +1,11 @@
+from generator import plan_volumes
+
+def test_plan_volumes():
+    sizes = [10, 10, 10, 10, 10]
+    assert plan_volumes(sizes) == [(0, 5)]
+    assert plan_volumes(sizes, max_pages=2) == [(0, 2), (2, 4), (4, 5)]
+    assert plan_volumes(sizes, max_bytes=25) == [(0, 2), (2, 4), (4, 5)]
+    # 单个来源超过上限时独占一卷
+    assert plan_volumes([5, 100, 5, 5], max_bytes=20) == [(0, 1), (1, 2), (2, 4)]
+    assert plan_volumes([10] * 4, max_pages=3, max_bytes=15) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+    assert plan_volumes([]) == [(0, 0)]
@@ -1,15 +1,21 @@
 import shutil, asyncio, locale, subprocess, os, sys
 from typing import Literal, Optional
 
+def _probe_weasyprint_lib() -> bool:
+    try:
+        from weasyprint import HTML
+        HTML(string='<p>test</p>')
+        return True
+    except Exception as e:
+        return False
+
 async def check_weasyprint(exe_path: Optional[str] = None, lib_only: bool = False) -> tuple[Literal['lib', 'exe', 'none'], Optional[str]]:
     if not exe_path:
-        try:
-            from weasyprint import HTML
-            HTML(string='<p>test</p>')
+        # 导入 WeasyPrint 较慢，放到线程中避免阻塞事件循环
+        if await asyncio.to_thread(_probe_weasyprint_lib):
             return 'lib', None
-        except Exception as e:
-            if lib_only:
-                return 'none', None
+        if lib_only:
+            return 'none', None
         exe_path = shutil.which("weasyprint")
     
     if exe_path:
@@ -38,6 +44,84 @@ async def check_dji_irp(exe_path: Optional[str] = None) -> Optional[str]:
             return exe_path
     return None
 
+def tool_signature(path: str | os.PathLike) -> Optional[str]:
+    """以 文件大小 + 修改时间 标识工具的版本，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def find_weasyprint_lib() -> Optional[str]:
+    """只查找 WeasyPrint 库的位置而不导入它"""
+    import importlib.util
+    try:
+        spec = importlib.util.find_spec('weasyprint')
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec and spec.origin else None
+
+class ToolCache:
+    """
+    工具检测结果缓存
+
+    以 类型 + 路径 为键，记录检测时文件的 大小 + 修改时间，
+    文件未变化时直接沿用上次的结果，不再启动进程或导入库。
+    """
+    def __init__(self, data: Optional[dict] = None):
+        self.data: dict[str, dict[str, dict]] = dict()
+        if isinstance(data, dict):
+            for kind, entries in data.items():
+                if isinstance(entries, dict):
+                    self.data[kind] = {p: e for p, e in entries.items() if isinstance(e, dict)}
+        self._lock = asyncio.Lock()
+
+    def get(self, kind: str, path: str) -> Optional[bool]:
+        entry = self.data.get(kind, dict()).get(path)
+        if entry is None or entry.get('signature') != tool_signature(path):
+            return None
+        return bool(entry.get('valid'))
+
+    def put(self, kind: str, path: str, valid: bool):
+        signature = tool_signature(path)
+        if signature is None:
+            return
+        self.data.setdefault(kind, dict())[path] = {'signature': signature, 'valid': valid}
+
+    def to_dict(self) -> dict:
+        return self.data
+
+    async def dji_irp(self, exe_path: Optional[str] = None) -> Optional[str]:
+        """带缓存的 check_dji_irp"""
+        exe_path = exe_path or shutil.which('dji_irp')
+        if not exe_path:
+            return None
+        exe_path = os.path.abspath(exe_path)
+        async with self._lock:
+            if (valid := self.get('dji_irp', exe_path)) is None:
+                valid = (await check_dji_irp(exe_path)) is not None
+                self.put('dji_irp', exe_path, valid)
+        return exe_path if valid else None
+
+    async def weasyprint(self, exe_path: Optional[str] = None) -> tuple[Literal['lib', 'exe', 'none'], Optional[str]]:
+        """带缓存的 check_weasyprint，库以其 __init__.py 的版本为准"""
+        async with self._lock:
+            if not exe_path and (lib_path := find_weasyprint_lib()):
+                if (valid := self.get('weasyprint_lib', lib_path)) is None:
+                    valid = (await check_weasyprint(lib_only=True))[0] == 'lib'
+                    self.put('weasyprint_lib', lib_path, valid)
+                if valid:
+                    return 'lib', None
+
+            exe_path = exe_path or shutil.which('weasyprint')
+            if not exe_path:
+                return 'none', None
+            exe_path = os.path.abspath(exe_path)
+            if (valid := self.get('weasyprint', exe_path)) is None:
+                valid = (await check_weasyprint(exe_path))[0] == 'exe'
+                self.put('weasyprint', exe_path, valid)
+        return ('exe', exe_path) if valid else ('none', None)
+
 def get_executable_path():
     if getattr(sys, 'frozen', False):
         return os.path.abspath(sys.executable)